@@ -0,0 +1,496 @@
+import argparse
+import glob
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import zipfile
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from duplicates import MascaraBits
+from fusion import COLUMNA_REGISTROS, fusionar_registros, grupos_fusion
+from instrumentation import rss_actual
+from processing import (extraer_año, extraer_años, compactar_años, procesar_archivos, identificar_duplicados,
+                        crear_excel_organizado, process_files)
+from writers import COLUMNA_FILA, FILAS_FRAGMENTO
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+TAMAÑOS = (10_000, 100_000, 1_000_000)
+MUESTRA_ESCALAR = 100_000  # extraer_año fila a fila es lento: se mide sobre una muestra como mucho de este tamaño
+VERSION_RESULTADOS = 1
+# Diferencias por debajo de estos márgenes se consideran ruido al comparar resultados
+RUIDO_SEGUNDOS = 0.005
+RUIDO_MB = 1.0
+
+# Formatos de fecha tal como los exportan Zotero, Scopus y ProQuest
+FORMATOS_FECHA = [
+    lambda año, rng: año,                                               # Zotero / Scopus: año numérico
+    lambda año, rng: float(año),                                        # Columna numérica con vacíos
+    lambda año, rng: f"{año}-{rng.integers(1, 13):02d}-{rng.integers(1, 29):02d}",  # Zotero 'Date'
+    lambda año, rng: f"{año}",                                          # Año como texto
+    lambda año, rng: f"May {rng.integers(1, 29)}, {año}",               # ProQuest 'pubdate'
+    lambda año, rng: f"Jan {año}",                                      # ProQuest 'pubdate' abreviado
+    lambda año, rng: None,                                              # Sin fecha
+]
+
+def generar_fechas(filas, semilla=0, años=(1950, 2025), desorden=1.0):
+    """Genera una columna de fechas; una fracción `desorden` usa los formatos mezclados de las exportaciones reales"""
+    rng = np.random.default_rng(semilla)
+    valores = rng.integers(años[0], años[1] + 1, size=filas)
+    formatos = np.where(rng.random(filas) < desorden, rng.integers(0, len(FORMATOS_FECHA), size=filas), 0)
+    return pd.Series([FORMATOS_FECHA[f](int(a), rng) for a, f in zip(valores, formatos)], dtype=object)
+
+def medir(funcion, *args):
+    """Ejecuta una función y devuelve su resultado y el tiempo empleado en segundos"""
+    inicio = time.perf_counter()
+    resultado = funcion(*args)
+    return resultado, time.perf_counter() - inicio
+
+def benchmark_años(filas, semilla=0):
+    """Compara extraer_año fila a fila con la versión vectorizada extraer_años"""
+    fechas = generar_fechas(filas, semilla)
+    esperado, t_fila = medir(lambda s: s.apply(extraer_año).astype('float64'), fechas)
+    (obtenido, fallidos), t_vector = medir(extraer_años, fechas)
+    
+    iguales = esperado.equals(obtenido)
+    print(f"Extracción de años ({filas} filas)")
+    print(f"  extraer_año (apply):  {t_fila:8.3f} s")
+    print(f"  extraer_años:         {t_vector:8.3f} s  (x{t_fila / t_vector:.1f})")
+    print(f"  Resultados iguales:   {iguales}  |  sin año reconocible: {fallidos}")
+    return iguales
+
+# Columnas de cada exportación sintética: (columna de título, columna de año, columnas propias)
+EXPORTACIONES = {
+    'zotero': ('Title', 'Publication Year', lambda i, rng, n: {
+        'Key': [f"Z{i}-{k}" for k in range(n)],
+        'Item Type': rng.choice(['journalArticle', 'conferencePaper', 'book'], size=n),
+        'Author': rng.choice(['Doe, J.', 'Smith, A.; Pérez, M.', 'Müller, K.'], size=n),
+        'Publication Title': rng.choice(['Journal of Reviews', 'Evidence Synthesis'], size=n),
+        'Abstract Note': "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 3,
+    }),
+    'scopus': ('Title', 'Year', lambda i, rng, n: {
+        'Authors': rng.choice(['Doe J.', 'Smith A., Pérez M.', 'Müller K.'], size=n),
+        'Source title': rng.choice(['Journal of Reviews', 'Evidence Synthesis'], size=n),
+        'Cited by': rng.integers(0, 500, size=n),
+        'Document Type': rng.choice(['Article', 'Review', 'Conference Paper'], size=n),
+        'Publication Stage': 'Final',
+        'Open Access': rng.choice(['', 'All Open Access; Gold Open Access'], size=n),
+        'Source': 'Scopus',
+    }),
+    'proquest': ('Title', 'year', lambda i, rng, n: {
+        'Authors': rng.choice(['Doe, Jane', 'Smith, Anne', 'Peña, María'], size=n),
+        'pubtitle': rng.choice(['Journal of Reviews', 'Evidence Synthesis'], size=n),
+        'documentType': rng.choice(['Journal Article', 'Dissertation/Thesis'], size=n),
+        'language': rng.choice(['English', 'Spanish'], size=n),
+    }),
+}
+
+TEMAS = ('telehealth', 'exercise therapy', 'mindfulness', 'school feeding', 'nurse staffing', 'antibiotic stewardship')
+RESULTADOS = ('depression', 'mortality', 'adherence', 'costs', 'quality of life', 'readmission')
+
+def _titulo(registro):
+    """Título sintético reproducible para un identificador de registro"""
+    return (f"Effect of {TEMAS[registro % len(TEMAS)]} on {RESULTADOS[(registro // len(TEMAS)) % len(RESULTADOS)]}: "
+            f"a systematic review of trial {registro}")
+
+def generar_proyecto(directorio, filas, formatos=('zotero', 'scopus', 'proquest'), tasa_duplicados=0.2,
+                     años=(1990, 2025), desorden=0.3, semilla=0):
+    """Escribe una exportación por formato (Zotero, Scopus, ProQuest) con `filas` registros en total
+    
+    tasa_duplicados: fracción de registros que repiten uno anterior (de cualquier fuente), con su título y DOI;
+    años: rango de años de publicación; desorden: fracción de fechas con formatos mezclados.
+    """
+    rng = np.random.default_rng(semilla)
+    rutas = []
+    siguiente = 0
+    por_archivo = np.array_split(np.arange(filas), len(formatos))
+    for i, (formato, posiciones) in enumerate(zip(formatos, por_archivo)):
+        n = len(posiciones)
+        # Cada fila es un registro nuevo o, con probabilidad tasa_duplicados, uno ya generado
+        nuevos = (rng.random(n) >= tasa_duplicados) | (siguiente == 0)
+        registros = np.empty(n, dtype=np.int64)
+        registros[nuevos] = siguiente + np.arange(nuevos.sum())
+        siguiente += int(nuevos.sum())
+        registros[~nuevos] = rng.integers(0, max(siguiente, 1), size=int((~nuevos).sum()))
+        
+        columna_titulo, columna_año, otras = EXPORTACIONES[formato]
+        datos = {columna_titulo: [_titulo(r) for r in registros],
+                 columna_año: generar_fechas(n, semilla + i, años, desorden),
+                 'DOI': [f"10.{1000 + r % 9000}/rev.{r}" for r in registros]}
+        datos.update(otras(i, rng, n))
+        ruta = os.path.join(directorio, f"{formato}_{i:02d}.csv")
+        pd.DataFrame(datos).to_csv(ruta, index=False, encoding='utf-8-sig')
+        rutas.append(ruta)
+    return rutas
+
+def _leer_como_antes(rutas):
+    """Lectura original: motor de Python con olfateo del delimitador, archivo por archivo"""
+    dataframes = []
+    for ruta in rutas:
+        df = pd.read_csv(ruta, delimiter=None, engine='python', encoding='utf-8')
+        df['Fuente'] = os.path.splitext(os.path.basename(ruta))[0]
+        dataframes.append(df)
+    return pd.concat(dataframes, ignore_index=True)
+
+def benchmark_ingesta(archivos, filas, trabajadores=None, semilla=0):
+    """Compara la lectura original, la lectura secuencial nueva y la lectura en paralelo
+
+    Lee un proyecto de generar_proyecto con `filas` registros repartidos en `archivos` exportaciones, alternando
+    los formatos de Zotero, Scopus y ProQuest.
+    """
+    formatos = [list(EXPORTACIONES)[n % len(EXPORTACIONES)] for n in range(archivos)]
+    with tempfile.TemporaryDirectory() as directorio:
+        rutas = generar_proyecto(directorio, filas, formatos=formatos, semilla=semilla)
+        antes, t_antes = medir(_leer_como_antes, rutas)
+        _, t_secuencial = medir(lambda: procesar_archivos(rutas, 'es', trabajadores=1))
+        despues, t_paralelo = medir(lambda: procesar_archivos(rutas, 'es', trabajadores=trabajadores))
+    
+    print(f"Ingesta ({archivos} archivos, {filas} filas)")
+    print(f"  Motor Python, secuencial:  {t_antes:8.3f} s")
+    print(f"  leer_csv, secuencial:      {t_secuencial:8.3f} s  (x{t_antes / t_secuencial:.1f})")
+    print(f"  leer_csv, en paralelo:     {t_paralelo:8.3f} s  (x{t_antes / t_paralelo:.1f})")
+    print(f"  Filas leídas:              {len(antes)} / {len(despues)}")
+
+# Textos que una hoja de cálculo tomaría por fórmula o por error si no se escribieran como texto
+TEXTOS_NO_LITERALES = ('=1+1', '#N/A', '=HYPERLINK("https://example.org")', '#DIV/0!', '=')
+
+def _partes_distintas(libro_a, libro_b):
+    """Partes de dos libros de Excel con distinto contenido (sin contar las fechas de docProps/core.xml)"""
+    with zipfile.ZipFile(libro_a) as a, zipfile.ZipFile(libro_b) as b:
+        nombres = sorted(set(a.namelist()) | set(b.namelist()))
+        return [nombre for nombre in nombres if nombre != 'docProps/core.xml'
+                and (nombre not in a.namelist() or nombre not in b.namelist() or a.read(nombre) != b.read(nombre))]
+
+def benchmark_escritura(filas, trabajadores=None, semilla=0):
+    """Genera el mismo Excel en un proceso y en varios, compara los tiempos y comprueba que el contenido es idéntico
+
+    Algunos títulos y resúmenes son textos como '=1+1' o '#N/A', que los dos caminos deben escribir como texto.
+    """
+    # Con menos filas el Excel se escribe siempre en un solo proceso
+    filas = max(filas, FILAS_FRAGMENTO)
+    trabajadores = max(2, trabajadores or os.cpu_count() or 1)
+    with tempfile.TemporaryDirectory() as directorio:
+        rutas = generar_proyecto(directorio, filas, semilla=semilla)
+        df = procesar_archivos(rutas, 'es')
+        especiales = df.index[::97]
+        for columna in ('Title', 'Abstract Note'):
+            df.loc[especiales, columna] = np.resize(TEXTOS_NO_LITERALES, len(especiales))
+        df, mascara, _ = identificar_duplicados(df, 'es')
+        años = compactar_años(extraer_años(df['Publication Year'])[0])
+        
+        salidas, tiempos = {}, {}
+        for procesos in (1, trabajadores):
+            salidas[procesos] = os.path.join(directorio, f"salida_{procesos}.xlsx")
+            _, tiempos[procesos] = medir(lambda: crear_excel_organizado(df, salidas[procesos], mascara, 'es', años=años,
+                                                                         trabajadores=procesos))
+        distintas = _partes_distintas(salidas[1], salidas[trabajadores])
+    
+    print(f"Escritura del Excel ({filas} filas)")
+    print(f"  1 proceso:             {tiempos[1]:8.3f} s")
+    print(f"  {trabajadores} procesos:            {tiempos[trabajadores]:8.3f} s  (x{tiempos[1] / tiempos[trabajadores]:.1f})")
+    print(f"  Contenido idéntico:    {not distintas}" + (f"  (difieren: {', '.join(distintas)})" if distintas else ''))
+    return not distintas
+
+def _leer_parquet(salida):
+    """Esquema de cada partición y todos los registros en su orden original de una salida Parquet"""
+    import pyarrow.parquet as pq
+    partes = sorted(glob.glob(os.path.join(salida, 'todos', '*', 'part-0.parquet')))
+    esquemas = {os.path.relpath(parte, salida): pq.read_schema(parte) for parte in partes}
+    registros = pd.concat([pq.read_table(parte).to_pandas() for parte in partes], ignore_index=True)
+    return esquemas, registros.sort_values(COLUMNA_FILA, ignore_index=True)
+
+def comprobar_parquet(filas, filas_bloque=1000, semilla=0):
+    """Escribe el mismo proyecto en Parquet en memoria y por bloques y comprueba que esquemas y valores coinciden
+
+    Al proyecto de generar_proyecto se añade un CSV sin perfil con una columna entera con celdas vacías (el lector
+    la deja en float64) y otra sin vacías (int64).
+    """
+    with tempfile.TemporaryDirectory() as directorio:
+        rutas = generar_proyecto(directorio, filas, semilla=semilla)
+        n = max(filas // 4, filas_bloque + 1)
+        generico = os.path.join(directorio, 'generico.csv')
+        pd.DataFrame({'Title': [_titulo(r) for r in range(n)], 'Publication Year': 1990 + np.arange(n) % 36,
+                      'Pages': ['' if i % 7 == 3 else str(10 + i) for i in range(n)],
+                      'Volume': np.arange(n) % 50}).to_csv(generico, index=False)
+        salidas = {}
+        for por_bloques in (False, True):
+            salida = os.path.join(directorio, f"salida_{'bloques' if por_bloques else 'memoria'}.parquet")
+            process_files(rutas + [generico], salida, 'es', usar_cache=False, formato='parquet',
+                          por_bloques=por_bloques, filas_bloque=filas_bloque)
+            salidas[por_bloques] = _leer_parquet(salida)
+    (esquemas, registros), (esquemas_bloques, registros_bloques) = salidas[False], salidas[True]
+    
+    tipo = lambda esquema, nombre: str(esquema.field(nombre).type) if esquema and nombre in esquema.names else '-'
+    # Cada diferencia (partición que falta o columna con otro tipo) se cuenta una vez para todas las particiones
+    distintos = {}
+    for parte in sorted(set(esquemas) | set(esquemas_bloques)):
+        a, b = esquemas.get(parte), esquemas_bloques.get(parte)
+        if a is None or b is None:
+            distintos[parte] = None
+        elif not a.equals(b, check_metadata=False):
+            for nombre in dict.fromkeys(a.names + b.names):
+                if tipo(a, nombre) != tipo(b, nombre):
+                    distintos[f"{nombre} {tipo(a, nombre)}/{tipo(b, nombre)}"] = None
+    iguales = registros.equals(registros_bloques)
+    print(f"Parquet en memoria y por bloques ({filas} filas + {n} sin perfil, bloques de {filas_bloque})")
+    print(f"  Esquemas iguales:   {not distintos}" + (f"  (difieren: {'; '.join(distintos)})" if distintos else ''))
+    print(f"  Valores iguales:    {iguales}")
+    return not distintos and iguales
+
+# Casos de ISBN de grupos_fusion: (descripción, registros (título, ISBN), grupo esperado de cada registro)
+CASOS_ISBN = [
+    ("capítulos con el mismo ISBN", [('Book: ch 1', '0-306-40615-2'), ('Book: ch 2', '978-0-306-40615-7')], [0, 1]),
+    ("libro y su título con subtítulo", [('Book', '0-306-40615-2'), ('Book: a subtitle', '9780306406157')], [0, 0]),
+    ("libro y dos capítulos", [('Book', '0-306-40615-2'), ('Book: ch 1', '0306406152'), ('Book: ch 2', '0306406152')],
+     [0, 1, 2]),
+    ("mismo capítulo en dos fuentes", [('Book: ch 1', '0-306-40615-2'), ('BOOK: Ch. 1', '9780306406157')], [0, 0]),
+    ("subtítulo con otro ISBN", [('Book', '0-306-40615-2'), ('Book: a subtitle', '1-234-56789-7')], [0, 1]),
+]
+
+def comprobar_fusion():
+    """Comprueba los grupos por ISBN de grupos_fusion: los capítulos de un libro no se fusionan entre sí"""
+    correctos = True
+    print("Grupos de fusión por ISBN")
+    for descripcion, registros, esperados in CASOS_ISBN:
+        df = pd.DataFrame(registros, columns=['Title', 'ISBN'])
+        df['Fuente'] = np.resize(['scopus', 'zotero'], len(df))
+        grupos = grupos_fusion(df)
+        fusionados = fusionar_registros(df, grupos)
+        correcto = list(grupos) == esperados and len(fusionados) == len(set(esperados))
+        correctos &= correcto
+        print(f"  {descripcion:32} {'ok' if correcto else 'ERROR'}  grupos {list(map(int, grupos))}, "
+              f"{COLUMNA_REGISTROS} {fusionados[COLUMNA_REGISTROS].tolist()}")
+    return correctos
+
+def _rss_maximo_mb():
+    """Pico de memoria residente del proceso hasta ahora (None si el sistema no lo informa)"""
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux lo da en KB y macOS en bytes
+    return round(pico / 1024**2 if sys.platform == 'darwin' else pico / 1024, 1)
+
+class _MuestreoRSS(threading.Thread):
+    """Muestrea la memoria residente en segundo plano para obtener el pico de una etapa sin apenas sobrecarga"""
+    
+    def __init__(self, intervalo=0.01):
+        super().__init__(daemon=True)
+        self.intervalo = intervalo
+        self.inicial = rss_actual()
+        self.pico = self.inicial
+        self._parar = threading.Event()
+    
+    def run(self):
+        while not self._parar.wait(self.intervalo):
+            self.pico = max(self.pico, rss_actual())
+    
+    def detener(self):
+        """Devuelve cuánto creció la memoria residente sobre la del inicio de la etapa, en bytes"""
+        self._parar.set()
+        self.join()
+        self.pico = max(self.pico, rss_actual())
+        return self.pico - self.inicial
+
+def metodos_memoria():
+    """Formas de medir memoria disponibles: muestreo de RSS (con psutil o /proc) y tracemalloc"""
+    return (('rss',) if rss_actual() is not None else ()) + ('tracemalloc', 'no')
+
+def medir_etapa(funcion, memoria='rss'):
+    """Ejecuta una etapa y devuelve su resultado y sus medidas: segundos, pico de memoria de la etapa y RSS máximo
+    
+    memoria='rss' muestrea la memoria residente (incluye la de pyarrow y numpy); 'tracemalloc' mide las
+    reservas de Python con más detalle pero hace mucho más lentas las etapas con muchos objetos (openpyxl).
+    """
+    muestreo = None
+    if memoria == 'rss':
+        muestreo = _MuestreoRSS()
+        muestreo.start()
+    elif memoria == 'tracemalloc':
+        tracemalloc.start()
+    inicio = time.perf_counter()
+    try:
+        resultado = funcion()
+        segundos = time.perf_counter() - inicio
+    finally:
+        pico = None
+        if muestreo is not None:
+            pico = muestreo.detener()
+        elif memoria == 'tracemalloc':
+            pico = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    medidas = {'segundos': round(segundos, 4), 'pico_mb': None if pico is None else round(pico / 1024**2, 1),
+               'rss_maximo_mb': _rss_maximo_mb()}
+    return resultado, medidas
+
+def memoria_registros(df, años, mascara):
+    """Memoria de los registros con los tipos compactos frente a la representación original
+    
+    La original guarda todas las columnas como objetos de Python (también la fuente), los años como float64 y la
+    máscara de duplicados con un byte por fila.
+    """
+    compacta = (df.memory_usage(deep=True, index=False).sum() + pd.Series(años).memory_usage(deep=True, index=False)
+                + MascaraBits(mascara).bits.nbytes)
+    original = df.astype(object).memory_usage(deep=True, index=False).sum() + len(años) * 8 + len(mascara)
+    return {'compacta_mb': round(compacta / 1024**2, 1), 'original_mb': round(original / 1024**2, 1),
+            'reduccion': round(1 - compacta / original, 3) if original else 0.0}
+
+def benchmark_etapas(filas, tasa_duplicados=0.2, años=(1990, 2025), desorden=0.3, modo='exacto', memoria='rss',
+                     semilla=0):
+    """Mide cada etapa del proceso (lectura, duplicados, años, fusión y Excel) con un proyecto sintético de `filas`
+    registros"""
+    etapas = {}
+    with tempfile.TemporaryDirectory() as directorio:
+        rutas = generar_proyecto(directorio, filas, tasa_duplicados=tasa_duplicados, años=años, desorden=desorden,
+                                 semilla=semilla)
+        df, etapas['procesar_archivos'] = medir_etapa(lambda: procesar_archivos(rutas, 'es'), memoria)
+        (df, mascara, _), etapas['identificar_duplicados'] = medir_etapa(
+            lambda: identificar_duplicados(df, 'es', modo=modo), memoria)
+        (años_df, _), etapas['extraer_años'] = medir_etapa(lambda: extraer_años(df['Publication Year']), memoria)
+        años_df = compactar_años(años_df)
+        representacion = memoria_registros(df, años_df, mascara)
+        
+        muestra = df['Publication Year'].head(MUESTRA_ESCALAR)
+        _, etapas['extraer_año'] = medir_etapa(lambda: muestra.apply(extraer_año), memoria)
+        etapas['extraer_año']['filas'] = len(muestra)
+        
+        _, etapas['fusionar_registros'] = medir_etapa(lambda: fusionar_registros(df, grupos_fusion(df)), memoria)
+        
+        salida = os.path.join(directorio, 'salida.xlsx')
+        _, etapas['crear_excel_organizado'] = medir_etapa(
+            lambda: crear_excel_organizado(df, salida, mascara, 'es', años=años_df), memoria)
+    
+    return {'filas': filas, 'duplicados': int(mascara.sum()), 'etapas': etapas, 'memoria': representacion}
+
+def _commit_actual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def ejecutar_etapas(tamaños, **opciones):
+    """Ejecuta benchmark_etapas para cada tamaño y devuelve los resultados con los datos del entorno"""
+    resultados = []
+    for filas in tamaños:
+        resultado = benchmark_etapas(filas, **opciones)
+        resultados.append(resultado)
+        print(f"{filas} filas ({resultado['duplicados']} duplicados)")
+        for etapa, medidas in resultado['etapas'].items():
+            pico = f"{medidas['pico_mb']:9.1f} MB" if medidas['pico_mb'] is not None else "        -   "
+            print(f"  {etapa:24} {medidas['segundos']:9.3f} s  {pico}")
+        representacion = resultado['memoria']
+        print(f"  Registros en memoria: {representacion['compacta_mb']:.1f} MB "
+              f"({representacion['original_mb']:.1f} MB sin tipos compactos, -{representacion['reduccion']:.0%})")
+    return {
+        'version': VERSION_RESULTADOS,
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'commit': _commit_actual(),
+        'entorno': {'python': platform.python_version(), 'pandas': pd.__version__, 'numpy': np.__version__,
+                    'sistema': platform.platform(), 'cpus': os.cpu_count()},
+        'parametros': {clave: list(valor) if isinstance(valor, tuple) else valor for clave, valor in opciones.items()},
+        'resultados': resultados,
+    }
+
+def comparar_resultados(anterior, actual, tolerancia=0.1):
+    """Compara dos archivos de resultados; devuelve las etapas que empeoraron más que la tolerancia"""
+    if anterior.get('parametros') != actual.get('parametros'):
+        print("Aviso: los parámetros de las dos ejecuciones no coinciden")
+    previos = {(r['filas'], etapa): medidas for r in anterior['resultados'] for etapa, medidas in r['etapas'].items()}
+    regresiones = []
+    print(f"{'filas':>9} {'etapa':24} {'antes':>9} {'ahora':>9} {'ratio':>7}  {'pico antes':>11} {'pico ahora':>11}")
+    for resultado in actual['resultados']:
+        for etapa, medidas in resultado['etapas'].items():
+            previa = previos.get((resultado['filas'], etapa))
+            if previa is None:
+                continue
+            ratio = medidas['segundos'] / previa['segundos'] if previa['segundos'] else float('inf')
+            picos = [f"{m['pico_mb']:9.1f}MB" if m.get('pico_mb') is not None else f"{'-':>11}" for m in (previa, medidas)]
+            marca = ''
+            mas_lenta = medidas['segundos'] > previa['segundos'] * (1 + tolerancia) + RUIDO_SEGUNDOS
+            mas_memoria = (previa.get('pico_mb') is not None and medidas.get('pico_mb') is not None
+                           and medidas['pico_mb'] > previa['pico_mb'] * (1 + tolerancia) + RUIDO_MB)
+            if mas_lenta or mas_memoria:
+                marca = '  <-- regresión'
+                regresiones.append((resultado['filas'], etapa))
+            print(f"{resultado['filas']:>9} {etapa:24} {previa['segundos']:9.3f} {medidas['segundos']:9.3f} "
+                  f"{ratio:7.2f}  {picos[0]} {picos[1]}{marca}")
+    
+    # Pico de memoria del proceso completo (el de la etapa que más memoria usa) por tamaño
+    picos_previos = {r['filas']: _pico_etapas(r) for r in anterior['resultados']}
+    for resultado in actual['resultados']:
+        antes, ahora = picos_previos.get(resultado['filas']), _pico_etapas(resultado)
+        if antes and ahora is not None:
+            print(f"{resultado['filas']:>9} pico de memoria: {antes:.1f} MB -> {ahora:.1f} MB ({ahora / antes - 1:+.0%})")
+    return regresiones
+
+def _pico_etapas(resultado):
+    picos = [medidas['pico_mb'] for medidas in resultado['etapas'].values() if medidas.get('pico_mb') is not None]
+    return max(picos) if picos else None
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de MetaReviewX")
+    parser.add_argument('--filas', type=int, default=100000, help="Número de filas sintéticas")
+    parser.add_argument('--archivos', type=int, default=8, help="Número de exportaciones para la prueba de ingesta")
+    parser.add_argument('--trabajadores', type=int, default=None, help="Trabajadores para la lectura en paralelo")
+    parser.add_argument('--semilla', type=int, default=0, help="Semilla del generador")
+    subparsers = parser.add_subparsers(dest='comando')
+    
+    etapas = subparsers.add_parser('etapas', help="Tiempo y memoria de cada etapa con proyectos sintéticos")
+    etapas.add_argument('--tamaños', type=int, nargs='+', default=list(TAMAÑOS), help="Filas de cada proyecto")
+    etapas.add_argument('--duplicados', type=float, default=0.2, help="Fracción de registros duplicados")
+    etapas.add_argument('--años', type=int, nargs=2, default=[1990, 2025], metavar=('DESDE', 'HASTA'),
+                        help="Rango de años de publicación")
+    etapas.add_argument('--desorden', type=float, default=0.3, help="Fracción de fechas con formatos mezclados")
+    etapas.add_argument('--modo', choices=('exacto', 'difuso'), default='exacto', help="Modo de duplicados")
+    etapas.add_argument('--memoria', choices=metodos_memoria(), default=metodos_memoria()[0],
+                        help="Cómo medir el pico de memoria de cada etapa (tracemalloc ralentiza mucho la escritura)")
+    etapas.add_argument('--json', default=None, help="Guardar los resultados en este archivo JSON")
+    
+    comparar = subparsers.add_parser('comparar', help="Comparar dos archivos de resultados JSON")
+    comparar.add_argument('anterior', help="Resultados de referencia")
+    comparar.add_argument('actual', help="Resultados nuevos")
+    comparar.add_argument('--tolerancia', type=float, default=0.1, help="Empeoramiento admitido (0.1 = 10%%)")
+    
+    subparsers.add_parser('escritura', help="Comparar el Excel escrito en un proceso y en varios (--filas, --trabajadores)")
+    parquet = subparsers.add_parser('parquet', help="Comparar el Parquet escrito en memoria y por bloques (--filas)")
+    subparsers.add_parser('fusion', help="Comprobar los grupos de fusión por ISBN (capítulos de un mismo libro)")
+    parquet.add_argument('--filas-bloque', type=int, default=1000, help="Filas por bloque del modo por bloques")
+    args = parser.parse_args()
+    
+    if args.comando == 'etapas':
+        resultados = ejecutar_etapas(args.tamaños, tasa_duplicados=args.duplicados, años=tuple(args.años),
+                                     desorden=args.desorden, modo=args.modo, memoria=args.memoria,
+                                     semilla=args.semilla)
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump(resultados, f, indent=2, ensure_ascii=False)
+        return 0
+    if args.comando == 'comparar':
+        with open(args.anterior, encoding='utf-8') as f:
+            anterior = json.load(f)
+        with open(args.actual, encoding='utf-8') as f:
+            actual = json.load(f)
+        return 1 if comparar_resultados(anterior, actual, args.tolerancia) else 0
+    if args.comando == 'escritura':
+        return 0 if benchmark_escritura(args.filas, args.trabajadores, args.semilla) else 1
+    if args.comando == 'parquet':
+        return 0 if comprobar_parquet(args.filas, args.filas_bloque, args.semilla) else 1
+    if args.comando == 'fusion':
+        return 0 if comprobar_fusion() else 1
+    
+    benchmark_años(args.filas, args.semilla)
+    benchmark_ingesta(args.archivos, args.filas, args.trabajadores, args.semilla)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
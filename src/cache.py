@@ -0,0 +1,120 @@
+import hashlib
+import importlib.util
+import os
+import pandas as pd
+
+VERSION_CACHE = 2  # Cambiar cuando cambie la forma en que se leen o normalizan los CSV (tipos de leer_csv)
+TAMAÑO_MAXIMO = 2 * 1024**3  # 2 GB
+BLOQUE_HASH = 1024 * 1024
+
+def directorio_predeterminado():
+    """Directorio de caché del usuario (se puede cambiar con METAREVIEWX_CACHE)"""
+    if os.environ.get('METAREVIEWX_CACHE'):
+        return os.environ['METAREVIEWX_CACHE']
+    base = os.environ.get('LOCALAPPDATA') or os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'metareviewx')
+
+def huella_archivo(archivo, columnas=None):
+    """Clave de caché: ruta, tamaño, fecha de modificación, hash del contenido y columnas pedidas"""
+    estado = os.stat(archivo)
+    contenido = hashlib.blake2b(digest_size=16)
+    with open(archivo, 'rb') as f:
+        for bloque in iter(lambda: f.read(BLOQUE_HASH), b''):
+            contenido.update(bloque)
+
+    huella = hashlib.blake2b(digest_size=16)
+    for parte in (VERSION_CACHE, os.path.abspath(archivo), estado.st_size, estado.st_mtime_ns,
+                  contenido.hexdigest(), sorted(columnas) if columnas is not None else None):
+        huella.update(repr(parte).encode('utf-8'))
+    return huella.hexdigest()
+
+class SourceCache:
+    """Caché en disco de los CSV ya leídos y normalizados, con desalojo LRU por tamaño"""
+
+    def __init__(self, directorio=None, tamaño_maximo=TAMAÑO_MAXIMO):
+        self.directorio = directorio or directorio_predeterminado()
+        self.tamaño_maximo = tamaño_maximo
+        # Feather (Arrow) permite leer con memory-map; sin pyarrow se usa pickle
+        self.usar_feather = importlib.util.find_spec('pyarrow') is not None
+
+    def _ruta(self, clave, extension):
+        return os.path.join(self.directorio, f"{clave}.{extension}")
+
+    def cargar(self, clave):
+        """Devuelve el DataFrame guardado para la clave, o None si no está en caché"""
+        for extension in ('feather', 'pkl'):
+            ruta = self._ruta(clave, extension)
+            if not os.path.exists(ruta):
+                continue
+            try:
+                if extension == 'feather':
+                    from pyarrow import feather
+                    df = feather.read_feather(ruta, memory_map=True)
+                else:
+                    df = pd.read_pickle(ruta)
+            except Exception:
+                return None
+            os.utime(ruta)  # Marca de último uso para el desalojo LRU
+            return df
+        return None
+
+    def guardar(self, clave, df):
+        """Guarda el DataFrame de forma atómica (archivo temporal y renombrado)"""
+        os.makedirs(self.directorio, exist_ok=True)
+        if self.usar_feather:
+            ruta = self._ruta(clave, 'feather')
+            try:
+                df.to_feather(ruta + '.tmp', compression='uncompressed')
+                os.replace(ruta + '.tmp', ruta)
+                return
+            except Exception:
+                # Columnas con tipos mezclados que Arrow no admite: se guarda con pickle
+                if os.path.exists(ruta + '.tmp'):
+                    os.remove(ruta + '.tmp')
+        ruta = self._ruta(clave, 'pkl')
+        df.to_pickle(ruta + '.tmp')
+        os.replace(ruta + '.tmp', ruta)
+
+    def _entradas(self):
+        if not os.path.isdir(self.directorio):
+            return []
+        entradas = []
+        for nombre in os.listdir(self.directorio):
+            if nombre.endswith(('.feather', '.pkl')):
+                ruta = os.path.join(self.directorio, nombre)
+                try:
+                    estado = os.stat(ruta)
+                except FileNotFoundError:
+                    continue
+                entradas.append((estado.st_mtime, estado.st_size, ruta))
+        return entradas
+
+    def desalojar(self):
+        """Borra las entradas usadas hace más tiempo hasta quedar por debajo del tamaño máximo"""
+        entradas = sorted(self._entradas())
+        total = sum(tamaño for _, tamaño, _ in entradas)
+        for _, tamaño, ruta in entradas:
+            if total <= self.tamaño_maximo:
+                break
+            try:
+                os.remove(ruta)
+            except OSError:  # Ya borrada, o abierta con memory-map en Windows
+                continue
+            total -= tamaño
+
+    def limpiar(self):
+        """Borra todas las entradas de la caché y devuelve cuántas había"""
+        entradas = self._entradas()
+        borradas = 0
+        for _, _, ruta in entradas:
+            try:
+                os.remove(ruta)
+                borradas += 1
+            except OSError:
+                pass
+        return borradas
+
+    def tamaño(self):
+        """Número de entradas y bytes ocupados"""
+        entradas = self._entradas()
+        return len(entradas), sum(tamaño for _, tamaño, _ in entradas)
@@ -0,0 +1,250 @@
+import argparse
+import glob
+import json
+import os
+import sys
+from translations import TranslationManager
+
+# Solo módulos ligeros al importar: pandas, openpyxl y el procesamiento se cargan al ejecutar el primer trabajo,
+# para que --help y los errores de validación respondan al instante. PyQt5 no se importa nunca.
+
+IDIOMAS = ('en', 'es')
+FORMATOS = ('xlsx', 'parquet', 'csv', 'sqlite')
+OPCIONES_SI_NO = ('fuzzy', 'incremental', 'cache', 'chunked', 'merge')
+
+traducciones = TranslationManager()
+
+def _texto(idioma, clave, *args):
+    """Mensaje de la línea de órdenes en el idioma elegido con -l/--language"""
+    return traducciones.get_translation(idioma, clave, *args)
+
+def idioma_mensajes(argv=None):
+    """Idioma de la ayuda y de los errores, leído de -l/--language antes de construir el parser"""
+    previo = argparse.ArgumentParser(add_help=False)
+    previo.add_argument('-l', '--language', default='en')
+    idioma = previo.parse_known_args(argv)[0].language
+    return idioma if idioma in IDIOMAS else 'en'
+
+def _es_entero(valor):
+    """Entero mayor que 0 (un booleano de JSON no cuenta como número)"""
+    return isinstance(valor, int) and not isinstance(valor, bool) and valor >= 1
+
+def _es_textos(valor):
+    """Texto o lista de textos"""
+    return isinstance(valor, str) or (isinstance(valor, list) and all(isinstance(v, str) for v in valor))
+
+def _json(valor):
+    """Valor tal como se escribe en el manifiesto, para que "4" y 4 se distingan en los errores"""
+    return json.dumps(valor, ensure_ascii=False, default=str)
+
+def _lista(valor):
+    """Lista de nombres a partir de un texto separado por comas o de una lista"""
+    if isinstance(valor, str):
+        valor = valor.split(',')
+    return [v.strip() for v in valor or [] if v.strip()]
+
+def expandir_entradas(patrones, base=None):
+    """Expande patrones glob (relativos a base) a una lista ordenada de archivos sin repetir"""
+    archivos = []
+    for patron in patrones:
+        if base is not None and not os.path.isabs(patron):
+            patron = os.path.join(base, patron)
+        encontrados = sorted(glob.glob(os.path.expanduser(patron), recursive=True))
+        # Un nombre sin comodines que no existe se deja pasar para que el informe lo señale
+        archivos.extend(encontrados if encontrados or glob.has_magic(patron) else [patron])
+    return list(dict.fromkeys(archivos))
+
+def _trabajo(datos, opciones, base=None):
+    """Normaliza un trabajo (de la línea de órdenes o de un manifiesto) y devuelve (trabajo, error)
+
+    Los valores de un manifiesto se comprueban con su tipo de JSON: un valor mal escrito es un error de uso en
+    vez de un fallo a mitad del procesamiento. Los errores van en el idioma de los mensajes (-l/--language).
+    """
+    mensaje = lambda clave, *args: _texto(opciones.language, clave, *args)
+    if not isinstance(datos, dict):
+        return None, mensaje('cli_invalid_manifest')
+    entradas = datos.get('inputs', [])
+    if not _es_textos(entradas):
+        return None, mensaje('cli_invalid_texts', 'inputs', _json(entradas))
+    archivos = expandir_entradas([entradas] if isinstance(entradas, str) else entradas, base)
+    salida = datos.get('output')
+    if not archivos:
+        return None, mensaje('cli_no_inputs')
+    if not salida:
+        return None, mensaje('cli_no_output')
+    if not isinstance(salida, str):
+        return None, mensaje('cli_invalid_text', 'output', _json(salida))
+    if base is not None and not os.path.isabs(salida):
+        salida = os.path.join(base, salida)
+    directorio = os.path.dirname(os.path.abspath(salida))
+    if not os.path.isdir(directorio):
+        return None, mensaje('cli_no_output_dir', directorio)
+
+    idioma = datos.get('language', opciones.language)
+    if not isinstance(idioma, str) or idioma not in IDIOMAS:
+        return None, mensaje('cli_invalid_language', _json(idioma))
+    formato = datos.get('format', opciones.format)
+    if formato is not None and (not isinstance(formato, str) or formato not in FORMATOS):
+        return None, mensaje('cli_invalid_format', _json(formato))
+    enteros = {}
+    for clave, valor in (('workers', opciones.workers), ('chunk_rows', opciones.chunk_rows),
+                         ('max_width', opciones.max_width), ('width_sample', opciones.width_sample)):
+        enteros[clave] = datos.get(clave, valor)
+        if enteros[clave] is not None and not _es_entero(enteros[clave]):
+            return None, mensaje('cli_invalid_positive', clave, _json(enteros[clave]))
+    si_no = {'fuzzy': opciones.fuzzy, 'incremental': opciones.incremental, 'cache': not opciones.no_cache,
+             'chunked': opciones.chunked, 'merge': opciones.merge}
+    for clave in OPCIONES_SI_NO:
+        si_no[clave] = datos.get(clave, si_no[clave])
+        if not isinstance(si_no[clave], bool):
+            return None, mensaje('cli_invalid_flag', clave, _json(si_no[clave]))
+    columnas = datos.get('columns', opciones.columns)
+    prioridad = datos.get('source_priority', opciones.source_priority)
+    for clave, valor in (('columns', columnas), ('source_priority', prioridad)):
+        if valor is not None and not _es_textos(valor):
+            return None, mensaje('cli_invalid_texts', clave, _json(valor))
+    reglas = datos.get('merge_rules')
+    if reglas is None:
+        reglas = {}
+        for regla in opciones.merge_rule:
+            columna, separador, nombre = regla.rpartition('=')
+            if not separador or not columna.strip():
+                return None, mensaje('cli_invalid_merge_rule', regla)
+            reglas[columna.strip()] = nombre.strip()
+    elif not isinstance(reglas, dict) or not all(isinstance(v, str) for v in reglas.values()):
+        return None, mensaje('cli_invalid_merge_rules', _json(reglas))
+    return {
+        'input_files': archivos,
+        'output_file': salida,
+        'language': idioma,
+        'columnas': _lista(columnas) or None,
+        'trabajadores': enteros['workers'],
+        'modo_duplicados': 'difuso' if si_no['fuzzy'] else 'exacto',
+        'usar_cache': si_no['cache'],
+        'directorio_cache': opciones.cache_dir,
+        'incremental': si_no['incremental'],
+        'formato': formato,
+        'por_bloques': si_no['chunked'],
+        'filas_bloque': enteros['chunk_rows'],
+        'ancho_maximo': enteros['max_width'],
+        'muestra_anchos': enteros['width_sample'],
+        'fusionar': si_no['merge'],
+        'prioridad_fuentes': _lista(prioridad) or None,
+        'reglas_fusion': reglas or None,
+    }, None
+
+def leer_manifiesto(ruta, opciones):
+    """Trabajos de un manifiesto JSON: una lista de trabajos o {"jobs": [...]}; las rutas son relativas al manifiesto"""
+    with open(ruta, encoding='utf-8') as f:
+        contenido = json.load(f)
+    trabajos = contenido.get('jobs', []) if isinstance(contenido, dict) else contenido
+    if not isinstance(trabajos, list):
+        raise ValueError(f"{ruta}: {_texto(opciones.language, 'cli_invalid_manifest')}")
+    base = os.path.dirname(os.path.abspath(ruta))
+    resultado = []
+    for numero, datos in enumerate(trabajos, start=1):
+        trabajo, error = _trabajo(datos, opciones, base)
+        if error:
+            raise ValueError(_texto(opciones.language, 'cli_manifest_job', ruta, numero, error))
+        resultado.append(trabajo)
+    return resultado
+
+def crear_parser(idioma='en'):
+    """Parser de la línea de órdenes con la ayuda en el idioma indicado"""
+    ayuda = lambda clave: _texto(idioma, clave)
+    parser = argparse.ArgumentParser(prog='metareviewx', description=ayuda('cli_description'))
+    parser.add_argument('inputs', nargs='*', help=ayuda('cli_inputs'))
+    parser.add_argument('-o', '--output', help=ayuda('cli_output'))
+    parser.add_argument('--format', choices=FORMATOS, default=None, help=ayuda('cli_format'))
+    parser.add_argument('-l', '--language', choices=IDIOMAS, default='en', help=ayuda('cli_language'))
+    parser.add_argument('--fuzzy', action='store_true', help=ayuda('cli_fuzzy'))
+    parser.add_argument('--incremental', action='store_true', help=ayuda('cli_incremental'))
+    parser.add_argument('--merge', action='store_true', help=ayuda('cli_merge'))
+    parser.add_argument('--source-priority', default=None, help=ayuda('cli_source_priority'))
+    parser.add_argument('--merge-rule', action='append', default=[], metavar=ayuda('cli_merge_rule_metavar'),
+                        help=ayuda('cli_merge_rule'))
+    parser.add_argument('--chunked', action='store_true', help=ayuda('cli_chunked'))
+    parser.add_argument('--chunk-rows', type=int, default=None, help=ayuda('cli_chunk_rows'))
+    parser.add_argument('--max-width', type=int, default=None, help=ayuda('cli_max_width'))
+    parser.add_argument('--width-sample', type=int, default=None, help=ayuda('cli_width_sample'))
+    parser.add_argument('--columns', default=None, help=ayuda('cli_columns'))
+    parser.add_argument('--workers', type=int, default=None, help=ayuda('cli_workers'))
+    parser.add_argument('--no-cache', action='store_true', help=ayuda('cli_no_cache'))
+    parser.add_argument('--cache-dir', default=None, help=ayuda('cli_cache_dir'))
+    parser.add_argument('--clear-cache', action='store_true', help=ayuda('cli_clear_cache'))
+    parser.add_argument('--manifest', action='append', default=[], help=ayuda('cli_manifest'))
+    parser.add_argument('-q', '--quiet', action='store_true', help=ayuda('cli_quiet'))
+    parser.add_argument('--timings', action='store_true', help=ayuda('cli_timings'))
+    parser.add_argument('--profile', choices=('cprofile', 'tracemalloc'), default=None, help=ayuda('cli_profile'))
+    parser.add_argument('--profile-output', default=None, help=ayuda('cli_profile_output'))
+    return parser
+
+def mostrar_etapa(evento, registro, idioma='en'):
+    """Hook de instrumentación que escribe cada etapa en stderr"""
+    sangria = '  ' * registro['nivel']
+    if evento == 'inicio':
+        print(f"{sangria}> {registro['etapa']}", file=sys.stderr, flush=True)
+        return
+    detalles = [f"{registro['segundos']:.2f} s"]
+    if registro['filas'] is not None:
+        detalles.append(_texto(idioma, 'cli_stage_rows', registro['filas']))
+    if registro['rss_mb'] is not None:
+        detalles.append(f"RSS {registro['rss_mb']:.0f} MB")
+    estado = _texto(idioma, 'cli_stage_interrupted' if registro.get('interrumpida') else 'cli_stage_end')
+    print(f"{sangria}< {registro['etapa']} {estado}: {', '.join(detalles)}", file=sys.stderr, flush=True)
+
+def archivo_perfil(ruta, numero, total):
+    """Con varios trabajos cada uno guarda su perfil en un archivo numerado"""
+    if ruta is None or total == 1:
+        return ruta
+    raiz, extension = os.path.splitext(ruta)
+    return f"{raiz}.{numero}{extension}"
+
+def main(argv=None):
+    parser = crear_parser(idioma_mensajes(argv))
+    opciones = parser.parse_args(argv)
+
+    # Validación completa antes de importar nada pesado
+    trabajos = []
+    if opciones.inputs or opciones.output:
+        trabajo, error = _trabajo({'inputs': opciones.inputs, 'output': opciones.output}, opciones)
+        if error:
+            parser.error(error)
+        trabajos.append(trabajo)
+    for manifiesto in opciones.manifest:
+        try:
+            trabajos.extend(leer_manifiesto(manifiesto, opciones))
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+    if not trabajos and not opciones.clear_cache:
+        parser.error(_texto(opciones.language, 'cli_no_jobs'))
+
+    if opciones.clear_cache:
+        from cache import SourceCache
+        cache = SourceCache(opciones.cache_dir)
+        print(_texto(opciones.language, 'cli_cache_cleared', cache.limpiar(), cache.directorio))
+
+    from processing import process_files
+    from instrumentation import EXTENSIONES_PERFIL
+    ruta_perfil = None
+    if opciones.profile:
+        ruta_perfil = opciones.profile_output or f"metareviewx{EXTENSIONES_PERFIL[opciones.profile]}"
+    etapa = lambda evento, registro: mostrar_etapa(evento, registro, opciones.language)
+    fallidos = 0
+    for numero, trabajo in enumerate(trabajos, start=1):
+        if len(trabajos) > 1:
+            print(f"[{numero}/{len(trabajos)}] {trabajo['output_file']}", flush=True)
+        # Las líneas del informe se muestran a medida que se generan
+        al_informar = None if opciones.quiet else lambda linea: print(linea, flush=True)
+        ok, informe = process_files(al_informar=al_informar, hooks=[etapa] if opciones.timings else [],
+                                    perfil=opciones.profile,
+                                    archivo_perfil=archivo_perfil(ruta_perfil, numero, len(trabajos)), **trabajo)
+        if opciones.quiet:
+            print(f"{'OK' if ok else 'ERROR'}: {trabajo['output_file']}")
+            if not ok:
+                print(informe)
+        fallidos += not ok
+    return 1 if fallidos else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
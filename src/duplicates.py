@@ -0,0 +1,261 @@
+import difflib
+import html
+import numpy as np
+import pandas as pd
+
+try:
+    from rapidfuzz.fuzz import ratio as _ratio_rapidfuzz
+except ImportError:  # rapidfuzz es opcional: sin él se usa difflib
+    _ratio_rapidfuzz = None
+
+SIMILITUD_RAPIDA = _ratio_rapidfuzz is not None  # Con difflib la detección difusa es mucho más lenta
+
+LARGO_BLOQUE = 12    # Caracteres del prefijo/sufijo que forman cada bloque
+VENTANA = 10         # Vecinos comparados dentro de un bloque ordenado
+LARGO_PRINCIPAL = 20 # Largo mínimo del título principal para emparejarlo sin subtítulo
+
+def normalizar_titulos(serie):
+    """Normaliza títulos: entidades HTML, etiquetas, acentos, mayúsculas y puntuación"""
+    textos = serie.astype(object).where(serie.notna(), '').astype(str)
+    con_entidades = textos.str.contains('&', regex=False)
+    if con_entidades.any():
+        textos = textos.where(~con_entidades, textos[con_entidades].map(html.unescape))
+    return (textos.str.replace(r'<[^>]+>', ' ', regex=True)
+                  .str.normalize('NFKD')
+                  .str.replace('[\u0300-\u036f]', '', regex=True)
+                  .str.lower()
+                  .str.replace(r'[\W_]+', ' ', regex=True)
+                  .str.strip())
+
+SEPARADOR_SUBTITULO = r':|\s[-–—]\s|\.\s'
+
+def titulos_principales(serie, normalizados):
+    """Parte del título anterior al subtítulo (separado por ':', ' - ' o '. '), normalizada"""
+    textos = serie.astype(object).where(serie.notna(), '').astype(str)
+    principales = normalizados.copy()
+    # Solo se recalculan los títulos que tienen separador
+    con_separador = textos.str.contains(SEPARADOR_SUBTITULO, regex=True).to_numpy()
+    if con_separador.any():
+        recortados = textos[con_separador].str.replace(f'({SEPARADOR_SUBTITULO}).*$', '', regex=True)
+        principales[con_separador] = normalizar_titulos(recortados).to_numpy()
+    return principales
+
+def codigos_titulo(serie):
+    """Código del título normalizado de cada fila y los títulos distintos de la serie
+
+    Devuelve (codigos, codigos_crudos, crudos, normalizados): codigos numera los títulos normalizados en orden
+    de aparición (-1 si la fila no tiene título o queda vacío al normalizarlo), codigos_crudos es la posición de
+    cada fila en crudos (-1 si falta) y normalizados es crudos normalizado. Cada título distinto se normaliza
+    una sola vez.
+    """
+    codigos_crudos, crudos = pd.factorize(serie)
+    crudos = pd.Series(crudos, dtype=object)
+    normalizados = normalizar_titulos(crudos)
+    codigos_normalizados, _ = pd.factorize(normalizados)
+    codigos_normalizados[(normalizados == '').to_numpy()] = -1
+    return np.append(codigos_normalizados, -1)[codigos_crudos], codigos_crudos, crudos, normalizados
+
+def normalizar_doi(serie):
+    """Normaliza DOIs quitando prefijos de URL y mayúsculas; los vacíos quedan como NaN"""
+    dois = (serie.astype(object).where(serie.notna(), '').astype(str)
+                 .str.strip()
+                 .str.lower()
+                 .str.replace(r'^(https?://(dx\.)?doi\.org/|doi:\s*)', '', regex=True))
+    return dois.where(dois != '')
+
+def similitud(a, b):
+    """Similitud entre 0 y 1 de dos textos (rapidfuzz si está instalado, si no difflib)"""
+    if _ratio_rapidfuzz is not None:
+        return _ratio_rapidfuzz(a, b) / 100
+    return difflib.SequenceMatcher(None, a, b, autojunk=False).ratio()
+
+def _similares(a, b, umbral):
+    """Descarta primero por caracteres comunes antes de calcular la similitud completa"""
+    if _ratio_rapidfuzz is None:
+        comparador = difflib.SequenceMatcher(None, a, b, autojunk=False)
+        return comparador.quick_ratio() >= umbral and comparador.ratio() >= umbral
+    return similitud(a, b) >= umbral
+
+def pares_similares(titulos, umbral, largo_bloque=LARGO_BLOQUE, ventana=VENTANA):
+    """Pares (i, j) de títulos únicos similares; solo se comparan vecinos dentro de bloques de prefijo y de sufijo
+
+    Títulos que solo difieren en un número (partes, años, versiones) no son el mismo artículo: los números de
+    cada título forman parte del bloque, así que nunca se comparan.
+    """
+    serie = pd.Series(titulos, dtype=object)
+    # Los números de cada título y su largo se calculan una sola vez, no en cada par
+    numeros = serie.str.findall(r'\d+').str.join(' ')
+    largos = serie.str.len().to_numpy()
+    pares = []
+    for claves in (serie.str[:largo_bloque], serie.str[-largo_bloque:]):
+        claves = claves + '|' + numeros
+        repetidas = claves.duplicated(keep=False).to_numpy() & (largos > 0)
+        if not repetidas.any():
+            continue
+        candidatos = pd.DataFrame({'clave': claves[repetidas], 'titulo': serie[repetidas]}).sort_values(['clave', 'titulo'])
+        posiciones = candidatos.index.to_numpy()
+        bloques, _ = pd.factorize(candidatos['clave'])
+        textos = candidatos['titulo'].to_numpy()
+        largos_bloque = largos[posiciones]
+        # Cada título con sus `ventana` vecinos siguientes del mismo bloque, descartando antes por longitud
+        for salto in range(1, min(ventana, len(posiciones) - 1) + 1):
+            i = np.arange(len(posiciones) - salto)
+            j = i + salto
+            parecidas = 2 * np.minimum(largos_bloque[i], largos_bloque[j]) / (largos_bloque[i] + largos_bloque[j])
+            validos = (bloques[i] == bloques[j]) & (parecidas >= umbral)
+            pares.extend((posiciones[a], posiciones[b]) for a, b in zip(i[validos], j[validos])
+                         if _similares(textos[a], textos[b], umbral))
+    return pares
+
+def _unir_pares(n, pares):
+    """Union-find sobre n elementos; devuelve el representante de cada uno"""
+    padres = list(range(n))
+    def raiz(x):
+        while padres[x] != x:
+            padres[x] = padres[padres[x]]
+            x = padres[x]
+        return x
+    for a, b in pares:
+        ra, rb = raiz(a), raiz(b)
+        if ra != rb:
+            padres[max(ra, rb)] = min(ra, rb)
+    return np.array([raiz(x) for x in range(n)], dtype=np.int64)
+
+def componentes(claves, n):
+    """Etiqueta las filas que comparten alguna clave (códigos >= 0) con la menor posición de su grupo"""
+    etiquetas = np.arange(n, dtype=np.int64)
+    while True:
+        anteriores = etiquetas
+        for codigos in claves:
+            validos = codigos >= 0
+            if not validos.any():
+                continue
+            minimos = np.full(codigos.max() + 1, n, dtype=np.int64)
+            np.minimum.at(minimos, codigos[validos], etiquetas[validos])
+            etiquetas = etiquetas.copy()
+            etiquetas[validos] = np.minimum(etiquetas[validos], minimos[codigos[validos]])
+        # Salto de punteros: cada fila pasa a la etiqueta de su etiqueta
+        while True:
+            siguientes = etiquetas[etiquetas]
+            if np.array_equal(siguientes, etiquetas):
+                break
+            etiquetas = siguientes
+        if np.array_equal(etiquetas, anteriores):
+            return etiquetas
+
+def agrupar_duplicados(df, columna_titulo='Title', umbral=0.9, columna_doi='DOI'):
+    """Agrupa registros casi duplicados (título normalizado, título sin subtítulo, similitud y DOI)"""
+    claves = []
+    if columna_titulo in df.columns:
+        codigos, _, crudos, normalizados = codigos_titulo(df[columna_titulo])
+        unicos = pd.unique(normalizados)
+
+        # Enlaces entre títulos únicos: similitud dentro de bloques y título principal igual a otro título completo
+        pares = pares_similares(unicos, umbral) if umbral < 1 else []
+        principales = titulos_principales(crudos, normalizados)
+        con_subtitulo = ((principales != normalizados) & (principales.str.len() >= LARGO_PRINCIPAL)).to_numpy()
+        destino = pd.Index(unicos).get_indexer(principales[con_subtitulo])
+        origen = pd.Index(unicos).get_indexer(normalizados[con_subtitulo])
+        pares.extend(zip(origen[destino >= 0], destino[destino >= 0]))
+
+        grupo_titulo = _unir_pares(len(unicos), pares)
+        claves.append(np.where(codigos >= 0, grupo_titulo[np.maximum(codigos, 0)], -1))
+
+    if columna_doi and columna_doi in df.columns:
+        codigos_doi, _ = pd.factorize(normalizar_doi(df[columna_doi]))
+        claves.append(codigos_doi)
+
+    return componentes(claves, len(df))
+
+def huellas(serie):
+    """Hash de 64 bits de cada valor de una serie (los textos iguales tienen la misma huella en todos los bloques)"""
+    return pd.util.hash_pandas_object(serie, index=False).to_numpy()
+
+def huellas_difusas(titulos, dois=None):
+    """Huellas del título normalizado, del título sin subtítulo y del DOI normalizado (0 si faltan)
+
+    Son las claves de agrupar_duplicados en una forma compacta que se puede calcular bloque a bloque.
+    """
+    vacias = np.zeros(len(titulos), dtype=np.uint64)
+    if titulos is None:
+        normalizadas = principales = vacias
+    else:
+        _, codigos, crudos, normalizados = codigos_titulo(titulos)
+        recortados = titulos_principales(crudos, normalizados)
+        con_subtitulo = ((recortados != normalizados) & (recortados.str.len() >= LARGO_PRINCIPAL)).to_numpy()
+        h_normalizados = np.where((normalizados != '').to_numpy(), huellas(normalizados), 0).astype(np.uint64)
+        h_principales = np.where(con_subtitulo, huellas(recortados), 0).astype(np.uint64)
+        # Un centinela al final para las filas sin título (código -1)
+        normalizadas = np.append(h_normalizados, np.uint64(0))[codigos]
+        principales = np.append(h_principales, np.uint64(0))[codigos]
+    if dois is None:
+        return normalizadas, principales, vacias
+    dois = normalizar_doi(dois)
+    return normalizadas, principales, np.where(dois.notna().to_numpy(), huellas(dois), 0).astype(np.uint64)
+
+def agrupar_huellas(normalizadas, principales, dois):
+    """Agrupa casi duplicados a partir de huellas_difusas
+
+    Equivale a agrupar_duplicados sin la comparación por similitud, que necesita los textos: enlaza títulos
+    normalizados iguales, títulos cuyo título principal es otro título completo y DOIs iguales.
+    """
+    codigos, unicos = pd.factorize(normalizadas)
+    codigos[normalizadas == 0] = -1
+    # El título principal enlaza la fila con las que tienen ese título completo
+    destino = pd.Index(unicos).get_indexer(principales)
+    enlaces = np.where((principales != 0) & (destino >= 0) & (codigos >= 0), destino, codigos)
+    codigos_doi, _ = pd.factorize(dois)
+    codigos_doi[dois == 0] = -1
+    return componentes([codigos, enlaces, codigos_doi], len(normalizadas))
+
+def resumir_grupos(etiquetas, titulos):
+    """Máscara de filas duplicadas y conteo de cada grupo (con el primer título como nombre)"""
+    tamaños = np.bincount(etiquetas, minlength=len(etiquetas))
+    mascara = tamaños[etiquetas] > 1
+    representantes = np.flatnonzero(tamaños > 1)
+    conteo = pd.Series(tamaños[representantes], index=pd.Index(titulos.to_numpy()[representantes], name=titulos.name), name='count')
+    return mascara, conteo.sort_values(ascending=False, kind='stable')
+
+class MascaraBits:
+    """Máscara de duplicados guardada como bits (np.packbits): un bit por fila en lugar de un byte
+
+    Se indexa como un array booleano: un entero da un bool y un slice o un array de posiciones, un array
+    booleano con solo esas filas (se desempaquetan los bytes necesarios, no la máscara entera).
+    """
+
+    def __init__(self, mascara):
+        mascara = np.asarray(mascara, dtype=bool)
+        self.filas = len(mascara)
+        self.bits = np.packbits(mascara)
+
+    def __len__(self):
+        return self.filas
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            inicio, fin, paso = item.indices(self.filas)
+            if paso != 1:
+                return self[np.arange(inicio, fin, paso)]
+            if fin <= inicio:
+                return np.zeros(0, dtype=bool)
+            desplazamiento = inicio % 8
+            bytes_ = self.bits[inicio // 8:(fin + 7) // 8]
+            return np.unpackbits(bytes_, count=desplazamiento + fin - inicio)[desplazamiento:].astype(bool)
+        posiciones = np.asarray(item)
+        if posiciones.ndim == 0:
+            posicion = int(posiciones)
+            if posicion < 0:
+                posicion += self.filas
+            if not 0 <= posicion < self.filas:
+                raise IndexError(posicion)
+            return bool(self.bits[posicion >> 3] >> (7 - (posicion & 7)) & 1)
+        posiciones = np.where(posiciones < 0, posiciones + self.filas, posiciones)
+        return (self.bits[posiciones >> 3] >> (7 - (posiciones & 7)) & 1).astype(bool)
+
+    def __array__(self, dtype=None, copy=None):
+        mascara = np.unpackbits(self.bits, count=self.filas).astype(bool)
+        return mascara if dtype is None else mascara.astype(dtype)
+
+    def sum(self):
+        """Número de filas marcadas, contado sobre los bytes empaquetados"""
+        return int(np.unpackbits(self.bits).sum())
@@ -0,0 +1,161 @@
+import numpy as np
+import pandas as pd
+from duplicates import codigos_titulo, componentes, normalizar_doi, titulos_principales
+
+# Fusión de registros: cada grupo de duplicados (de una o varias fuentes) se reduce a un registro canónico que
+# toma cada campo de la fuente preferida que lo trae. Los grupos salen de un índice de claves (DOI, ISBN y título
+# normalizado) y todo el trabajo es vectorizado, así que el tiempo crece casi linealmente con los registros.
+
+REGLAS_FUSION = ('prioridad', 'mas_largo', 'union')
+REGLAS_POR_DEFECTO = {'Abstract Note': 'mas_largo', 'Abstract': 'mas_largo', 'abstract': 'mas_largo'}
+COLUMNA_REGISTROS = 'Registros'
+COLUMNA_PROCEDENCIA = 'Procedencia'
+SEPARADOR_UNION = '; '
+
+def _isbn13(isbn):
+    """ISBN-13 de un ISBN de 10 o 13 caracteres sin guiones"""
+    if len(isbn) == 13:
+        return isbn
+    cuerpo = '978' + isbn[:9]
+    control = (10 - sum(int(digito) * (3 if i % 2 else 1) for i, digito in enumerate(cuerpo)) % 10) % 10
+    return cuerpo + str(control)
+
+def normalizar_isbn(serie):
+    """ISBN de cada valor como ISBN-13 sin guiones; los vacíos (o sin ISBN reconocible) quedan como NaN
+
+    Si un valor trae varios ISBN (separados por ';' o espacios) se toma el menor, para que un libro tenga la
+    misma clave aunque las fuentes los listen en otro orden.
+    """
+    # Se normaliza cada valor distinto una sola vez
+    codigos, unicos = pd.factorize(serie)
+    textos = pd.Series(unicos, dtype=object).astype(str).str.upper().str.replace('-', '', regex=False)
+    encontrados = textos.str.findall(r'\b(?:97[89]\d{10}|\d{9}[\dX])\b')
+    isbns = encontrados.map(lambda lista: min(map(_isbn13, lista)) if lista else np.nan).to_numpy(dtype=object)
+    # Un centinela al final para los vacíos (código -1)
+    return pd.Series(np.append(isbns, np.nan)[codigos], index=serie.index, dtype=object)
+
+def grupos_fusion(df, columna_titulo='Title', columna_doi='DOI', columna_isbn='ISBN'):
+    """Grupo de cada registro (la posición del primero de su grupo) según un índice de DOI, ISBN y título
+
+    Dos registros van al mismo grupo si comparten DOI, título normalizado o ISBN y título completo (los
+    capítulos de un libro comparten su ISBN y quedan separados). Un título con subtítulo se une además al registro
+    del mismo ISBN cuyo título completo es su título principal, salvo que ese ISBN y título principal tengan
+    varios subtítulos distintos: son capítulos y unirlos al libro los uniría entre sí. Un título que aparece con
+    DOIs distintos no enlaza registros: son artículos distintos con el mismo nombre (editoriales, reseñas).
+    """
+    n = len(df)
+    claves = []
+    codigos_doi = np.full(n, -1, dtype=np.int64)
+    if columna_doi and columna_doi in df.columns:
+        codigos_doi, _ = pd.factorize(normalizar_doi(df[columna_doi]))
+        claves.append(codigos_doi)
+    if columna_titulo in df.columns:
+        por_titulo, codigos_crudos, crudos, normalizados = codigos_titulo(df[columna_titulo])
+
+        con_doi = (por_titulo >= 0) & (codigos_doi >= 0)
+        dois_por_titulo = pd.Series(codigos_doi[con_doi]).groupby(por_titulo[con_doi]).nunique()
+        ambiguos = dois_por_titulo.index[dois_por_titulo > 1].to_numpy()
+        claves.append(np.where(np.isin(por_titulo, ambiguos), -1, por_titulo))
+
+        if columna_isbn and columna_isbn in df.columns:
+            principales = titulos_principales(crudos, normalizados).to_numpy(dtype=object)
+            principales = pd.Series(np.append(principales, '')[codigos_crudos], dtype=object)
+            completos = pd.Series(np.append(normalizados.to_numpy(dtype=object), '')[codigos_crudos], dtype=object)
+            isbns = normalizar_isbn(df[columna_isbn]).reset_index(drop=True)
+            codigos_isbn, unicos = pd.factorize(isbns.str.cat(completos, sep='|').where(completos != ''))
+            claves.append(codigos_isbn)
+
+            # Enlace de cada subtítulo con el registro cuyo título completo es su título principal
+            con_subtitulo = (principales != completos) & (principales != '')
+            clave_principal = isbns.str.cat(principales, sep='|').where(con_subtitulo)
+            variantes = completos[con_subtitulo].groupby(clave_principal[con_subtitulo]).nunique()
+            unica = clave_principal.map(variantes).eq(1).to_numpy()
+            destino = pd.Index(unicos).get_indexer(clave_principal)
+            claves.append(np.where(unica & (destino >= 0), destino, codigos_isbn))
+    return componentes(claves, n)
+
+def _vacios(serie):
+    """Celdas sin valor: nulas o con texto en blanco"""
+    vacios = np.array(serie.isna())
+    if serie.dtype == object or isinstance(serie.dtype, pd.StringDtype):
+        vacios |= (serie.astype(str).str.strip() == '').to_numpy()
+    return vacios
+
+def _primeros(grupo_fila, candidatas):
+    """La primera de las filas candidatas de cada grupo (candidatas ordenadas por grupo)"""
+    if not len(candidatas):
+        return candidatas
+    grupos = grupo_fila[candidatas]
+    return candidatas[np.r_[True, grupos[1:] != grupos[:-1]]]
+
+def fusionar_registros(df, grupos, prioridad_fuentes=None, reglas=None, columna_fuente='Fuente'):
+    """Un registro canónico por grupo, en el lugar del primer registro del grupo
+
+    prioridad_fuentes: nombres de fuente de la preferida a la menos preferida; las que no aparecen van detrás, en
+    el orden de los registros. reglas: columna -> 'prioridad' (el primer valor no vacío según la prioridad, la
+    regla por defecto), 'mas_largo' (el texto más largo, por defecto en los resúmenes) o 'union' (los valores
+    distintos, separados por '; '). El registro canónico tiene la fuente preferida del grupo y dos columnas más:
+    Registros (cuántos se fusionaron) y Procedencia (la fuente de cada campo que no sale de esa fuente).
+    """
+    reglas = dict(REGLAS_POR_DEFECTO, **(reglas or {}))
+    for columna, regla in reglas.items():
+        if regla not in REGLAS_FUSION:
+            raise ValueError(f"regla de fusión no válida para {columna}: {regla}")
+    n = len(df)
+    grupos = np.asarray(grupos, dtype=np.int64)
+    tamaños = np.bincount(grupos, minlength=n)
+    representantes = np.flatnonzero(grupos == np.arange(n))
+    fusionado = df.take(representantes)
+    procedencia = np.full(len(representantes), None, dtype=object)
+
+    multiples = np.flatnonzero(tamaños[grupos] > 1)
+    if len(multiples):
+        # Filas de los grupos con más de un registro, por grupo y de la fuente preferida a la menos preferida
+        fuentes = df[columna_fuente].astype(object).to_numpy()
+        rangos = {fuente: rango for rango, fuente in enumerate(prioridad_fuentes or ())}
+        rango = pd.Series(fuentes[multiples]).map(rangos).fillna(len(rangos)).to_numpy()
+        orden = multiples[np.lexsort((multiples, rango, grupos[multiples]))]
+        inicios = np.flatnonzero(np.r_[True, grupos[orden][1:] != grupos[orden][:-1]])
+        grupo_fila = np.repeat(np.arange(len(inicios)), np.diff(np.r_[inicios, len(orden)]))
+        destino = np.searchsorted(representantes, grupos[orden[inicios]])
+        principal = fuentes[orden[inicios]]
+        anotaciones = [[] for _ in inicios]
+
+        columna_resultado = fusionado[columna_fuente].copy()
+        columna_resultado.iloc[destino] = df[columna_fuente].take(orden[inicios]).to_numpy()
+        fusionado[columna_fuente] = columna_resultado
+
+        for columna in df.columns:
+            if columna == columna_fuente:
+                continue
+            valores = df[columna].take(orden).reset_index(drop=True)
+            llenas = np.flatnonzero(~_vacios(valores))
+            regla = reglas.get(columna, 'prioridad')
+            if regla == 'union':
+                tabla = pd.DataFrame({'grupo': grupo_fila[llenas],
+                                      'valor': valores.iloc[llenas].astype(str).to_numpy(),
+                                      'fuente': fuentes[orden[llenas]]}).drop_duplicates(['grupo', 'valor'])
+                por_grupo = tabla.groupby('grupo', sort=True)
+                con_valor = por_grupo.size().index.to_numpy()
+                nuevos = por_grupo['valor'].agg(SEPARADOR_UNION.join).to_numpy()
+                origen = por_grupo['fuente'].agg(lambda f: ' + '.join(dict.fromkeys(f))).to_numpy()
+                columna_resultado = fusionado[columna].astype(object)
+            else:
+                if regla == 'mas_largo':
+                    largos = valores.iloc[llenas].astype(str).str.len().to_numpy()
+                    llenas = llenas[np.lexsort((llenas, -largos, grupo_fila[llenas]))]
+                elegidas = _primeros(grupo_fila, llenas)
+                con_valor = grupo_fila[elegidas]
+                nuevos = valores.iloc[elegidas].to_numpy()
+                origen = fuentes[orden[elegidas]]
+                columna_resultado = fusionado[columna].copy()
+            if not len(con_valor):
+                continue
+            columna_resultado.iloc[destino[con_valor]] = nuevos
+            fusionado[columna] = columna_resultado
+            for grupo in np.flatnonzero(origen != principal[con_valor]):
+                anotaciones[con_valor[grupo]].append(f"{columna}: {origen[grupo]}")
+
+        procedencia[destino] = [SEPARADOR_UNION.join(notas) if notas else None for notas in anotaciones]
+
+    return fusionado.assign(**{COLUMNA_REGISTROS: tamaños[representantes], COLUMNA_PROCEDENCIA: procedencia})
@@ -1,10 +1,66 @@
+import os
 from PyQt5.QtWidgets import (QMainWindow, QVBoxLayout, QHBoxLayout, QLabel, QComboBox, 
-                             QPushButton, QTextEdit, QFileDialog, QWidget, QLineEdit)
-from PyQt5.QtCore import Qt, pyqtSignal
-from processing import process_files
+                             QPushButton, QTextEdit, QFileDialog, QWidget, QLineEdit, QCheckBox, QProgressBar)
+from PyQt5.QtCore import Qt, pyqtSignal, QObject, QThread
+from processing import process_files, ProcesoCancelado, ETAPAS_INFORME
+from cache import SourceCache
 from translations import TranslationManager
 from PyQt5 import QtGui
 
+# Tramo de la barra de progreso que ocupa cada etapa y su texto
+ETAPAS = {
+    'lectura': (0, 40, 'stage_reading'),
+    'duplicados': (40, 55, 'stage_duplicates'),
+    'años': (55, 58, 'stage_years'),
+    'fusion': (58, 60, 'stage_merge'),
+    'escritura': (60, 100, 'stage_writing'),
+}
+
+class ProcessWorker(QObject):
+    """Ejecuta process_files en un hilo aparte y comunica el avance con señales"""
+    progress = pyqtSignal(str, int, int, str)  # etapa, actual, total, detalle
+    line = pyqtSignal(str)                     # Línea nueva del informe
+    stage = pyqtSignal(str, float, object)     # etapa terminada, segundos, filas
+    finished = pyqtSignal(bool, str, bool)     # éxito, informe, cancelado
+    
+    def __init__(self, args, kwargs):
+        super().__init__()
+        self.args = args
+        self.kwargs = kwargs
+        self.cancelled = False
+        self.lines = []
+    
+    def cancel(self):
+        """Pide la cancelación; se hace efectiva en el siguiente aviso de progreso"""
+        self.cancelled = True
+    
+    def report_progress(self, etapa, actual, total, detalle):
+        if self.cancelled:
+            raise ProcesoCancelado()
+        self.progress.emit(etapa, actual, total, str(detalle))
+    
+    def report_line(self, linea):
+        self.lines.append(linea)
+        self.line.emit(linea)
+    
+    def report_stage(self, evento, registro):
+        """Hook de instrumentación: avisa de cada etapa principal terminada"""
+        if evento == 'fin' and registro['nivel'] == 0 and not registro.get('interrumpida'):
+            self.stage.emit(registro['etapa'], registro['segundos'], registro['filas'])
+    
+    def run(self):
+        try:
+            success, report = process_files(*self.args, progreso=self.report_progress,
+                                            al_informar=self.report_line, hooks=[self.report_stage], **self.kwargs)
+        except ProcesoCancelado:
+            self.finished.emit(False, "\n".join(self.lines), True)
+            return
+        except Exception as e:
+            # Un error inesperado no debe dejar la ventana esperando para siempre
+            self.finished.emit(False, "\n".join(self.lines + ["", str(e)]), False)
+            return
+        self.finished.emit(success, report, False)
+
 class MainWindow(QMainWindow):
     language_changed = pyqtSignal(str)  # Señal para cambios de idioma
     
@@ -14,6 +70,8 @@ class MainWindow(QMainWindow):
         self.translation_manager = TranslationManager()
         self.current_language = default_language
         self.updating_language = False  # Bandera para controlar actualizaciones
+        self.worker = None
+        self.worker_thread = None
         self.setWindowIcon(QtGui.QIcon('../assets/icon.ico'))  # Asegúrate de tener el archivo en la ruta correcta
         
         # Lista de widgets que necesitan actualización de idioma
@@ -70,10 +128,42 @@ class MainWindow(QMainWindow):
         output_layout.addWidget(self.output_browse)
         main_layout.addLayout(output_layout)
         
-        # Process button
+        # Processing options
+        options_layout = QHBoxLayout()
+        self.fuzzy_check = QCheckBox()
+        self.cache_check = QCheckBox()
+        self.cache_check.setChecked(True)
+        self.incremental_check = QCheckBox()
+        self.chunked_check = QCheckBox()
+        self.merge_check = QCheckBox()
+        self.clear_cache_btn = QPushButton()
+        self.clear_cache_btn.clicked.connect(self.clear_cache)
+        
+        options_layout.addWidget(self.fuzzy_check)
+        options_layout.addWidget(self.cache_check)
+        options_layout.addWidget(self.incremental_check)
+        options_layout.addWidget(self.chunked_check)
+        options_layout.addWidget(self.merge_check)
+        options_layout.addStretch()
+        options_layout.addWidget(self.clear_cache_btn)
+        main_layout.addLayout(options_layout)
+        
+        # Process and cancel buttons, progress bar
+        process_layout = QHBoxLayout()
         self.process_btn = QPushButton()
         self.process_btn.clicked.connect(self.process)
-        main_layout.addWidget(self.process_btn)
+        self.cancel_btn = QPushButton()
+        self.cancel_btn.setEnabled(False)
+        self.cancel_btn.clicked.connect(self.cancel_processing)
+        
+        process_layout.addWidget(self.process_btn, 1)
+        process_layout.addWidget(self.cancel_btn)
+        main_layout.addLayout(process_layout)
+        
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setValue(0)
+        main_layout.addWidget(self.progress_bar)
         
         # Report area
         self.report_label = QLabel()
@@ -97,7 +187,14 @@ class MainWindow(QMainWindow):
             (self.file_browse, 'browse'),
             (self.output_label, 'output_location'),
             (self.output_browse, 'output_browse'),
+            (self.fuzzy_check, 'fuzzy_duplicates'),
+            (self.cache_check, 'use_cache'),
+            (self.incremental_check, 'incremental_mode'),
+            (self.chunked_check, 'chunked'),
+            (self.merge_check, 'merge_duplicates'),
+            (self.clear_cache_btn, 'clear_cache'),
             (self.process_btn, 'process'),
+            (self.cancel_btn, 'cancel'),
             (self.report_label, 'report_title'),
             (self, 'window_title')  # Para el título de la ventana
         ]
@@ -109,7 +206,7 @@ class MainWindow(QMainWindow):
         for widget, key in self.translatable_widgets:
             if isinstance(widget, QLabel):
                 widget.setText(self.translation_manager.get_translation(self.current_language, key))
-            elif isinstance(widget, QPushButton):
+            elif isinstance(widget, (QPushButton, QCheckBox)):
                 widget.setText(self.translation_manager.get_translation(self.current_language, key))
             elif isinstance(widget, QMainWindow):
                 widget.setWindowTitle(self.translation_manager.get_translation(self.current_language, key))
@@ -152,11 +249,16 @@ class MainWindow(QMainWindow):
             self,
             self.translation_manager.get_translation(self.current_language, 'output_location'),
             "",
-            "Excel Files (*.xlsx);;All Files (*)"
+            "Excel Files (*.xlsx);;Parquet (*.parquet);;CSV Bundle (*.zip);;SQLite (*.sqlite *.db);;All Files (*)"
         )
         if file:
             self.output_edit.setText(file)
     
+    def clear_cache(self):
+        """Borra los CSV guardados en la caché"""
+        borradas = SourceCache().limpiar()
+        self.report_area.setPlainText(self.translation_manager.get_translation(self.current_language, 'cache_cleared', borradas))
+    
     def process(self):
         input_files = self.file_edit.text().split("; ")
         output_file = self.output_edit.text()
@@ -164,8 +266,66 @@ class MainWindow(QMainWindow):
         if not input_files or not output_file:
             return
         
-        # Call the processing function
-        success, report = process_files(input_files, output_file, self.current_language)
+        if self.worker_thread is not None and self.worker_thread.isRunning():
+            return
+        
+        # Run the processing function in a worker thread so the window stays responsive
+        modo_duplicados = 'difuso' if self.fuzzy_check.isChecked() else 'exacto'
+        self.worker = ProcessWorker((input_files, output_file, self.current_language),
+                                    {'modo_duplicados': modo_duplicados, 'usar_cache': self.cache_check.isChecked(),
+                                     'incremental': self.incremental_check.isChecked(),
+                                     'por_bloques': self.chunked_check.isChecked(),
+                                     'fusionar': self.merge_check.isChecked()})
+        self.worker_thread = QThread()
+        self.worker.moveToThread(self.worker_thread)
+        self.worker_thread.started.connect(self.worker.run)
+        self.worker.progress.connect(self.on_progress)
+        self.worker.line.connect(self.report_area.append)
+        self.worker.stage.connect(self.on_stage)
+        self.worker.finished.connect(self.on_finished)
+        self.worker.finished.connect(self.worker_thread.quit)
         
-        # Display the report
-        self.report_area.setPlainText(report)
\ No newline at end of file
+        self.report_area.clear()
+        self.progress_bar.setValue(0)
+        self.progress_bar.setFormat("%p%")
+        self.process_btn.setEnabled(False)
+        self.cancel_btn.setEnabled(True)
+        self.worker_thread.start()
+    
+    def cancel_processing(self):
+        """Pide al hilo de procesamiento que se detenga"""
+        if self.worker is not None:
+            self.worker.cancel()
+            self.cancel_btn.setEnabled(False)
+    
+    def on_progress(self, etapa, actual, total, detalle):
+        """Mueve la barra de progreso dentro del tramo de la etapa actual"""
+        inicio, fin, key = ETAPAS[etapa]
+        texto = self.translation_manager.get_translation(self.current_language, key, os.path.basename(detalle), actual, total)
+        self.progress_bar.setFormat(f"%p% - {texto}")
+        self.progress_bar.setValue(int(inicio + (fin - inicio) * actual / max(total, 1)))
+    
+    def on_stage(self, etapa, segundos, filas):
+        """Añade al informe en curso el tiempo de cada etapa terminada"""
+        nombre = self.translation_manager.get_translation(self.current_language, ETAPAS_INFORME.get(etapa, etapa))
+        filas = '' if filas is None else f", {filas}"
+        self.report_area.append(f"⏱ {nombre}: {segundos:.2f} s{filas}")
+    
+    def on_finished(self, success, report, cancelled):
+        """Muestra el informe completo y deja la ventana lista para otro proceso"""
+        if cancelled:
+            report += "\n\n" + self.translation_manager.get_translation(self.current_language, 'process_cancelled')
+            self.progress_bar.setValue(0)
+        else:
+            self.progress_bar.setValue(100)
+        self.progress_bar.setFormat("%p%")
+        self.report_area.setPlainText(report)
+        self.process_btn.setEnabled(True)
+        self.cancel_btn.setEnabled(False)
+    
+    def closeEvent(self, event):
+        """Al cerrar la ventana se cancela el proceso en curso y se espera a que termine"""
+        if self.worker_thread is not None and self.worker_thread.isRunning():
+            self.worker.cancel()
+            self.worker_thread.wait()
+        super().closeEvent(event)
\ No newline at end of file
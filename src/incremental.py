@@ -0,0 +1,286 @@
+import base64
+import gzip
+import hashlib
+import itertools
+import json
+import os
+import re
+import zipfile
+import numpy as np
+import pandas as pd
+from openpyxl.utils import get_column_letter
+import xlsx
+
+VERSION_INDICE = 2
+BLOQUE = 4 * 1024 * 1024  # Bytes leídos de cada hoja al copiarla en streaming
+
+def ruta_indice(archivo_salida):
+    """Índice de la última ejecución, guardado junto al Excel de salida"""
+    return archivo_salida + '.mrx-index.json.gz'
+
+def huella_salida(archivo_salida):
+    """Tamaño y hash del Excel de salida, para saber si el índice todavía le corresponde"""
+    contenido = hashlib.blake2b(digest_size=16)
+    with open(archivo_salida, 'rb') as f:
+        while bloque := f.read(BLOQUE):
+            contenido.update(bloque)
+    return {'tamaño': os.path.getsize(archivo_salida), 'hash': contenido.hexdigest()}
+
+def borrar_indice(archivo_salida):
+    """Borra el índice de una ejecución anterior (la salida se escribió sin modo incremental)"""
+    try:
+        os.remove(ruta_indice(archivo_salida))
+    except FileNotFoundError:
+        pass
+
+def _a_json(valor):
+    if isinstance(valor, np.generic):
+        return valor.item()
+    raise TypeError(f"{type(valor).__name__} no es serializable")
+
+def _lista(serie):
+    """Valores de una columna como lista de Python, con None en lugar de NaN"""
+    return serie.astype(object).where(serie.notna(), None).tolist()
+
+def construir_indice(archivos, df, años, mascara_duplicados, language, modo_duplicados):
+    """Estado necesario para añadir registros más adelante sin volver a leer los archivos ya procesados"""
+    fuentes = df['Fuente'].astype('category')
+    vacia = [None] * len(df)
+    return {
+        'version': VERSION_INDICE,
+        'language': language,
+        'modo_duplicados': modo_duplicados,
+        'archivos': archivos,
+        'columnas': [str(c) for c in df.columns],
+        'titulos': _lista(df['Title']) if 'Title' in df.columns else vacia,
+        'dois': _lista(df['DOI']) if 'DOI' in df.columns else vacia,
+        'años': [None if pd.isna(a) else int(a) for a in años],
+        'fuentes': list(fuentes.cat.categories),
+        'codigos_fuente': fuentes.cat.codes.tolist(),
+        'duplicados': base64.b64encode(np.packbits(np.asarray(mascara_duplicados, dtype=bool))).decode('ascii'),
+    }
+
+def extender_indice(indice, archivos_nuevos, df_nuevo, años_nuevos, mascara_duplicados):
+    """Añade al índice los registros nuevos y actualiza las marcas de duplicado de todas las filas"""
+    nuevo = construir_indice(archivos_nuevos, df_nuevo, años_nuevos, mascara_duplicados[len(indice['años']):],
+                             indice['language'], indice['modo_duplicados'])
+    fuentes = list(dict.fromkeys(indice['fuentes'] + nuevo['fuentes']))
+    recodificar = [fuentes.index(f) for f in nuevo['fuentes']]
+    indice = dict(indice)
+    indice['archivos'] = dict(indice['archivos'], **archivos_nuevos)
+    for clave in ('titulos', 'dois', 'años'):
+        indice[clave] = indice[clave] + nuevo[clave]
+    indice['codigos_fuente'] = indice['codigos_fuente'] + [recodificar[c] for c in nuevo['codigos_fuente']]
+    indice['fuentes'] = fuentes
+    indice['duplicados'] = base64.b64encode(np.packbits(np.asarray(mascara_duplicados, dtype=bool))).decode('ascii')
+    return indice
+
+def guardar_indice(archivo_salida, indice):
+    """Guarda el índice de forma atómica (archivo temporal y renombrado), con la huella del Excel ya escrito"""
+    ruta = ruta_indice(archivo_salida)
+    indice = dict(indice, salida=huella_salida(archivo_salida))
+    with gzip.open(ruta + '.tmp', 'wb', compresslevel=6) as f:
+        f.write(json.dumps(indice, default=_a_json).encode('utf-8'))
+    os.replace(ruta + '.tmp', ruta)
+
+def cargar_indice(archivo_salida, language, modo_duplicados):
+    """Devuelve el índice de la última ejecución, o None si no existe o no corresponde a estas opciones
+
+    Tampoco sirve si el Excel cambió desde que se guardó el índice (otra ejecución o una edición a mano).
+    """
+    ruta = ruta_indice(archivo_salida)
+    if not os.path.exists(archivo_salida) or not os.path.exists(ruta):
+        return None
+    try:
+        with gzip.open(ruta, 'rt', encoding='utf-8') as f:
+            indice = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if (indice.get('version') != VERSION_INDICE or indice.get('language') != language
+            or indice.get('modo_duplicados') != modo_duplicados):
+        return None
+    salida = indice.get('salida') or {}
+    if salida.get('tamaño') != os.path.getsize(archivo_salida) or salida != huella_salida(archivo_salida):
+        return None
+    return indice
+
+def mascara_indice(indice):
+    """Marcas de duplicado guardadas en el índice"""
+    bits = np.frombuffer(base64.b64decode(indice['duplicados']), dtype=np.uint8)
+    return np.unpackbits(bits, count=len(indice['años'])).astype(bool)
+
+def claves_indice(indice):
+    """Título, DOI, año y fuente de los registros ya procesados"""
+    datos = {}
+    if 'Title' in indice['columnas']:
+        datos['Title'] = pd.Series(indice['titulos'], dtype=object)
+    if 'DOI' in indice['columnas']:
+        datos['DOI'] = pd.Series(indice['dois'], dtype=object)
+    datos['Fuente'] = pd.Categorical.from_codes(indice['codigos_fuente'], categories=indice['fuentes'])
+    años = pd.Series(indice['años'], dtype='float64')
+    return pd.DataFrame(datos), años
+
+def archivos_pendientes(indice, huellas):
+    """Archivos que no están en el índice; None si alguno ya procesado cambió o falta (hay que rehacer todo)"""
+    procesados = indice['archivos']
+    if any(procesados.get(ruta) not in (None, huella) for ruta, huella in huellas.items()):
+        return None
+    if not set(procesados).issubset(huellas):
+        return None
+    return [ruta for ruta in huellas if ruta not in procesados]
+
+def _cambiar_estilo(fila, estilo, letras):
+    """Pone (o quita, si estilo es None) el formato de todas las celdas de una fila
+
+    Como openpyxl, las celdas vacías solo se escriben cuando tienen formato.
+    """
+    numero = re.match(rb'<row r="(\d+)"', fila).group(1)
+    celdas = {m.group(1): m.group(0) for m in re.finditer(rb'<c r="([A-Z]+)\d+"[^>]*?(?:/>|>.*?</c>)', fila, re.S)}
+    partes = [re.match(rb'<row [^>]*>', fila).group(0)]
+    for letra in letras:
+        celda = celdas.get(letra)
+        if celda is None or celda.endswith(b'/>'):
+            if estilo:
+                partes.append(b'<c r="%s%s" s="%d" t="n" />' % (letra, numero, estilo))
+            continue
+        partes.append(re.sub(rb'^(<c r="[A-Z]+\d+")(?: s="\d+")?', rb'\1' + (b' s="%d"' % estilo if estilo else b''), celda))
+    return b''.join(partes)
+
+def _aplicar_estilos(datos, cambios, posicion, letras):
+    """Cambia el estilo de las filas de `cambios` (ordenados por fila) que estén en este bloque"""
+    piezas = []
+    inicio = 0
+    while posicion < len(cambios):
+        fila, estilo = cambios[posicion]
+        i = datos.find(b'<row r="%d"' % fila, inicio)
+        if i < 0:
+            break
+        j = datos.find(b'</row>', i)
+        piezas.append(datos[inicio:i])
+        piezas.append(_cambiar_estilo(datos[i:j], estilo, letras))
+        inicio = j
+        posicion += 1
+    piezas.append(datos[inicio:])
+    return b''.join(piezas), posicion
+
+def _copiar_hoja(zin, zout, parte, anchos, filas_nuevas, cambios=()):
+    """Copia una hoja en streaming: amplía los anchos, cambia el estilo de filas existentes y añade filas al final"""
+    with zin.open(parte) as origen, zout.open(parte, 'w', force_zip64=True) as destino:
+        datos = b''
+        while b'<sheetData>' not in datos:
+            bloque = origen.read(BLOQUE)
+            if not bloque:
+                raise ValueError(parte)
+            datos += bloque
+        cabecera, datos = datos.split(b'<sheetData>', 1)
+        cabecera = cabecera.decode('utf-8')
+        anteriores = xlsx.anchos_de_cabecera(cabecera)
+        anchos = [max(a, b) for a, b in zip(anchos, anteriores + [0] * len(anchos))]
+        destino.write(xlsx.reemplazar_columnas(cabecera, anchos).encode('utf-8') + b'<sheetData>')
+
+        cambios = sorted(cambios)
+        letras = [get_column_letter(i).encode('ascii') for i in range(1, len(anchos) + 1)]
+        posicion = 0
+        while True:
+            bloque = origen.read(BLOQUE)
+            datos += bloque
+            # Se procesan solo filas completas; al final queda el cierre de <sheetData>
+            corte = datos.rfind(b'</row>')
+            if corte >= 0:
+                corte += len(b'</row>')
+                completo, datos = datos[:corte], datos[corte:]
+                if posicion < len(cambios):
+                    completo, posicion = _aplicar_estilos(completo, cambios, posicion, letras)
+                destino.write(completo)
+            if not bloque:
+                break
+        for fila in filas_nuevas:
+            destino.write(fila.encode('utf-8'))
+        destino.write(datos)
+
+def actualizar_libro(archivo_salida, columnas, valores, resaltar, n_anteriores, particiones, anchos, cambios, resumen,
+                     nombres):
+    """Añade los registros nuevos al Excel existente sin reescribir las hojas que no cambian
+
+    valores: arrays con los valores de cada columna de los registros nuevos; resaltar: cuáles son duplicados
+    particiones: año -> (posiciones en los registros nuevos, filas que ya tenía la hoja)
+    anchos: nombre de hoja -> anchos calculados para las filas nuevas
+    cambios: {posición en la hoja principal: marcada como duplicado} de las filas existentes
+    nombres: {'todos', 'resumen', 'año'} con los nombres de hoja traducidos
+    """
+    temporal = archivo_salida + '.tmp'
+    with zipfile.ZipFile(archivo_salida) as zin:
+        workbook_xml = zin.read('xl/workbook.xml').decode('utf-8')
+        relaciones_xml = zin.read('xl/_rels/workbook.xml.rels').decode('utf-8')
+        tipos_xml = zin.read('[Content_Types].xml').decode('utf-8')
+        estilos_xml, estilo = xlsx.asegurar_estilo_resaltado(zin.read('xl/styles.xml').decode('utf-8'))
+        hojas = xlsx.hojas_del_libro(workbook_xml, relaciones_xml)
+        por_nombre = {nombre: (id_hoja, id_rel, parte) for nombre, id_hoja, id_rel, parte in hojas}
+        if nombres['todos'] not in por_nombre or nombres['resumen'] not in por_nombre:
+            raise ValueError(archivo_salida)
+
+        # Hojas nuevas para los años que no existían
+        siguiente_id = max(id_hoja for _, id_hoja, _, _ in hojas) + 1
+        siguiente_rel = max(int(n) for n in re.findall(r'Id="rId(\d+)"', relaciones_xml)) + 1
+        siguiente_parte = max(int(n) for n in re.findall(r'sheet(\d+)\.xml', ' '.join(p for *_, p in hojas))) + 1
+        hojas_año = {}
+        for año in sorted(particiones):
+            nombre = f"{nombres['año']} {int(año)}"[:31]
+            if nombre not in por_nombre:
+                por_nombre[nombre] = (siguiente_id, f'rId{siguiente_rel}', f'xl/worksheets/sheet{siguiente_parte}.xml')
+                relaciones_xml = relaciones_xml.replace('</Relationships>',
+                    f'<Relationship Type="{xlsx.RELACION_HOJA}" Target="/xl/worksheets/sheet{siguiente_parte}.xml" '
+                    f'Id="rId{siguiente_rel}" /></Relationships>')
+                tipos_xml = tipos_xml.replace('</Types>',
+                    f'<Override PartName="/xl/worksheets/sheet{siguiente_parte}.xml" ContentType="{xlsx.TIPO_HOJA}" /></Types>')
+                siguiente_id, siguiente_rel, siguiente_parte = siguiente_id + 1, siguiente_rel + 1, siguiente_parte + 1
+            hojas_año[año] = nombre
+
+        # Orden de las hojas: principal, años (ascendente) y resumen
+        existentes = [n for n, *_ in hojas if n not in (nombres['todos'], nombres['resumen'])]
+        años_libro = sorted(set(existentes) | set(hojas_año.values()),
+                            key=lambda n: int(n.rsplit(' ', 1)[-1]) if n.rsplit(' ', 1)[-1].isdigit() else 0)
+        orden = [nombres['todos']] + años_libro + [nombres['resumen']]
+        elementos = ''.join(xlsx.elemento_hoja(n, *por_nombre[n][:2]) for n in orden)
+        workbook_xml = re.sub(r'<sheets>.*?</sheets>', lambda _: f'<sheets>{elementos}</sheets>', workbook_xml, flags=re.S)
+
+        partes_año = {por_nombre[hojas_año[año]][2]: año for año in particiones}
+        parte_todos = por_nombre[nombres['todos']][2]
+        parte_resumen = por_nombre[nombres['resumen']][2]
+        reemplazadas = {'xl/workbook.xml': workbook_xml, 'xl/_rels/workbook.xml.rels': relaciones_xml,
+                        '[Content_Types].xml': tipos_xml, 'xl/styles.xml': estilos_xml}
+
+        with zipfile.ZipFile(temporal, 'w', zipfile.ZIP_DEFLATED) as zout:
+            for info in zin.infolist():
+                if info.filename in reemplazadas:
+                    zout.writestr(info.filename, reemplazadas[info.filename])
+                elif info.filename == parte_todos:
+                    filas = xlsx.filas_xml(valores, n_anteriores + 2, resaltar, estilo)
+                    _copiar_hoja(zin, zout, info.filename, anchos[nombres['todos']], filas,
+                                 [(posicion + 2, estilo if marcada else None) for posicion, marcada in cambios.items()])
+                elif info.filename in partes_año:
+                    año = partes_año[info.filename]
+                    posiciones, previas = particiones[año]
+                    filas = xlsx.filas_xml([v.take(posiciones) for v in valores], previas + 2)
+                    _copiar_hoja(zin, zout, info.filename, anchos[hojas_año[año]], filas)
+                elif info.filename == parte_resumen:
+                    with zout.open(info.filename, 'w') as destino:
+                        filas = xlsx.filas_xml([[encabezado] + datos for encabezado, datos in resumen.items()], 1)
+                        anchos_resumen = [max(len(str(v)) for v in [encabezado] + datos) + 2 for encabezado, datos in resumen.items()]
+                        xlsx.escribir_hoja(destino, anchos_resumen, filas)
+                else:
+                    with zin.open(info) as origen, zout.open(info.filename, 'w', force_zip64=True) as destino:
+                        while bloque := origen.read(BLOQUE):
+                            destino.write(bloque)
+
+            # Partes de las hojas de año que no existían
+            escritas = {info.filename for info in zin.infolist()}
+            for parte, año in partes_año.items():
+                if parte in escritas:
+                    continue
+                posiciones, _ = particiones[año]
+                with zout.open(parte, 'w', force_zip64=True) as destino:
+                    filas = xlsx.filas_xml([[c] for c in columnas], 1)
+                    cuerpo = xlsx.filas_xml([v.take(posiciones) for v in valores], 2)
+                    xlsx.escribir_hoja(destino, anchos[hojas_año[año]], itertools.chain(filas, cuerpo))
+    os.replace(temporal, archivo_salida)
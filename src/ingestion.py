@@ -0,0 +1,300 @@
+import codecs
+import csv
+import functools
+import importlib.util
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from cache import huella_archivo
+
+TAMAÑO_MUESTRA = 64 * 1024  # Bytes leídos para olfatear codificación y delimitador
+DELIMITADORES = ',;\t|'
+CODIFICACIONES = ('utf-8-sig', 'cp1252', 'latin-1')
+FILAS_BLOQUE = 100000  # Filas por bloque en la lectura por bloques
+BLOQUE_DECODIFICACION = 4 * 1024 * 1024
+
+# Tipos compactos que se aplican a cualquier archivo cuando los datos lo permiten
+TIPOS_COMUNES = {'Publication Year': 'Int16'}
+
+# Perfiles de las exportaciones conocidas: se reconocen por su encabezado y no necesitan olfateo
+PERFILES = {
+    'zotero': {
+        'firma': ('Key', 'Item Type', 'Publication Year', 'Title'),
+        'delimitador': ',',
+        'renombrar': {},
+        'tipos': {'Item Type': 'category'},
+    },
+    'scopus': {
+        'firma': ('Authors', 'Title', 'Year', 'Source title'),
+        'delimitador': ',',
+        'renombrar': {'Year': 'Publication Year'},
+        'tipos': {'Cited by': 'Int32', 'Document Type': 'category', 'Publication Stage': 'category',
+                  'Open Access': 'category', 'Source': 'category'},
+    },
+    'sciencedirect': {
+        'firma': ('Title', 'Authors', 'Journal', 'Year', 'DOI'),
+        'delimitador': ',',
+        'renombrar': {'Year': 'Publication Year'},
+        'tipos': {},
+    },
+    'proquest': {
+        'firma': ('Title', 'pubtitle', 'year'),
+        'delimitador': ',',
+        'renombrar': {'year': 'Publication Year'},
+        'tipos': {'documentType': 'category', 'language': 'category'},
+    },
+}
+
+def motores_disponibles():
+    """Motores de lectura en orden de preferencia (pyarrow solo si está instalado)"""
+    if importlib.util.find_spec('pyarrow') is not None:
+        return ('pyarrow', 'c')
+    return ('c',)
+
+def _leer_muestra(archivo):
+    """Lee los primeros bytes del archivo, cortados en el último salto de línea completo"""
+    with open(archivo, 'rb') as f:
+        muestra = f.read(TAMAÑO_MUESTRA)
+    if len(muestra) == TAMAÑO_MUESTRA and b'\n' in muestra:
+        muestra = muestra[:muestra.rindex(b'\n') + 1]
+    return muestra
+
+def _decodificar(muestra):
+    """Devuelve la primera codificación capaz de decodificar la muestra y el texto resultante"""
+    if muestra.startswith((b'\xff\xfe', b'\xfe\xff')):
+        return 'utf-16', muestra.decode('utf-16', errors='replace')
+    for codificacion in CODIFICACIONES:
+        try:
+            return codificacion, muestra.decode(codificacion)
+        except UnicodeDecodeError:
+            continue
+    return CODIFICACIONES[-1], muestra.decode(CODIFICACIONES[-1], errors='replace')
+
+def _encabezado(texto, delimitador):
+    """Columnas de la primera línea del texto"""
+    try:
+        return next(csv.reader(texto.splitlines()[:1], delimiter=delimitador))
+    except (StopIteration, csv.Error):
+        return []
+
+def _detectar_perfil(muestra):
+    """Busca un perfil conocido cuya firma coincida con el encabezado"""
+    primera_linea = muestra.split(b'\n', 1)[0].decode('utf-8-sig', errors='replace')
+    for nombre, perfil in PERFILES.items():
+        encabezado = _encabezado(primera_linea, perfil['delimitador'])
+        if set(perfil['firma']).issubset(encabezado):
+            return nombre, encabezado
+    return None, None
+
+@functools.lru_cache(maxsize=256)
+def _inspeccionar(archivo, tamaño, modificado):
+    """Determina perfil, codificaciones, delimitador y encabezado a partir de una muestra (cacheado por archivo)"""
+    muestra = _leer_muestra(archivo)
+    nombre, encabezado = _detectar_perfil(muestra)
+    if nombre is not None:
+        # Perfil conocido: se prueban las codificaciones habituales sin olfatear
+        return nombre, CODIFICACIONES, PERFILES[nombre]['delimitador'], tuple(encabezado)
+
+    codificacion, texto = _decodificar(muestra)
+    try:
+        delimitador = csv.Sniffer().sniff('\n'.join(texto.splitlines()[:20]), delimiters=DELIMITADORES).delimiter
+    except csv.Error:
+        delimitador = ','
+    return None, (codificacion,), delimitador, tuple(_encabezado(texto, delimitador))
+
+def inspeccionar_csv(archivo):
+    """Devuelve (perfil, codificaciones, delimitador, encabezado) de un archivo CSV"""
+    estado = os.stat(archivo)
+    return _inspeccionar(os.path.abspath(archivo), estado.st_size, estado.st_mtime_ns)
+
+def _tiene_columnas_binarias(df):
+    """pyarrow no falla con una codificación errónea: deja las columnas como bytes"""
+    for columna in df.columns:
+        if df[columna].dtype == object:
+            primero = df[columna].first_valid_index()
+            if primero is not None and isinstance(df[columna].at[primero], bytes):
+                return True
+    return False
+
+def _leer(archivo, delimitador, codificaciones, usecols):
+    """Lee el CSV con el motor más rápido disponible, probando las codificaciones en orden"""
+    for codificacion in codificaciones:
+        for motor in motores_disponibles():
+            try:
+                df = pd.read_csv(archivo, sep=delimitador, encoding=codificacion, usecols=usecols, engine=motor)
+            except UnicodeDecodeError:
+                break  # Siguiente codificación
+            except Exception:
+                continue  # Siguiente motor
+            if motor == 'pyarrow' and _tiene_columnas_binarias(df):
+                break
+            return df
+
+    # Último recurso: el lector de Python con detección de delimitador
+    return pd.read_csv(archivo, delimiter=None, engine='python', encoding=codificaciones[-1], usecols=usecols)
+
+def _compactar(df, tipos):
+    """Convierte columnas a tipos compactos (categorías, enteros con nulos) cuando no se pierde información"""
+    for columna, tipo in tipos.items():
+        if columna not in df.columns:
+            continue
+        serie = df[columna]
+        if tipo == 'category':
+            df[columna] = serie.astype('category')
+            continue
+
+        numeros = pd.to_numeric(serie, errors='coerce')
+        presentes = numeros.dropna()
+        if len(presentes) != serie.notna().sum() or not (presentes % 1 == 0).all():
+            continue
+        # Si los valores no caben en el tipo compacto quedan en Int64, como en el modo por bloques
+        for tipo in (tipo, 'Int64'):
+            try:
+                df[columna] = numeros.astype(tipo)
+                break
+            except (TypeError, ValueError, OverflowError):
+                continue
+
+def tipos_compactos(perfil):
+    """Tipos compactos que _compactar da a las columnas de un archivo con ese perfil (None: sin perfil)"""
+    return dict(TIPOS_COMUNES, **(PERFILES[perfil]['tipos'] if perfil else {}))
+
+def leer_csv(archivo, columnas=None):
+    """Lee un CSV con el motor C o pyarrow usando su perfil o la codificación y delimitador olfateados"""
+    perfil, codificaciones, delimitador, encabezado = inspeccionar_csv(archivo)
+    renombrar = PERFILES[perfil]['renombrar'] if perfil else {}
+    tipos = tipos_compactos(perfil)
+
+    # Solo se cargan las columnas pedidas (con sus nombres normalizados)
+    usecols = None
+    if columnas is not None and encabezado:
+        usecols = [c for c in encabezado if renombrar.get(c, c) in columnas]
+
+    df = _leer(archivo, delimitador, codificaciones, usecols)
+    if renombrar:
+        df.columns = [renombrar.get(c, c) for c in df.columns]
+    _compactar(df, tipos)
+    return df
+
+def _codificacion_completa(archivo, codificaciones):
+    """Primera codificación que decodifica el archivo entero (recorrido por bloques, sin cargarlo en memoria)"""
+    for codificacion in codificaciones[:-1]:
+        decodificador = codecs.getincrementaldecoder(codificacion)()
+        try:
+            with open(archivo, 'rb') as f:
+                while bloque := f.read(BLOQUE_DECODIFICACION):
+                    decodificador.decode(bloque)
+            decodificador.decode(b'', final=True)
+            return codificacion
+        except UnicodeDecodeError:
+            continue
+    return codificaciones[-1]
+
+def leer_csv_por_bloques(archivo, columnas=None, filas_bloque=FILAS_BLOQUE):
+    """Lee un CSV por bloques de filas, todo como texto, con los nombres de columna de su perfil
+
+    A diferencia de leer_csv no se infieren tipos: en cada bloque se verían distintos. La codificación se elige
+    antes de empezar, porque un error de decodificación a mitad de archivo no se puede reintentar.
+    """
+    perfil, codificaciones, delimitador, encabezado = inspeccionar_csv(archivo)
+    renombrar = PERFILES[perfil]['renombrar'] if perfil else {}
+    usecols = None
+    if columnas is not None and encabezado:
+        usecols = [c for c in encabezado if renombrar.get(c, c) in columnas]
+
+    codificacion = _codificacion_completa(archivo, codificaciones)
+    with pd.read_csv(archivo, sep=delimitador, encoding=codificacion, usecols=usecols, dtype=str,
+                     chunksize=filas_bloque, engine='c') as lector:
+        for bloque in lector:
+            if renombrar:
+                bloque.columns = [renombrar.get(c, c) for c in bloque.columns]
+            yield bloque
+
+def _leer_seguro(archivo, columnas=None, cache=None):
+    """Lee un CSV (o lo carga de la caché) sin cortar el lote: devuelve (DataFrame, error, desde_cache)"""
+    try:
+        clave = huella_archivo(archivo, columnas) if cache is not None else None
+        if clave is not None:
+            df = cache.cargar(clave)
+            if df is not None:
+                return df, None, True
+
+        df = leer_csv(archivo, columnas)
+        if clave is not None:
+            try:
+                cache.guardar(clave, df)
+            except OSError:
+                pass  # Una caché llena o sin permisos no impide procesar
+        return df, None, False
+    except Exception as e:
+        return None, str(e), False
+
+def leer_varios(archivos, columnas=None, trabajadores=None, cache=None, al_leer=None):
+    """Lee varios CSV en paralelo y devuelve los resultados en el mismo orden que los archivos
+
+    al_leer(posición, archivo) se llama al terminar cada archivo; si lanza una excepción,
+    los archivos que aún no empezaron se cancelan.
+    """
+    if trabajadores is None:
+        trabajadores = os.cpu_count() or 1
+    trabajadores = max(1, min(trabajadores, len(archivos)))
+    resultados = []
+    if trabajadores == 1:
+        for posicion, archivo in enumerate(archivos):
+            resultados.append(_leer_seguro(archivo, columnas, cache))
+            if al_leer is not None:
+                al_leer(posicion, archivo)
+    else:
+        # pyarrow libera el GIL y basta con hilos; el motor C de pandas rinde más en procesos
+        Pool = ThreadPoolExecutor if motores_disponibles()[0] == 'pyarrow' else ProcessPoolExecutor
+        with Pool(max_workers=trabajadores) as pool:
+            futuros = [pool.submit(_leer_seguro, archivo, columnas, cache) for archivo in archivos]
+            try:
+                for posicion, (archivo, futuro) in enumerate(zip(archivos, futuros)):
+                    resultados.append(futuro.result())
+                    if al_leer is not None:
+                        al_leer(posicion, archivo)
+            except BaseException:
+                for futuro in futuros:
+                    futuro.cancel()
+                raise
+
+    if cache is not None:
+        cache.desalojar()
+    return resultados
+
+def _unificar_categorias(dataframes):
+    """Da las mismas categorías a cada columna de categorías en todos los archivos
+
+    pd.concat convierte en texto las categorías que no coinciden; con la unión de todas se conserva la columna
+    compacta (códigos enteros) aunque cada exportación traiga otros tipos de documento o falte en alguna.
+    """
+    columnas = {}
+    for df in dataframes:
+        for columna in df.columns:
+            columnas.setdefault(columna, []).append(df)
+    for columna, con_columna in columnas.items():
+        if not all(isinstance(df[columna].dtype, pd.CategoricalDtype) for df in con_columna):
+            continue
+        categorias = list(dict.fromkeys(c for df in con_columna for c in df[columna].cat.categories))
+        for df in con_columna:
+            df[columna] = df[columna].cat.set_categories(categorias)
+
+def unir_fuentes(dataframes, fuentes, columna_fuente='Fuente'):
+    """Concatena los DataFrames en una sola operación y añade la columna de fuente como categoría"""
+    posicion = len(dataframes[0].columns)
+    if columna_fuente in dataframes[0].columns:
+        posicion = list(dataframes[0].columns).index(columna_fuente)
+    for df in dataframes:
+        if columna_fuente in df.columns:
+            df.pop(columna_fuente)
+    _unificar_categorias(dataframes)
+
+    df = pd.concat(dataframes, ignore_index=True)
+
+    # La fuente se guarda como códigos enteros, sin una cadena por fila
+    categorias = list(dict.fromkeys(fuentes))
+    codigos = np.repeat([categorias.index(f) for f in fuentes], [len(d) for d in dataframes])
+    df.insert(posicion, columna_fuente, pd.Categorical.from_codes(codigos, categories=categorias))
+    return df
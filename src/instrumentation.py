@@ -0,0 +1,109 @@
+import cProfile
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import psutil
+except ImportError:  # psutil es opcional: sin él se lee /proc (Linux)
+    psutil = None
+
+PERFILES = ('cprofile', 'tracemalloc')
+EXTENSIONES_PERFIL = {'cprofile': '.prof', 'tracemalloc': '.tracemalloc'}
+
+def rss_actual():
+    """Memoria residente actual del proceso en bytes (None si el sistema no la informa)"""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+class Instrumentacion:
+    """Mide cada etapa del proceso y avisa a los hooks al empezar y al terminar
+
+    Cada hook recibe (evento, registro): evento es 'inicio' o 'fin' y registro un diccionario con
+    'etapa', 'nivel' (anidamiento), 'filas', 'segundos' y 'rss_mb' (los dos últimos solo al terminar).
+    """
+
+    def __init__(self, hooks=(), perfil=None, archivo_perfil=None):
+        if callable(hooks):
+            hooks = (hooks,)
+        if perfil is not None and perfil not in PERFILES:
+            raise ValueError(f"perfil no válido: {perfil}")
+        self.hooks = list(hooks or ())
+        self.perfil = perfil
+        self.archivo_perfil = archivo_perfil or (f"metareviewx{EXTENSIONES_PERFIL[perfil]}" if perfil else None)
+        self.registros = []
+        self.inicio = time.perf_counter()
+        self._nivel = 0
+        self._iniciadas = 0
+
+    def _avisar(self, evento, registro):
+        for hook in self.hooks:
+            hook(evento, registro)
+
+    @contextmanager
+    def etapa(self, nombre, filas=None):
+        """Mide una etapa; el registro devuelto se puede completar (p. ej. con las filas) antes de que termine"""
+        registro = {'etapa': nombre, 'nivel': self._nivel, 'filas': filas, 'segundos': None, 'rss_mb': None,
+                    'orden': self._iniciadas}
+        self._iniciadas += 1
+        self._avisar('inicio', registro)
+        self._nivel += 1
+        inicio = time.perf_counter()
+        try:
+            yield registro
+        except BaseException:
+            registro['interrumpida'] = True
+            raise
+        finally:
+            self._nivel -= 1
+            registro['segundos'] = time.perf_counter() - inicio
+            rss = rss_actual()
+            registro['rss_mb'] = None if rss is None else rss / 1024**2
+            self.registros.append(registro)
+            self._avisar('fin', registro)
+
+    def resumen(self):
+        """Totales por etapa (las que se repiten, como el cálculo de anchos, se suman) en orden de inicio"""
+        totales = {}
+        for registro in sorted(self.registros, key=lambda r: r['orden']):
+            clave = (registro['nivel'], registro['etapa'])
+            total = totales.setdefault(clave, {'etapa': registro['etapa'], 'nivel': registro['nivel'], 'veces': 0,
+                                               'segundos': 0.0, 'filas': None, 'rss_mb': None})
+            total['veces'] += 1
+            total['segundos'] += registro['segundos']
+            if registro['filas'] is not None:
+                total['filas'] = (total['filas'] or 0) + registro['filas']
+            if registro['rss_mb'] is not None:
+                total['rss_mb'] = max(total['rss_mb'] or 0, registro['rss_mb'])
+        return list(totales.values())
+
+    def transcurrido(self):
+        return time.perf_counter() - self.inicio
+
+    @contextmanager
+    def captura(self):
+        """Activa el perfilado pedido (cProfile o tracemalloc) y guarda sus estadísticas al terminar"""
+        if self.perfil == 'cprofile':
+            perfilador = cProfile.Profile()
+            perfilador.enable()
+            try:
+                yield
+            finally:
+                perfilador.disable()
+                perfilador.dump_stats(self.archivo_perfil)
+        elif self.perfil == 'tracemalloc':
+            tracemalloc.start(10)
+            try:
+                yield
+            finally:
+                instantanea = tracemalloc.take_snapshot()
+                tracemalloc.stop()
+                instantanea.dump(self.archivo_perfil)
+        else:
+            yield
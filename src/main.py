@@ -1,9 +1,15 @@
 import sys
-from PyQt5.QtWidgets import QApplication
-from gui import MainWindow
-from translations import setup_translator
 
 def main():
+    # Con argumentos se usa la línea de órdenes, sin cargar PyQt5
+    if len(sys.argv) > 1:
+        from cli import main as cli_main
+        sys.exit(cli_main())
+    
+    from PyQt5.QtWidgets import QApplication
+    from gui import MainWindow
+    from translations import setup_translator
+    
     app = QApplication(sys.argv)
     
     # Configurar el traductor (inglés por defecto)
@@ -1,13 +1,55 @@
 import pandas as pd
+import numpy as np
 from datetime import datetime
 import os
-from openpyxl.styles import PatternFill
-from openpyxl import Workbook
-from openpyxl.utils.dataframe import dataframe_to_rows
 from translations import TranslationManager
+from ingestion import FILAS_BLOQUE, inspeccionar_csv, leer_csv_por_bloques, leer_varios, tipos_compactos, unir_fuentes
+from duplicates import SIMILITUD_RAPIDA, MascaraBits, agrupar_duplicados, resumir_grupos
+from cache import SourceCache, huella_archivo
+from instrumentation import Instrumentacion
+from streaming import IndiceBloques
+from fusion import COLUMNA_REGISTROS, REGLAS_FUSION, fusionar_registros, grupos_fusion
+from writers import (ANCHO_MAXIMO, ESCRITORES, FILAS_FRAGMENTO, LIMITE_FILAS_EXCEL, crear_escritor,
+                     formato_de_salida, formatos_disponibles, valores_columna)
+from incremental import (cargar_indice, guardar_indice, borrar_indice, construir_indice, extender_indice,
+                         archivos_pendientes, claves_indice, mascara_indice, actualizar_libro)
 
 translation_manager = TranslationManager()
 
+class ProcesoCancelado(Exception):
+    """Se lanza desde el callback de progreso para detener el proceso"""
+
+class _LineasInforme(list):
+    """Líneas del informe que se entregan a un callback a medida que se agregan"""
+    def __init__(self, al_informar=None):
+        super().__init__()
+        self.al_informar = al_informar
+    
+    def append(self, linea):
+        super().append(linea)
+        if self.al_informar is not None:
+            self.al_informar(linea)
+    
+    def extend(self, lineas):
+        for linea in lineas:
+            self.append(linea)
+
+# Nombre de cada etapa medida en la tabla de tiempos del informe
+ETAPAS_INFORME = {
+    'lectura': 'timing_read',
+    'duplicados': 'timing_duplicates',
+    'años': 'timing_years',
+    'fusion': 'timing_merge',
+    'escritura': 'timing_write',
+    'anchos': 'timing_widths',
+    'indice': 'timing_index',
+}
+
+def _avisar(progreso, etapa, actual=0, total=1, detalle=''):
+    """Informa del avance de una etapa (lectura, duplicados, años, escritura) si hay callback"""
+    if progreso is not None:
+        progreso(etapa, actual, total, detalle)
+
 def verificar_archivos(archivos, language):
     """Verifica si los archivos existen y son legibles"""
     archivos_validos = []
@@ -40,79 +82,188 @@ def extraer_año(fecha_str, columna_fecha='Publication Year'):
     except:
         return None
 
-def procesar_archivos(archivos, language):
-    """Procesa y unifica los archivos CSV"""
+def _fechas_a_años(textos):
+    """Convierte textos de fecha a años con una única llamada vectorizada a pd.to_datetime"""
+    try:
+        fechas = pd.to_datetime(textos, errors='coerce', format='mixed')
+    except (TypeError, ValueError):
+        # Versiones de pandas sin format='mixed'
+        fechas = pd.to_datetime(textos, errors='coerce')
+    return fechas.dt.year
+
+def extraer_años(serie):
+    """Versión vectorizada de extraer_año para una columna completa; devuelve los años y cuántos valores no se pudieron interpretar"""
+    años = pd.Series(np.nan, index=serie.index, dtype='float64')
+    presentes = serie.notna().to_numpy()
+    
+    # 1. Valores numéricos (año directo)
+    numeros = pd.to_numeric(serie, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+    es_numero = np.isfinite(numeros)
+    años[es_numero] = np.trunc(numeros[es_numero])
+    
+    # 2. Año de cuatro dígitos dentro del texto
+    pendientes = presentes & ~es_numero
+    if pendientes.any():
+        textos = serie[pendientes].astype(str)
+        encontrados = textos.str.extract(r'(?<!\d)(\d{4})(?!\d)', expand=False)
+        años.loc[encontrados.index] = pd.to_numeric(encontrados, errors='coerce')
+        
+        # 3. El resto se interpreta como fecha en una sola llamada
+        restantes = textos[encontrados.isna()]
+        if not restantes.empty:
+            años.loc[restantes.index] = _fechas_a_años(restantes)
+    
+    fallidos = int((presentes & años.isna().to_numpy()).sum())
+    return años, fallidos
+
+def compactar_años(años):
+    """Años como enteros con nulos: Int16 (dos bytes por fila más la máscara de nulos) en lugar de float64
+    
+    Si algún año no cabe en Int16 se usa Int32; los valores que no caben ni ahí se dejan vacíos.
+    """
+    años = pd.Series(años, dtype='float64')
+    años = años.where(años.abs() < 2**31)
+    return años.astype('Int16' if not (años.abs() > np.iinfo(np.int16).max).any() else 'Int32')
+
+def nombre_fuente(archivo):
+    """Nombre con que se identifica la fuente de los registros de un archivo"""
+    return os.path.splitext(os.path.basename(archivo))[0]
+
+def procesar_archivos(archivos, language, columnas=None, trabajadores=None, errores=None, cache=None, leidos=None,
+                      progreso=None):
+    """Procesa y unifica los archivos CSV (leídos en paralelo, o desde la caché si no cambiaron)"""
     dataframes = []
-    for archivo in archivos:
-        try:
-            df = pd.read_csv(archivo, delimiter=None, engine='python', encoding='utf-8')
-            df['Fuente'] = os.path.splitext(os.path.basename(archivo))[0]
-            dataframes.append(df)
-        except Exception as e:
-            print(translation_manager.get_translation(language, 'processing_error', archivo, str(e)))
+    fuentes = []
+    al_leer = lambda posicion, archivo: _avisar(progreso, 'lectura', posicion + 1, len(archivos), archivo)
+    for archivo, (df, error, _) in zip(archivos, leer_varios(archivos, columnas, trabajadores, cache, al_leer)):
+        if error is not None:
+            mensaje = translation_manager.get_translation(language, 'processing_error', archivo, error)
+            print(mensaje)
+            if errores is not None:
+                errores.append(mensaje)
+            continue
+        dataframes.append(df)
+        if leidos is not None:
+            leidos.append(archivo)
+        fuentes.append(nombre_fuente(archivo))
     
     if not dataframes:
         return None
     
-    return pd.concat(dataframes, ignore_index=True)
+    return unir_fuentes(dataframes, fuentes)
 
-def identificar_duplicados(df, language, columna_titulo='Title'):
-    """Identifica duplicados y genera reporte"""
+def identificar_duplicados(df, language, columna_titulo='Title', modo='exacto', umbral=0.9, columna_doi='DOI'):
+    """Identifica duplicados y genera reporte (devuelve una máscara booleana por fila)
+    
+    modo='exacto' compara el título tal cual; modo='difuso' agrupa casi duplicados
+    (título normalizado, sin subtítulo, similitud >= umbral y DOI).
+    """
     report_lines = []
     
-    if columna_titulo not in df.columns:
+    if columna_titulo not in df.columns and modo != 'difuso':
         report_lines.append(translation_manager.get_translation(language, 'no_title_column'))
-        return df, [], report_lines
+        return df, np.zeros(len(df), dtype=bool), report_lines
     
-    duplicados = df[df.duplicated(subset=[columna_titulo], keep=False)]
-    conteo_duplicados = duplicados[columna_titulo].value_counts()
+    if modo == 'difuso':
+        if columna_titulo not in df.columns:
+            report_lines.append(translation_manager.get_translation(language, 'no_title_column'))
+        etiquetas = agrupar_duplicados(df, columna_titulo, umbral, columna_doi)
+        titulos = df[columna_titulo] if columna_titulo in df.columns else pd.Series(np.nan, index=df.index, name=columna_titulo)
+        mascara_duplicados, conteo_duplicados = resumir_grupos(etiquetas, titulos)
+    else:
+        mascara_duplicados = df.duplicated(subset=[columna_titulo], keep=False).to_numpy()
+        conteo_duplicados = df[columna_titulo][mascara_duplicados].value_counts()
+    report_lines.extend(reporte_duplicados(int(mascara_duplicados.sum()), len(conteo_duplicados),
+                                           conteo_duplicados.head(10), language))
     
-    if not duplicados.empty:
+    return df, mascara_duplicados, report_lines
+
+def reporte_duplicados(total_duplicados, grupos, mas_repetidos, language):
+    """Líneas del reporte de duplicados (vacío si no hay ninguno)"""
+    report_lines = []
+    if total_duplicados:
         report_lines.append("\n" + "="*60)
         report_lines.append(translation_manager.get_translation(language, 'duplicates_report'))
         report_lines.append("="*60)
-        report_lines.append(translation_manager.get_translation(language, 'total_duplicates', len(duplicados)))
-        report_lines.append(translation_manager.get_translation(language, 'unique_duplicates', len(conteo_duplicados)))
+        report_lines.append(translation_manager.get_translation(language, 'total_duplicates', total_duplicados))
+        report_lines.append(translation_manager.get_translation(language, 'unique_duplicates', grupos))
         report_lines.append("\n" + translation_manager.get_translation(language, 'top_duplicates'))
-        report_lines.append(str(conteo_duplicados.head(10)))
+        report_lines.append(str(mas_repetidos))
+    return report_lines
+
+def agrupar_por_año(df, años, mascara_duplicados, columna_titulo='Title'):
+    """Agrupa las filas por año en una sola pasada: devuelve las estadísticas y las posiciones de cada año"""
+    datos = {'duplicado': np.asarray(mascara_duplicados, dtype=bool), 'fuente': df['Fuente'].to_numpy()}
+    if columna_titulo in df.columns:
+        datos['titulo'] = df[columna_titulo].to_numpy()
+    # Los años enteros con nulos se agrupan tal cual, sin pasarlos a float
+    años = pd.Series(años)
+    claves = años.array if isinstance(años.dtype, pd.api.extensions.ExtensionDtype) else años.to_numpy()
+    grupos = pd.DataFrame(datos).groupby(claves, sort=True)
+    
+    estadisticas = pd.DataFrame({
+        'total': grupos.size(),
+        'duplicados': grupos['duplicado'].sum(),
+        'fuentes': grupos['fuente'].unique()
+    })
+    # Los títulos vacíos cuentan como un valor más, igual que Series.unique()
+    estadisticas['unicos'] = grupos['titulo'].nunique(dropna=False) if 'titulo' in datos else 'N/A'
     
-    return df, duplicados.index.tolist(), report_lines
+    # Posiciones (en orden original) de las filas de cada año, calculadas con la misma agrupación
+    particiones = grupos.indices
+    return estadisticas, {año: particiones[año] for año in estadisticas.index}
 
-def crear_excel_organizado(df, archivo_salida, indices_duplicados, language, columna_fecha='Publication Year'):
-    """Crea un Excel con organización por años"""
-    wb = Workbook()
-    fill = PatternFill(start_color="FFFF00", end_color="FFFF00", fill_type="solid")
+def _largos_texto(serie, tope):
+    """Longitud del texto de cada celda, recortada a tope (las vacías miden 3, como 'nan')"""
+    texto = serie if isinstance(serie.dtype, pd.StringDtype) else serie.astype(str)
+    largos = texto.str.len().to_numpy(dtype='float64', na_value=3)
+    largos = np.where(serie.notna().to_numpy(), largos, 3)
+    return np.minimum(largos, tope).astype(np.int32)
+
+def _muestra(filas, muestra):
+    """Posiciones repartidas de forma uniforme para medir como mucho muestra filas de un grupo"""
+    if muestra is None or filas <= muestra:
+        return np.arange(filas)
+    return np.unique(np.linspace(0, filas - 1, muestra).round().astype(np.int64))
+
+def calcular_anchos(df, particiones=None, tope=ANCHO_MAXIMO, muestra=None):
+    """Calcula el ancho de cada columna en la hoja con todos los registros y en cada partición (año)
     
-    # Extraer años
-    df['Año_Extraido'] = df[columna_fecha].apply(extraer_año)
-    años_validos = df['Año_Extraido'].dropna().unique()
+    Cada columna se mide una sola vez, de forma vectorizada, y los máximos de las particiones salen de la misma
+    medida. tope limita el ancho; con muestra se miden como mucho esa cantidad de filas por partición (para
+    columnas enormes, a cambio de un ancho aproximado). Devuelve (anchos, {partición: anchos}).
+    """
+    particiones = particiones or {}
+    # Grupo de cada fila: el índice de su partición, o uno más para las que no están en ninguna
+    codigos = np.full(len(df), len(particiones), dtype=np.int64)
+    for numero, posiciones in enumerate(particiones.values()):
+        codigos[posiciones] = numero
+    orden = np.argsort(codigos, kind='stable')
+    grupos, inicios, tamaños = np.unique(codigos[orden], return_index=True, return_counts=True)
+    if muestra is not None:
+        elegidas = [orden[inicio:inicio + tamaño][_muestra(tamaño, muestra)]
+                    for inicio, tamaño in zip(inicios, tamaños)]
+        inicios = np.concatenate([[0], np.cumsum([len(e) for e in elegidas])[:-1]]).astype(np.int64)
+        orden = np.concatenate(elegidas) if elegidas else orden
     
-    if len(años_validos) == 0:
-        print("\n" + translation_manager.get_translation(language, 'no_valid_years'))
-        años_validos = ['Todos']  # Hoja por defecto
-    
-    # 1. Hoja principal "Todos" con duplicados marcados
-    ws_todos = wb.create_sheet(translation_manager.get_translation(language, 'all_sheet'))
-    for r_idx, row in enumerate(dataframe_to_rows(df.drop('Año_Extraido', axis=1), index=False, header=True), 1):
-        ws_todos.append(row)
-        if r_idx > 1 and (r_idx-2) in indices_duplicados:
-            for cell in ws_todos[r_idx]:
-                cell.fill = fill
-    
-    # 2. Hojas por año (sin marcar duplicados)
-    for año in sorted(años_validos):
-        if str(año) == 'Todos':
-            continue  # Ya creamos esta hoja
-        
-        df_año = df[df['Año_Extraido'] == año]
-        nombre_hoja = f"{translation_manager.get_translation(language, 'year')} {int(año)}"[:31]
-        ws = wb.create_sheet(nombre_hoja)
-        
-        for row in dataframe_to_rows(df_año.drop('Año_Extraido', axis=1), index=False, header=True):
-            ws.append(row)
+    maximos = np.zeros((len(df.columns), len(grupos)), dtype=np.int32)
+    for numero, columna in enumerate(df.columns):
+        if not len(orden):
+            break
+        if muestra is None:
+            largos = _largos_texto(df[columna], tope)[orden]
+        else:
+            largos = _largos_texto(df[columna].take(orden), tope)
+        maximos[numero] = np.maximum.reduceat(largos, inicios)
     
-    # 3. Hoja de resumen
-    ws_resumen = wb.create_sheet(translation_manager.get_translation(language, 'summary_sheet'))
+    encabezados = np.array([len(str(columna)) for columna in df.columns], dtype=np.int32)
+    def anchos(largos):
+        return np.minimum(np.maximum(encabezados, largos) + 2, tope).tolist()
+    por_particion = dict(zip(particiones, (anchos(maximos[:, i]) for i in range(len(particiones)))))
+    return anchos(maximos.max(axis=1, initial=0)), por_particion
+
+def datos_resumen(df, estadisticas, mascara_duplicados, language):
+    """Columnas de la hoja de resumen: fila con todos los años y una fila por año"""
     resumen_data = {
         translation_manager.get_translation(language, 'year'): [],
         translation_manager.get_translation(language, 'total_articles'): [],
@@ -124,44 +275,313 @@ def crear_excel_organizado(df, archivo_salida, indices_duplicados, language, col
     # Datos para todos los años
     resumen_data[translation_manager.get_translation(language, 'year')].append('Todos')
     resumen_data[translation_manager.get_translation(language, 'total_articles')].append(len(df))
-    resumen_data[translation_manager.get_translation(language, 'unique_articles')].append(len(df['Title'].unique()) if 'Title' in df.columns else 'N/A')
-    resumen_data[translation_manager.get_translation(language, 'duplicate_count')].append(len(indices_duplicados))
+    resumen_data[translation_manager.get_translation(language, 'unique_articles')].append(df['Title'].nunique(dropna=False) if 'Title' in df.columns else 'N/A')
+    resumen_data[translation_manager.get_translation(language, 'duplicate_count')].append(int(mascara_duplicados.sum()))
     resumen_data[translation_manager.get_translation(language, 'sources')].append(", ".join(df['Fuente'].unique()))
     
     # Datos por año
-    for año in sorted(años_validos):
-        if str(año) == 'Todos':
-            continue
-        
-        df_año = df[df['Año_Extraido'] == año]
+    for año, fila in estadisticas.iterrows():
         resumen_data[translation_manager.get_translation(language, 'year')].append(str(int(año)))
-        resumen_data[translation_manager.get_translation(language, 'total_articles')].append(len(df_año))
-        resumen_data[translation_manager.get_translation(language, 'unique_articles')].append(len(df_año['Title'].unique()) if 'Title' in df_año.columns else 'N/A')
-        resumen_data[translation_manager.get_translation(language, 'duplicate_count')].append(sum(1 for i in df_año.index if i in indices_duplicados))
-        resumen_data[translation_manager.get_translation(language, 'sources')].append(", ".join(df_año['Fuente'].unique()))
-    
-    # Escribir resumen
-    for col_idx, (header, data) in enumerate(resumen_data.items(), start=1):
-        ws_resumen.cell(row=1, column=col_idx, value=header)
-        for row_idx, value in enumerate(data, start=2):
-            ws_resumen.cell(row=row_idx, column=col_idx, value=value)
-    
-    # Eliminar hoja vacía inicial y ajustar columnas
-    if 'Sheet' in wb.sheetnames:
-        del wb['Sheet']
-    
-    for sheet in wb.sheetnames:
-        ws = wb[sheet]
-        for column in ws.columns:
-            max_length = max(len(str(cell.value)) for cell in column)
-            ws.column_dimensions[column[0].column_letter].width = max_length + 2
-    
-    # Guardar archivo
-    wb.save(archivo_salida)
-
-def process_files(input_files, output_file, language='es'):
-    """Función principal para procesar archivos"""
-    report_lines = []
+        resumen_data[translation_manager.get_translation(language, 'total_articles')].append(int(fila['total']))
+        resumen_data[translation_manager.get_translation(language, 'unique_articles')].append(fila['unicos'] if fila['unicos'] == 'N/A' else int(fila['unicos']))
+        resumen_data[translation_manager.get_translation(language, 'duplicate_count')].append(int(fila['duplicados']))
+        resumen_data[translation_manager.get_translation(language, 'sources')].append(", ".join(fila['fuentes']))
+    
+    return resumen_data
+
+def nombres_hojas(language):
+    """Nombres traducidos de las hojas del libro"""
+    return {'todos': translation_manager.get_translation(language, 'all_sheet'),
+            'fusionados': translation_manager.get_translation(language, 'merged_sheet'),
+            'año': translation_manager.get_translation(language, 'year'),
+            'resumen': translation_manager.get_translation(language, 'summary_sheet')}
+
+def procesos_escritura(filas, trabajadores=None):
+    """Procesos para generar el Excel: uno si hay pocas filas (no compensa arrancar otros) o los pedidos"""
+    if filas < FILAS_FRAGMENTO:
+        return 1
+    return max(1, trabajadores or os.cpu_count() or 1)
+
+def crear_salida_organizada(df, archivo_salida, mascara_duplicados, language, columna_fecha='Publication Year', años=None,
+                            progreso=None, instrumentacion=None, formato=None, trabajadores=None,
+                            ancho_maximo=ANCHO_MAXIMO, muestra_anchos=None, fusionados=None):
+    """Escribe todos los registros, una parte por año y el resumen en el formato pedido (xlsx, parquet, csv, sqlite)
+    
+    trabajadores: procesos que generan las hojas de Excel en paralelo (por defecto, uno por núcleo).
+    ancho_maximo y muestra_anchos: tope y muestra por hoja del cálculo de anchos de columna (ver calcular_anchos).
+    fusionados: registros fusionados (ver fusionar_registros), que se escriben en su propia hoja junto a Todos.
+    """
+    instrumentacion = instrumentacion or Instrumentacion()
+    escritor = crear_escritor(formato_de_salida(archivo_salida, formato), archivo_salida, nombres_hojas(language),
+                              procesos_escritura(len(df), trabajadores))
+    
+    # Extraer años (si no vienen calculados) y agrupar una sola vez
+    if años is None:
+        años = compactar_años(extraer_años(df[columna_fecha])[0])
+    estadisticas, particiones = agrupar_por_año(df, años, mascara_duplicados)
+    
+    if estadisticas.empty:
+        print("\n" + translation_manager.get_translation(language, 'no_valid_years'))
+    
+    total_hojas = (len(particiones) if escritor.hojas_por_año else 0) + (fusionados is not None) + 2
+    # Un escritor que genera la salida al cerrar informa entonces del avance; antes solo se comprueba si se cancela
+    avisar_hoja = lambda numero, nombre: _avisar(progreso, 'escritura', 0 if escritor.escribe_al_cerrar else numero,
+                                                 total_hojas, nombre)
+    escritor.al_avanzar = lambda hechos, total, hoja: _avisar(progreso, 'escritura', hechos, total, hoja)
+    try:
+        # 1. Todos los registros con los duplicados marcados
+        avisar_hoja(1, translation_manager.get_translation(language, 'all_sheet'))
+        # Los anchos de todas las hojas salen de una sola medida de cada columna, antes de escribir
+        anchos, anchos_años = None, {}
+        if escritor.usa_anchos:
+            with instrumentacion.etapa('anchos', len(df)):
+                anchos, anchos_años = calcular_anchos(df, particiones if escritor.hojas_por_año else None,
+                                                      ancho_maximo, muestra_anchos)
+        escritor.escribir_bloque('todos', df, mascara_duplicados, años, anchos)
+        
+        # 2. Una parte por año (sin marcar duplicados): el escritor toma las filas por sus posiciones, sin copias
+        if escritor.hojas_por_año:
+            for numero, (año, posiciones) in enumerate(particiones.items(), start=2):
+                nombre_hoja = f"{translation_manager.get_translation(language, 'year')} {int(año)}"[:31]
+                avisar_hoja(numero, nombre_hoja)
+                escritor.escribir_bloque(año, df, anchos=anchos_años.get(año), posiciones=posiciones)
+        
+        # 3. Registros fusionados (después de los años, que reutilizan los valores convertidos de df)
+        if fusionados is not None:
+            avisar_hoja(total_hojas - 1, translation_manager.get_translation(language, 'merged_sheet'))
+            anchos = None
+            if escritor.usa_anchos:
+                with instrumentacion.etapa('anchos', len(fusionados)):
+                    anchos, _ = calcular_anchos(fusionados, tope=ancho_maximo, muestra=muestra_anchos)
+            escritor.escribir_fusionados(fusionados, anchos)
+        
+        # 4. Resumen
+        avisar_hoja(total_hojas, translation_manager.get_translation(language, 'summary_sheet'))
+        escritor.escribir_resumen(datos_resumen(df, estadisticas, mascara_duplicados, language))
+        
+        # Se escribe en un temporal, para no dejar una salida a medias si algo falla
+        escritor.cerrar()
+    except BaseException:
+        escritor.descartar()
+        raise
+
+def crear_excel_organizado(df, archivo_salida, mascara_duplicados, language, columna_fecha='Publication Year', años=None,
+                           progreso=None, instrumentacion=None, trabajadores=None, ancho_maximo=ANCHO_MAXIMO,
+                           muestra_anchos=None, fusionados=None):
+    """Crea un Excel con organización por años"""
+    crear_salida_organizada(df, archivo_salida, mascara_duplicados, language, columna_fecha, años, progreso,
+                            instrumentacion, formato='xlsx', trabajadores=trabajadores, ancho_maximo=ancho_maximo,
+                            muestra_anchos=muestra_anchos, fusionados=fusionados)
+
+def actualizar_excel(df_nuevo, archivo_salida, indice, claves, años_todos, mascara_duplicados, language, años_nuevos,
+                     ancho_maximo=ANCHO_MAXIMO, muestra_anchos=None):
+    """Añade los registros nuevos a un Excel ya creado: solo se reescriben el resumen y las hojas con filas nuevas"""
+    n_anteriores = len(indice['años'])
+    columnas = indice['columnas']
+    df_nuevo = df_nuevo.reindex(columns=columnas)
+    
+    # Estadísticas con todos los registros (solo claves) y particiones de los nuevos
+    estadisticas, _ = agrupar_por_año(claves, años_todos, mascara_duplicados)
+    _, particiones = agrupar_por_año(df_nuevo, años_nuevos, mascara_duplicados[n_anteriores:])
+    nombre_año = translation_manager.get_translation(language, 'year')
+    nombre_todos = translation_manager.get_translation(language, 'all_sheet')
+    
+    anchos_todos, anchos_años = calcular_anchos(df_nuevo, particiones, ancho_maximo, muestra_anchos)
+    anchos = {nombre_todos: anchos_todos}
+    for año, anchos_año in anchos_años.items():
+        anchos[f"{nombre_año} {int(año)}"[:31]] = anchos_año
+    particiones = {año: (posiciones, int(estadisticas.at[año, 'total']) - len(posiciones))
+                   for año, posiciones in particiones.items()}
+    
+    # Filas ya escritas cuya marca de duplicado cambió con los registros nuevos
+    cambiadas = np.flatnonzero(mascara_indice(indice) != mascara_duplicados[:n_anteriores])
+    cambios = {int(posicion): bool(mascara_duplicados[posicion]) for posicion in cambiadas}
+    
+    actualizar_libro(archivo_salida, columnas, [valores_columna(df_nuevo[columna]) for columna in columnas],
+                     mascara_duplicados[n_anteriores:], n_anteriores, particiones, anchos, cambios,
+                     datos_resumen(claves, estadisticas, mascara_duplicados, language),
+                     {'todos': nombre_todos, 'resumen': translation_manager.get_translation(language, 'summary_sheet'),
+                      'año': nombre_año})
+
+def _bloques_con_años(archivo, columnas, filas_bloque, fallidos, avisar):
+    """Bloques de un archivo con los años extraídos; suma en fallidos los valores sin año reconocible"""
+    for bloque in leer_csv_por_bloques(archivo, columnas, filas_bloque):
+        if 'Publication Year' in bloque.columns:
+            años, sin_año = extraer_años(bloque['Publication Year'])
+            fallidos[0] += sin_año
+        else:
+            años = pd.Series(np.nan, index=bloque.index, dtype='float64')
+        avisar()
+        yield bloque, años
+
+def procesar_por_bloques(archivos, archivo_salida, language, columnas=None, modo_duplicados='exacto', formato=None,
+                         filas_bloque=None, errores=None, progreso=None, instrumentacion=None, trabajadores=None,
+                         ancho_maximo=ANCHO_MAXIMO, muestra_anchos=None):
+    """Procesa archivos de cualquier tamaño en dos pasadas por bloques, sin reunir todos los registros en memoria
+    
+    La primera pasada solo guarda las claves de cada fila (huellas de título y DOI, año y fuente); con ellas se
+    marcan los duplicados y se calcula el resumen. La segunda vuelve a leer los bloques y los escribe en la salida.
+    En modo difuso no se comparan títulos por similitud (necesitaría los textos): se agrupan por título
+    normalizado, título sin subtítulo y DOI.
+    
+    Devuelve (registros, duplicados, líneas del reporte de duplicados, años sin interpretar), o None si no se
+    pudo leer ningún archivo.
+    """
+    instrumentacion = instrumentacion or Instrumentacion()
+    filas_bloque = filas_bloque or FILAS_BLOQUE
+    formato = formato_de_salida(archivo_salida, formato)
+    indice = IndiceBloques(modo_duplicados, medir_anchos=ESCRITORES[formato].usa_anchos, muestra_anchos=muestra_anchos)
+    leidos = []
+    años_fallidos = [0]
+    
+    # 1. Primera pasada: claves, tipos de columna y anchos
+    with instrumentacion.etapa('lectura') as registro:
+        for posicion, archivo in enumerate(archivos):
+            avisar = lambda: _avisar(progreso, 'lectura', posicion, len(archivos), archivo)
+            fallidos_antes = años_fallidos[0]
+            try:
+                indice.agregar_archivo(nombre_fuente(archivo),
+                                       _bloques_con_años(archivo, columnas, filas_bloque, años_fallidos, avisar),
+                                       tipos_compactos(inspeccionar_csv(archivo)[0]))
+            except ProcesoCancelado:
+                raise
+            except Exception as e:
+                años_fallidos[0] = fallidos_antes
+                mensaje = translation_manager.get_translation(language, 'processing_error', archivo, e)
+                print(mensaje)
+                if errores is not None:
+                    errores.append(mensaje)
+                continue
+            leidos.append(archivo)
+            _avisar(progreso, 'lectura', posicion + 1, len(archivos), archivo)
+        registro['filas'] = indice.filas
+    if not leidos:
+        return None
+    
+    # 2. Duplicados a partir de las claves
+    _avisar(progreso, 'duplicados')
+    dup_report = []
+    with instrumentacion.etapa('duplicados', indice.filas):
+        if 'Title' not in indice.columnas:
+            dup_report.append(translation_manager.get_translation(language, 'no_title_column'))
+        if 'Title' not in indice.columnas and modo_duplicados != 'difuso':
+            etiquetas = np.arange(indice.filas)
+        else:
+            etiquetas = indice.etiquetas()
+        tamaños = np.bincount(etiquetas, minlength=indice.filas)
+        mascara_duplicados = MascaraBits(tamaños[etiquetas] > 1)
+        grupos = np.setdiff1d(np.flatnonzero(tamaños > 1), indice.grupos_sin_titulo(etiquetas))
+        mas_repetidos = grupos[np.argsort(-tamaños[grupos], kind='stable')][:10]
+    
+    años = indice.años_serie()
+    claves = indice.claves()
+    estadisticas, _ = agrupar_por_año(claves, años, mascara_duplicados)
+    if estadisticas.empty:
+        print("\n" + translation_manager.get_translation(language, 'no_valid_years'))
+    
+    # 3. Segunda pasada: los bloques van a la salida (y a su año) a medida que se leen
+    columnas_salida = indice.columnas_finales()
+    escritor = crear_escritor(formato, archivo_salida, nombres_hojas(language),
+                              procesos_escritura(indice.filas, trabajadores))
+    anchos, anchos_años = None, {}
+    if escritor.usa_anchos:
+        anchos = indice.anchos(columnas_salida, fuentes=indice.categorias_fuente(), tope=ancho_maximo)
+        anchos_años = {año: indice.anchos(columnas_salida, año, fila['fuentes'], ancho_maximo)
+                       for año, fila in estadisticas.iterrows()}
+    escritor.al_avanzar = lambda hechos, total, hoja: _avisar(progreso, 'escritura', hechos, total, hoja)
+    titulos = {}
+    inicio = 0
+    try:
+        with instrumentacion.etapa('escritura', indice.filas):
+            for numero, archivo in enumerate(leidos):
+                _avisar(progreso, 'escritura', numero + 1, len(leidos) + 1, archivo)
+                inicio_archivo = inicio
+                for bloque in leer_csv_por_bloques(archivo, columnas, filas_bloque):
+                    bloque = indice.convertir(bloque, columnas_salida, numero, escritor.tipos_uniformes)
+                    fin = inicio + len(bloque)
+                    if fin - inicio_archivo > indice.filas_fuente[numero]:
+                        raise ValueError(translation_manager.get_translation(language, 'file_changed', archivo))
+                    años_bloque = años.iloc[inicio:fin].reset_index(drop=True)
+                    escritor.escribir_bloque('todos', bloque, mascara_duplicados[inicio:fin], años_bloque, anchos)
+                    if escritor.hojas_por_año:
+                        for año, posiciones in bloque.groupby(años_bloque.to_numpy(), sort=True).indices.items():
+                            escritor.escribir_bloque(año, bloque, anchos=anchos_años.get(año), posiciones=posiciones)
+                    # Títulos de los grupos más repetidos, para el reporte
+                    for posicion in mas_repetidos[(mas_repetidos >= inicio) & (mas_repetidos < fin)]:
+                        titulos[posicion] = bloque['Title'].iat[posicion - inicio] if 'Title' in bloque.columns else np.nan
+                    inicio = fin
+                    _avisar(progreso, 'escritura', numero + 1, len(leidos) + 1, archivo)
+                if inicio - inicio_archivo != indice.filas_fuente[numero]:
+                    raise ValueError(translation_manager.get_translation(language, 'file_changed', archivo))
+            
+            _avisar(progreso, 'escritura', len(leidos) + 1, len(leidos) + 1,
+                    translation_manager.get_translation(language, 'summary_sheet'))
+            escritor.escribir_resumen(datos_resumen(claves, estadisticas, mascara_duplicados, language))
+            escritor.cerrar()
+    except BaseException:
+        escritor.descartar()
+        raise
+    
+    conteo = pd.Series(tamaños[mas_repetidos], index=pd.Index([titulos.get(p) for p in mas_repetidos], name='Title'),
+                       name='count')
+    dup_report.extend(reporte_duplicados(int(mascara_duplicados.sum()), len(grupos), conteo, language))
+    return indice.filas, int(mascara_duplicados.sum()), dup_report, años_fallidos[0]
+
+def tabla_tiempos(instrumentacion, language):
+    """Líneas del informe con el tiempo, las filas y la memoria de cada etapa"""
+    lineas = ["\n" + translation_manager.get_translation(language, 'timing_title'),
+              f"{translation_manager.get_translation(language, 'timing_stage'):<32}{'s':>9}"
+              f"{translation_manager.get_translation(language, 'timing_rows'):>12}{'RSS MB':>10}"]
+    for total in instrumentacion.resumen():
+        nombre = translation_manager.get_translation(language, ETAPAS_INFORME.get(total['etapa'], total['etapa']))
+        if total['veces'] > 1:
+            nombre += f" (x{total['veces']})"
+        filas = '' if total['filas'] is None else total['filas']
+        rss = '' if total['rss_mb'] is None else f"{total['rss_mb']:.0f}"
+        lineas.append(f"{'  ' * total['nivel'] + nombre:<32}{total['segundos']:>9.2f}{filas:>12}{rss:>10}")
+    lineas.append(f"{translation_manager.get_translation(language, 'timing_total'):<32}{instrumentacion.transcurrido():>9.2f}")
+    return lineas
+
+def process_files(input_files, output_file, language='es', columnas=None, trabajadores=None, modo_duplicados='exacto',
+                  usar_cache=True, directorio_cache=None, incremental=False, progreso=None, al_informar=None,
+                  hooks=(), perfil=None, archivo_perfil=None, formato=None, por_bloques=False, filas_bloque=None,
+                  ancho_maximo=None, muestra_anchos=None, fusionar=False, prioridad_fuentes=None, reglas_fusion=None):
+    """Función principal para procesar archivos
+    
+    Con incremental=True solo se leen los archivos nuevos desde la ejecución anterior (según el índice
+    guardado junto al Excel) y se añaden al libro existente; si el índice no sirve se rehace todo.
+    
+    progreso(etapa, actual, total, detalle) se llama en cada archivo leído, al buscar duplicados y años y en
+    cada hoja escrita; si lanza ProcesoCancelado el proceso se detiene sin modificar el archivo de salida.
+    al_informar(linea) recibe cada línea del informe en cuanto se genera.
+    
+    hooks: funciones hook(evento, registro) llamadas al empezar y terminar cada etapa (ver Instrumentacion);
+    perfil='cprofile' o 'tracemalloc' guarda las estadísticas de toda la ejecución en archivo_perfil.
+    
+    formato: 'xlsx', 'parquet' (directorio particionado por año), 'csv' (zip de CSV) o 'sqlite'; si no se indica
+    se deduce de la extensión de output_file. El modo incremental solo está disponible para xlsx.
+    
+    por_bloques=True lee los archivos por bloques de filas_bloque filas en dos pasadas (ver procesar_por_bloques),
+    para exportaciones que no caben en memoria; no usa la caché ni el modo incremental.
+    
+    ancho_maximo: ancho máximo de las columnas de Excel (por defecto ANCHO_MAXIMO); muestra_anchos: filas por
+    hoja que se miden como mucho para calcular los anchos (None mide todas).
+    
+    fusionar=True añade la hoja Fusionados con un registro canónico por grupo de duplicados (DOI, ISBN o título
+    normalizado); prioridad_fuentes y reglas_fusion eligen de qué fuente sale cada campo (ver fusionar_registros).
+    No está disponible en el modo por bloques y desactiva el modo incremental.
+    """
+    instrumentacion = Instrumentacion(hooks, perfil, archivo_perfil)
+    with instrumentacion.captura():
+        return _process_files(input_files, output_file, language, columnas, trabajadores, modo_duplicados, usar_cache,
+                              directorio_cache, incremental, progreso, al_informar, instrumentacion, formato,
+                              por_bloques, filas_bloque, ancho_maximo or ANCHO_MAXIMO, muestra_anchos, fusionar,
+                              prioridad_fuentes, reglas_fusion)
+
+def _process_files(input_files, output_file, language, columnas, trabajadores, modo_duplicados, usar_cache,
+                   directorio_cache, incremental, progreso, al_informar, instrumentacion, formato, por_bloques,
+                   filas_bloque, ancho_maximo, muestra_anchos, fusionar, prioridad_fuentes, reglas_fusion):
+    report_lines = _LineasInforme(al_informar)
     
     report_lines.append("\n" + "="*60)
     report_lines.append(translation_manager.get_translation(language, 'window_title'))
@@ -179,30 +599,169 @@ def process_files(input_files, output_file, language='es'):
         report_lines.append("\n" + translation_manager.get_translation(language, 'no_valid_files'))
         return False, "\n".join(report_lines)
     
+    formato = formato_de_salida(output_file, formato)
+    if formato not in formatos_disponibles():
+        report_lines.append("\n" + translation_manager.get_translation(language, 'format_unavailable', formato))
+        return False, "\n".join(report_lines)
+    if incremental and formato != 'xlsx':
+        report_lines.append("\n" + translation_manager.get_translation(language, 'incremental_xlsx_only'))
+        incremental = False
+    for columna, regla in (reglas_fusion or {}).items():
+        if regla not in REGLAS_FUSION:
+            report_lines.append("\n" + translation_manager.get_translation(language, 'invalid_merge_rule', columna,
+                                                                            regla, ', '.join(REGLAS_FUSION)))
+            return False, "\n".join(report_lines)
+    if fusionar and por_bloques:
+        report_lines.append("\n" + translation_manager.get_translation(language, 'merge_chunked'))
+        fusionar = False
+    if fusionar and incremental:
+        report_lines.append("\n" + translation_manager.get_translation(language, 'incremental_merge'))
+        incremental = False
+    if modo_duplicados == 'difuso' and not por_bloques and not SIMILITUD_RAPIDA:
+        # Por bloques no se compara por similitud: ahí rapidfuzz no cambia nada
+        report_lines.append("\n" + translation_manager.get_translation(language, 'fuzzy_without_rapidfuzz'))
+    
     # Procesar datos
-    df = procesar_archivos(archivos_validos, language)
+    if columnas is not None:
+        # Columnas que el proceso necesita siempre
+        columnas = set(columnas) | {'Title', 'Publication Year'}
+    errores = []
+    
+    if por_bloques:
+        if incremental:
+            report_lines.append("\n" + translation_manager.get_translation(language, 'incremental_chunked'))
+        resultado = procesar_por_bloques(archivos_validos, output_file, language, columnas, modo_duplicados, formato,
+                                         filas_bloque, errores, progreso, instrumentacion, trabajadores, ancho_maximo,
+                                         muestra_anchos)
+        for error in errores:
+            report_lines.append(f" - {error}")
+        if resultado is None:
+            report_lines.append("\n" + translation_manager.get_translation(language, 'no_valid_files'))
+            return False, "\n".join(report_lines)
+        # El índice de una ejecución incremental anterior ya no corresponde a la salida
+        borrar_indice(output_file)
+        total_registros, total_duplicados, dup_report, años_fallidos = resultado
+        report_lines.extend(dup_report)
+        if años_fallidos:
+            report_lines.append("\n" + translation_manager.get_translation(language, 'unparsed_years', años_fallidos))
+        report_lines.append("\n" + translation_manager.get_translation(language, 'process_completed'))
+        report_lines.append(translation_manager.get_translation(language, 'chunked_mode', filas_bloque or FILAS_BLOQUE))
+        return _cerrar_informe(report_lines, language, output_file, total_registros, total_duplicados, instrumentacion)
+    
+    cache = SourceCache(directorio_cache) if usar_cache else None
+    
+    # Modo incremental: solo se leen los archivos que no estaban en el índice de la ejecución anterior
+    indice = None
+    archivos_leer = archivos_validos
+    if incremental:
+        huellas = {os.path.abspath(archivo): huella_archivo(archivo, columnas) for archivo in archivos_validos}
+        indice = cargar_indice(output_file, language, modo_duplicados)
+        pendientes = archivos_pendientes(indice, huellas) if indice is not None else None
+        if pendientes is None:
+            indice = None
+            report_lines.append("\n" + translation_manager.get_translation(language, 'incremental_rebuild'))
+        elif not pendientes:
+            report_lines.append("\n" + translation_manager.get_translation(language, 'incremental_up_to_date', output_file))
+            return True, "\n".join(report_lines)
+        else:
+            archivos_leer = pendientes
+    
+    leidos = []
+    with instrumentacion.etapa('lectura') as registro:
+        df = procesar_archivos(archivos_leer, language, columnas, trabajadores, errores, cache, leidos, progreso)
+        if indice is not None and df is not None and (not set(df.columns).issubset(indice['columnas'])
+                                                      or len(indice['años']) + len(df) >= LIMITE_FILAS_EXCEL):
+            # Los archivos nuevos traen columnas que el libro no tiene, o la hoja Todos ya no cabe en una sola
+            # hoja de Excel: se rehace completo
+            indice = None
+            report_lines.append("\n" + translation_manager.get_translation(language, 'incremental_rebuild'))
+            errores, leidos = [], []
+            df = procesar_archivos(archivos_validos, language, columnas, trabajadores, errores, cache, leidos, progreso)
+        registro['filas'] = 0 if df is None else len(df)
+    for error in errores:
+        report_lines.append(f" - {error}")
     if df is None:
         report_lines.append("\n" + translation_manager.get_translation(language, 'no_valid_files'))
         return False, "\n".join(report_lines)
     
-    # Identificar duplicados
-    df, dup_indices, dup_report = identificar_duplicados(df, language)
+    # Identificar duplicados (en modo incremental, contra los registros del índice)
+    _avisar(progreso, 'duplicados')
+    with instrumentacion.etapa('duplicados') as registro:
+        if indice is not None:
+            anteriores, años_anteriores = claves_indice(indice)
+            claves = pd.concat([anteriores, df.reindex(columns=anteriores.columns)], ignore_index=True)
+            _, mascara_duplicados, dup_report = identificar_duplicados(claves, language, modo=modo_duplicados)
+        else:
+            df, mascara_duplicados, dup_report = identificar_duplicados(df, language, modo=modo_duplicados)
+        # La máscara se conserva hasta el final: un bit por fila
+        mascara_duplicados = MascaraBits(mascara_duplicados)
+        registro['filas'] = len(mascara_duplicados)
     report_lines.extend(dup_report)
     
-    # Crear Excel organizado
+    # Extraer años
+    _avisar(progreso, 'años')
+    with instrumentacion.etapa('años', len(df)):
+        años, años_fallidos = extraer_años(df['Publication Year'])
+        años = compactar_años(años)
+    if años_fallidos:
+        report_lines.append("\n" + translation_manager.get_translation(language, 'unparsed_years', años_fallidos))
+    
+    # Fusionar cada grupo de duplicados en un registro
+    fusionados = None
+    if fusionar:
+        _avisar(progreso, 'fusion')
+        with instrumentacion.etapa('fusion', len(df)):
+            fusionados = fusionar_registros(df, grupos_fusion(df), prioridad_fuentes, reglas_fusion)
+        report_lines.append("\n" + translation_manager.get_translation(
+            language, 'merged_records', len(fusionados), int((fusionados[COLUMNA_REGISTROS] > 1).sum()), len(df)))
+    
+    # Crear Excel organizado (o añadir los registros nuevos al existente)
     report_lines.append("\n" + translation_manager.get_translation(language, 'process_completed'))
-    crear_excel_organizado(df, output_file, dup_indices, language)
+    total_registros = len(df)
+    with instrumentacion.etapa('escritura', len(df)):
+        if indice is not None:
+            _avisar(progreso, 'escritura', 1, 1, output_file)
+            años_todos = compactar_años(pd.concat([años_anteriores, años.astype('float64')], ignore_index=True))
+            actualizar_excel(df, output_file, indice, claves, años_todos, mascara_duplicados, language, años,
+                             ancho_maximo, muestra_anchos)
+            report_lines.append(translation_manager.get_translation(language, 'incremental_added', len(leidos), len(df)))
+            total_registros = len(claves)
+        else:
+            crear_salida_organizada(df, output_file, mascara_duplicados, language, años=años, progreso=progreso,
+                                    instrumentacion=instrumentacion, formato=formato, trabajadores=trabajadores,
+                                    ancho_maximo=ancho_maximo, muestra_anchos=muestra_anchos, fusionados=fusionados)
+            if not incremental:
+                # El índice de una ejecución incremental anterior ya no corresponde a la salida
+                borrar_indice(output_file)
     
+    if incremental:
+        with instrumentacion.etapa('indice', total_registros):
+            archivos = {os.path.abspath(archivo): huellas[os.path.abspath(archivo)] for archivo in leidos}
+            if indice is not None:
+                indice = extender_indice(indice, archivos, df, años, mascara_duplicados)
+            else:
+                indice = construir_indice(archivos, df, años, mascara_duplicados, language, modo_duplicados)
+            guardar_indice(output_file, indice)
+    
+    return _cerrar_informe(report_lines, language, output_file, total_registros, int(mascara_duplicados.sum()),
+                           instrumentacion, fusionados is not None)
+
+def _cerrar_informe(report_lines, language, output_file, total_registros, total_duplicados, instrumentacion,
+                    fusion=False):
+    """Añade el resumen final, la tabla de tiempos y el pie al informe"""
     report_lines.append("\n" + "="*60)
     report_lines.append(translation_manager.get_translation(language, 'process_completed'))
     report_lines.append("="*60)
     report_lines.append("\n" + translation_manager.get_translation(language, 'output_file', output_file))
-    report_lines.append(translation_manager.get_translation(language, 'total_records', len(df)))
-    report_lines.append(translation_manager.get_translation(language, 'duplicates', len(dup_indices)))
+    report_lines.append(translation_manager.get_translation(language, 'total_records', total_registros))
+    report_lines.append(translation_manager.get_translation(language, 'duplicates', total_duplicados))
     report_lines.append("\n" + translation_manager.get_translation(language, 'file_contents'))
     report_lines.append(translation_manager.get_translation(language, 'all_sheet'))
+    if fusion:
+        report_lines.append(translation_manager.get_translation(language, 'merged_sheet'))
     report_lines.append(translation_manager.get_translation(language, 'year_sheets'))
     report_lines.append(translation_manager.get_translation(language, 'summary_sheet'))
+    report_lines.extend(tabla_tiempos(instrumentacion, language))
     report_lines.append("\n" + translation_manager.get_translation(language, 'footer'))
     
     return True, "\n".join(report_lines)
\ No newline at end of file
@@ -0,0 +1,260 @@
+import copy
+import numpy as np
+import pandas as pd
+from duplicates import huellas, huellas_difusas, agrupar_huellas, componentes
+
+# Modo por bloques: una primera pasada guarda solo un índice compacto por fila (huellas de título y DOI, año y
+# fuente) y lo que hace falta saber de cada columna para escribir (tipo y ancho); la segunda pasada vuelve a leer
+# los bloques y los envía a los escritores. La memoria depende del tamaño de bloque y no del total de registros.
+
+HUELLA_VACIA = huellas(pd.Series([np.nan], dtype=object))[0]
+
+class IndiceBloques:
+    """Claves de todas las filas, acumuladas bloque a bloque durante la primera pasada"""
+
+    def __init__(self, modo='exacto', columna_titulo='Title', columna_doi='DOI', columna_fuente='Fuente',
+                 medir_anchos=False, muestra_anchos=None):
+        self.modo = modo
+        self.columna_titulo = columna_titulo
+        self.columna_doi = columna_doi
+        self.columna_fuente = columna_fuente
+        self.medir_anchos = medir_anchos
+        self.muestra_anchos = muestra_anchos  # Filas medidas como mucho por bloque (None: todas)
+        self.columnas = {}      # Columnas en orden de aparición, como las deja pd.concat
+        self.primeras = None    # Columnas del primer archivo (para colocar la fuente)
+        self.incompletas = set()
+        self.tipos = []         # Por archivo: (columnas no numéricas, columnas numéricas no enteras)
+        self.enteros = []       # Por archivo: tipo de cada columna entera, el que tendría al leerlo entero
+        self.tipos_comunes = {} # (columna, archivos) -> tipo de la columna entera tras pd.concat
+        self.fuentes = []
+        self.filas_fuente = []
+        self.años = []
+        self.titulos = []
+        self.normalizadas = []
+        self.principales = []
+        self.dois = []
+        self.largos = {}
+        self.largos_años = None
+        self.filas = 0
+
+    def agregar_archivo(self, fuente, bloques, compactos=None):
+        """Recorre los bloques (DataFrame, años) de un archivo; si falla a mitad, el índice queda como estaba"""
+        estado = {nombre: copy.copy(valor) for nombre, valor in vars(self).items()}
+        filas = 0
+        tipos = (set(), set(), {}, set())
+        columnas = {}
+        try:
+            for bloque, años in bloques:
+                if self.primeras is None:
+                    self.primeras = list(bloque.columns)
+                columnas.update(dict.fromkeys(bloque.columns))
+                self._agregar_bloque(bloque, años, tipos)
+                filas += len(bloque)
+        except BaseException:
+            vars(self).update(estado)
+            raise
+        self.fuentes.append(fuente)
+        self.filas_fuente.append(filas)
+        self.tipos.append(tipos[:2])
+        self.enteros.append(self._enteros(columnas, *tipos, compactos or {}))
+
+    def _agregar_bloque(self, bloque, años, tipos):
+        # Las columnas que faltan en algún bloque quedan con celdas vacías
+        if self.columnas:
+            self.incompletas.update(columna for columna in self.columnas if columna not in bloque.columns)
+            self.incompletas.update(columna for columna in bloque.columns if columna not in self.columnas)
+        self.columnas.update(dict.fromkeys(bloque.columns))
+        self._tipos(bloque, *tipos)
+
+        # Claves de duplicado: el título tal cual siempre (también cuenta los títulos distintos del resumen)
+        # y, en modo difuso, las huellas normalizadas
+        titulos = bloque[self.columna_titulo] if self.columna_titulo in bloque.columns else None
+        self.titulos.append(huellas(titulos) if titulos is not None else np.full(len(bloque), HUELLA_VACIA))
+        if self.modo == 'difuso':
+            dois = bloque[self.columna_doi] if self.columna_doi and self.columna_doi in bloque.columns else None
+            normalizadas, principales, h_dois = huellas_difusas(titulos if titulos is not None else
+                                                                pd.Series(np.nan, index=bloque.index, dtype=object), dois)
+            self.normalizadas.append(normalizadas)
+            self.principales.append(principales)
+            self.dois.append(h_dois)
+        # Los años caben sin pérdida en float32 (enteros hasta 2**24)
+        self.años.append(años.to_numpy(dtype='float32'))
+        self.filas += len(bloque)
+
+        if self.medir_anchos:
+            self._anchos(bloque, años)
+
+    @staticmethod
+    def _tipos(bloque, no_numericas, no_enteras, extremos, con_vacias):
+        """Columnas del archivo cuyos valores no son todos números (o enteros), extremos de las enteras y
+        columnas con celdas vacías
+
+        Como al leer cada archivo entero, una columna es numérica si lo es en todo el archivo.
+        """
+        for columna in bloque.columns:
+            if columna in no_numericas:
+                continue
+            serie = bloque[columna]
+            presentes = int(serie.notna().sum())
+            if presentes < len(serie):
+                con_vacias.add(columna)
+            if not presentes:
+                continue
+            numeros = pd.to_numeric(serie, errors='coerce')
+            if int(numeros.notna().sum()) != presentes:
+                no_numericas.add(columna)
+            elif columna not in no_enteras:
+                valores = numeros.dropna()
+                if not (valores % 1 == 0).all():
+                    no_enteras.add(columna)
+                    continue
+                minimo, maximo = extremos.get(columna, (valores.min(), valores.max()))
+                extremos[columna] = (min(minimo, valores.min()), max(maximo, valores.max()))
+
+    def _anchos(self, bloque, años):
+        """Largo máximo del texto de cada columna, en total y por año (las celdas vacías miden 3, como 'nan')"""
+        if self.muestra_anchos is not None and len(bloque) > self.muestra_anchos:
+            posiciones = np.unique(np.linspace(0, len(bloque) - 1, self.muestra_anchos).round().astype(np.int64))
+            bloque, años = bloque.iloc[posiciones], años.iloc[posiciones]
+        largos = pd.DataFrame({columna: bloque[columna].str.len().where(bloque[columna].notna(), 3)
+                               for columna in bloque.columns if columna != self.columna_fuente})
+        for columna, largo in largos.max().items():
+            self.largos[columna] = max(self.largos.get(columna, 0), int(largo))
+        por_año = largos.groupby(años.to_numpy()).max()
+        if self.largos_años is None:
+            self.largos_años = por_año
+        else:
+            self.largos_años = pd.concat([self.largos_años, por_año]).groupby(level=0).max()
+
+    def columnas_finales(self):
+        """Columnas de la salida, con la fuente en el mismo lugar en que la pone unir_fuentes"""
+        columnas = [columna for columna in self.columnas if columna != self.columna_fuente]
+        primeras = self.primeras or []
+        posicion = primeras.index(self.columna_fuente) if self.columna_fuente in primeras else len(primeras)
+        columnas.insert(min(posicion, len(columnas)), self.columna_fuente)
+        return columnas
+
+    def categorias_fuente(self):
+        return list(dict.fromkeys(self.fuentes))
+
+    @staticmethod
+    def _enteros(columnas, no_numericas, no_enteras, extremos, con_vacias, compactos):
+        """Tipo de cada columna entera de un archivo, el mismo que le dan el lector de CSV y _compactar
+
+        Con tipo compacto en el perfil (ingestion.tipos_compactos) la columna queda en ese tipo si sus valores
+        caben y si no en Int64; sin él, queda como la deja el lector: int64, o float64 si tiene celdas vacías.
+        """
+        enteros = {}
+        for columna in columnas:
+            if columna in no_numericas or columna in no_enteras:
+                continue
+            tipo = compactos.get(columna)
+            if tipo is None or tipo == 'category':
+                # Una categoría de números guarda los valores con el tipo del lector
+                enteros[columna] = 'float64' if columna in con_vacias else 'int64'
+                continue
+            limites = np.iinfo(tipo.lower())
+            minimo, maximo = extremos.get(columna, (0, 0))
+            enteros[columna] = tipo if limites.min <= minimo and maximo <= limites.max else 'Int64'
+        return enteros
+
+    def _tipo_entero(self, columna, archivos):
+        """Tipo de una columna entera en esos archivos: el de cada archivo y, entre varios, el que da pd.concat
+
+        Se calcula concatenando una fila de cada archivo (sin la columna si el archivo no la trae), así coincide
+        con unir_fuentes también en los casos en que pandas cambia el tipo (int64 con celdas vacías pasa a float64).
+        """
+        clave = (columna, tuple(archivos))
+        if clave not in self.tipos_comunes:
+            filas = [pd.DataFrame({columna: pd.Series([0], dtype=self.enteros[numero][columna])})
+                     if columna in self.enteros[numero] else pd.DataFrame(index=[0]) for numero in archivos]
+            self.tipos_comunes[clave] = pd.concat(filas, ignore_index=True)[columna].dtype
+        return self.tipos_comunes[clave]
+
+    def convertir(self, bloque, columnas, numero_fuente, tipos_uniformes=False):
+        """Prepara un bloque de la segunda pasada: todas las columnas, los tipos numéricos y la fuente
+
+        Con tipos_uniformes una columna solo es numérica si lo es en todos los archivos (formatos con esquema fijo).
+        Los enteros toman el tipo que tendrían sin bloques (Int32 para 'Cited by' de Scopus, float64 para una
+        columna entera con celdas vacías sin tipo en el perfil).
+        """
+        no_numericas, no_enteras = self.tipos[numero_fuente]
+        archivos = [numero_fuente]
+        if tipos_uniformes:
+            archivos = range(len(self.tipos))
+            no_numericas = set().union(*(tipos[0] for tipos in self.tipos))
+            no_enteras = set().union(*(tipos[1] for tipos in self.tipos))
+        presentes = set(bloque.columns)
+        bloque = bloque.reindex(columns=[c for c in columnas if c != self.columna_fuente])
+        for columna in bloque.columns:
+            if columna not in presentes:
+                # Celdas vacías del tipo que tendrá la columna en los archivos que sí la traen
+                vacia = object if columna in no_numericas or not tipos_uniformes else \
+                    'float64' if columna in no_enteras else self._tipo_entero(columna, archivos)
+                bloque[columna] = pd.Series(None, index=bloque.index, dtype=vacia)
+                continue
+            if columna in no_numericas:
+                continue
+            numeros = pd.to_numeric(bloque[columna], errors='coerce')
+            if columna not in no_enteras:
+                try:
+                    numeros = numeros.astype(self._tipo_entero(columna, archivos))
+                except (TypeError, ValueError, OverflowError):
+                    pass
+            bloque[columna] = numeros
+        categorias = self.categorias_fuente()
+        codigos = np.full(len(bloque), categorias.index(self.fuentes[numero_fuente]), dtype=np.int16)
+        bloque.insert(columnas.index(self.columna_fuente), self.columna_fuente,
+                      pd.Categorical.from_codes(codigos, categories=categorias))
+        return bloque
+
+    def años_serie(self):
+        return pd.Series(np.concatenate(self.años) if self.años else np.zeros(0), dtype='float64')
+
+    def etiquetas(self):
+        """Grupo de duplicados de cada fila (la posición de la primera fila de su grupo)"""
+        if self.modo == 'difuso':
+            return agrupar_huellas(np.concatenate(self.normalizadas), np.concatenate(self.principales),
+                                   np.concatenate(self.dois))
+        codigos, _ = pd.factorize(np.concatenate(self.titulos))
+        return componentes([codigos], self.filas)
+
+    def grupos_sin_titulo(self, etiquetas):
+        """Grupos de títulos vacíos, que en modo exacto no se cuentan en el informe (como en value_counts)"""
+        if self.modo == 'difuso':
+            return np.zeros(0, dtype=np.int64)
+        return np.unique(etiquetas[np.concatenate(self.titulos) == HUELLA_VACIA])
+
+    def claves(self):
+        """DataFrame compacto con las columnas que usan agrupar_por_año y datos_resumen"""
+        categorias = self.categorias_fuente()
+        codigos = np.repeat([categorias.index(f) for f in self.fuentes], self.filas_fuente)
+        datos = {self.columna_fuente: pd.Categorical.from_codes(codigos, categories=categorias)}
+        if self.columna_titulo in self.columnas:
+            # La huella del título cuenta los títulos distintos igual que el texto
+            datos[self.columna_titulo] = np.concatenate(self.titulos)
+        return pd.DataFrame(datos)
+
+    def anchos(self, columnas, año=None, fuentes=None, tope=None):
+        """Ancho de cada columna (largo máximo + 2) de la hoja con todos los registros o de un año
+
+        fuentes: nombres de las fuentes presentes en la hoja, para el ancho de la columna de fuente; tope, el ancho
+        máximo.
+        """
+        if año is None:
+            largos = self.largos
+        elif self.largos_años is not None and año in self.largos_años.index:
+            largos = self.largos_años.loc[año].dropna().to_dict()
+        else:
+            largos = {}
+        anchos = []
+        for columna in columnas:
+            if columna == self.columna_fuente:
+                largo = max(map(len, fuentes if fuentes is not None else self.fuentes), default=0)
+            else:
+                largo = largos.get(columna, 3)
+                if columna in self.incompletas:
+                    largo = max(largo, 3)
+            ancho = max(len(str(columna)), int(largo)) + 2
+            anchos.append(ancho if tope is None else min(ancho, tope))
+        return anchos
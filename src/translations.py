@@ -1,6 +1,6 @@
-from PyQt5.QtCore import QTranslator, QLocale
-
 def setup_translator():
+    # PyQt5 solo se necesita en la interfaz gráfica; la línea de órdenes no lo importa
+    from PyQt5.QtCore import QTranslator, QLocale
     translator = QTranslator()
     locale = QLocale.system().name()
     return translator
@@ -18,6 +18,17 @@ class TranslationManager:
                 'output_location': "Output File Location:",
                 'output_browse': "Browse",
                 'process': "Process Files",
+                'fuzzy_duplicates': "Detect near-duplicates (casing, punctuation, subtitles, DOI)",
+                'use_cache': "Reuse unchanged files from cache",
+                'clear_cache': "Clear cache",
+                'cache_cleared': "Cache cleared: {0} files removed",
+                'incremental_mode': "Only add new files to the existing workbook",
+                'cancel': "Cancel",
+                'stage_reading': "Reading {0} ({1}/{2})",
+                'stage_duplicates': "Detecting duplicates",
+                'stage_years': "Extracting years",
+                'stage_writing': "Writing {0} ({1}/{2})",
+                'process_cancelled': "⚠ Processing cancelled: the output file was not modified",
                 'report_title': "Processing Report",
                 'file_not_found': "File not found: {0}",
                 'invalid_csv': "File is not CSV: {0}",
@@ -41,11 +52,83 @@ class TranslationManager:
                 'top_duplicates': "Top 10 most duplicated articles:",
                 'no_title_column': "⚠ Warning: Column 'Title' not found",
                 'no_valid_years': "⚠ No valid years identified in the data",
+                'unparsed_years': "⚠ Values without a recognizable year: {0}",
+                'incremental_rebuild': "Incremental index missing or out of date: the workbook was rebuilt from all files",
+                'incremental_up_to_date': "No new files since the last run: {0} is up to date",
+                'incremental_added': "Incremental update: {0} new files, {1} new records",
+                'format_unavailable': "ERROR: Output format '{0}' is not available (Parquet requires pyarrow)",
+                'incremental_xlsx_only': "Incremental mode is only available for Excel output: all files were processed",
+                'incremental_chunked': "Incremental mode is not available in chunked mode: all files were processed",
+                'chunked_mode': "Chunked mode: files read in blocks of {0} rows",
+                'file_changed': "{0} changed while it was being processed",
+                'chunked': "Low-memory mode (read files in chunks, for very large exports)",
+                'merge_duplicates': "Add a 'Deduplicated' sheet with each duplicate group merged into one record",
+                'merged_sheet': "Deduplicated",
+                'stage_merge': "Merging duplicate records",
+                'merged_records': "Deduplicated: {0} records ({1} duplicate groups merged, from {2} records)",
+                'merge_chunked': "Record merging is not available in chunked mode: no Deduplicated sheet was created",
+                'fuzzy_without_rapidfuzz': "rapidfuzz is not installed: title similarity uses difflib, which is much slower on large projects (pip install rapidfuzz)",
+                'incremental_merge': "Incremental mode is not available when merging records: all files were processed",
+                'invalid_merge_rule': "ERROR: Invalid merge rule for '{0}': {1} (valid rules: {2})",
+                'timing_title': "Time per stage:",
+                'timing_stage': "Stage",
+                'timing_rows': "Rows",
+                'timing_read': "Reading CSV files",
+                'timing_duplicates': "Duplicate detection",
+                'timing_years': "Year extraction",
+                'timing_merge': "Record merging",
+                'timing_write': "Writing output",
+                'timing_widths': "Column sizing",
+                'timing_index': "Incremental index",
+                'timing_total': "Total",
                 'year': "Year",
                 'total_articles': "Total Articles",
                 'unique_articles': "Unique Articles",
                 'duplicate_count': "Duplicates",
-                'sources': "Sources"
+                'sources': "Sources",
+                'cli_description': "Unifies CSV exports (Zotero, Scopus, ScienceDirect, ProQuest), flags duplicates and builds a workbook organized by year, without the graphical interface.",
+                'cli_inputs': "Input files or glob patterns (e.g. 'exports/*.csv')",
+                'cli_output': "Output file (.xlsx, .parquet, .zip with CSV files or .sqlite)",
+                'cli_format': "Output format; by default it is taken from the --output extension (xlsx if not recognized)",
+                'cli_language': "Language of the report, the sheets and these messages",
+                'cli_fuzzy': "Detect near-duplicates (normalized title and DOI)",
+                'cli_incremental': "Only add new files to the existing workbook",
+                'cli_merge': "Add a sheet (or table) with each duplicate group merged into one record",
+                'cli_source_priority': "Sources (file names without extension) from most to least preferred when merging, comma-separated",
+                'cli_merge_rule': "Merge rule for a column: prioridad, mas_largo or union (repeatable)",
+                'cli_merge_rule_metavar': "COLUMN=RULE",
+                'cli_chunked': "Read the files in chunks in two passes, for exports that do not fit in memory",
+                'cli_chunk_rows': "Rows per chunk with --chunked (100000 by default)",
+                'cli_max_width': "Maximum Excel column width (255 by default, the Excel maximum)",
+                'cli_width_sample': "Maximum rows per sheet measured for column widths (all by default)",
+                'cli_columns': "Columns to load, comma-separated",
+                'cli_workers': "Parallel processes for reading the files and generating the Excel sheets",
+                'cli_no_cache': "Do not use the cache of files already read",
+                'cli_cache_dir': "Cache directory",
+                'cli_clear_cache': "Clear the cache before processing",
+                'cli_manifest': "JSON manifest with several jobs run in order (repeatable)",
+                'cli_quiet': "Only show the result of each job",
+                'cli_timings': "Show the start and end of each stage on stderr with its time, rows and memory",
+                'cli_profile': "Profile the run and save the statistics to a file",
+                'cli_profile_output': "File for the --profile statistics (metareviewx.prof or .tracemalloc by default)",
+                'cli_no_inputs': "no input files",
+                'cli_no_output': "missing output file (--output)",
+                'cli_no_output_dir': "output directory does not exist: {0}",
+                'cli_invalid_language': "invalid language: {0}",
+                'cli_invalid_format': "invalid format: {0}",
+                'cli_invalid_positive': "'{0}' must be a whole number greater than 0: {1}",
+                'cli_invalid_flag': "'{0}' must be true or false: {1}",
+                'cli_invalid_text': "'{0}' must be a text: {1}",
+                'cli_invalid_texts': "'{0}' must be a text or a list of texts: {1}",
+                'cli_invalid_merge_rule': "invalid merge rule (expected COLUMN=RULE): {0}",
+                'cli_invalid_merge_rules': "invalid merge rules (expected an object column -> rule): {0}",
+                'cli_invalid_manifest': "the manifest must be a list of jobs or {{\"jobs\": [...]}}",
+                'cli_manifest_job': "{0}, job {1}: {2}",
+                'cli_no_jobs': "give input files and --output, or --manifest",
+                'cli_cache_cleared': "{0} entries removed from {1}",
+                'cli_stage_rows': "{0} rows",
+                'cli_stage_end': "end",
+                'cli_stage_interrupted': "interrupted"
             },
             'es': {
                 'window_title': "MetaReviewX",
@@ -57,6 +140,17 @@ class TranslationManager:
                 'output_location': "Ubicación del archivo de salida:",
                 'output_browse': "Examinar",
                 'process': "Procesar Archivos",
+                'fuzzy_duplicates': "Detectar casi duplicados (mayúsculas, puntuación, subtítulos, DOI)",
+                'use_cache': "Reutilizar archivos sin cambios desde la caché",
+                'clear_cache': "Vaciar caché",
+                'cache_cleared': "Caché vaciada: {0} archivos borrados",
+                'incremental_mode': "Solo añadir archivos nuevos al libro existente",
+                'cancel': "Cancelar",
+                'stage_reading': "Leyendo {0} ({1}/{2})",
+                'stage_duplicates': "Buscando duplicados",
+                'stage_years': "Extrayendo años",
+                'stage_writing': "Escribiendo {0} ({1}/{2})",
+                'process_cancelled': "⚠ Proceso cancelado: el archivo de salida no se modificó",
                 'report_title': "Reporte de Procesamiento",
                 'file_not_found': "Archivo no encontrado: {0}",
                 'invalid_csv': "El archivo no es CSV: {0}",
@@ -80,11 +174,83 @@ class TranslationManager:
                 'top_duplicates': "Top 10 artículos más duplicados:",
                 'no_title_column': "⚠ Advertencia: No se encontró la columna 'Title'",
                 'no_valid_years': "⚠ No se pudieron identificar años válidos en los datos",
+                'unparsed_years': "⚠ Valores sin un año reconocible: {0}",
+                'incremental_rebuild': "Índice incremental ausente o desactualizado: el libro se generó de nuevo con todos los archivos",
+                'incremental_up_to_date': "No hay archivos nuevos desde la última ejecución: {0} está al día",
+                'incremental_added': "Actualización incremental: {0} archivos nuevos, {1} registros nuevos",
+                'format_unavailable': "ERROR: El formato de salida '{0}' no está disponible (Parquet requiere pyarrow)",
+                'incremental_xlsx_only': "El modo incremental solo está disponible para Excel: se procesaron todos los archivos",
+                'incremental_chunked': "El modo incremental no está disponible en el modo por bloques: se procesaron todos los archivos",
+                'chunked_mode': "Modo por bloques: archivos leídos en bloques de {0} filas",
+                'file_changed': "{0} cambió mientras se procesaba",
+                'chunked': "Modo de poca memoria (leer los archivos por bloques, para exportaciones muy grandes)",
+                'merge_duplicates': "Añadir una hoja 'Deduplicados' con cada grupo de duplicados fusionado en un registro",
+                'merged_sheet': "Deduplicados",
+                'stage_merge': "Fusionando registros duplicados",
+                'merged_records': "Deduplicados: {0} registros ({1} grupos de duplicados fusionados, de {2} registros)",
+                'merge_chunked': "La fusión de registros no está disponible en el modo por bloques: no se creó la hoja Deduplicados",
+                'fuzzy_without_rapidfuzz': "rapidfuzz no está instalado: la similitud de títulos usa difflib, mucho más lento en proyectos grandes (pip install rapidfuzz)",
+                'incremental_merge': "El modo incremental no está disponible al fusionar registros: se procesaron todos los archivos",
+                'invalid_merge_rule': "ERROR: Regla de fusión no válida para '{0}': {1} (reglas válidas: {2})",
+                'timing_title': "Tiempo por etapa:",
+                'timing_stage': "Etapa",
+                'timing_rows': "Filas",
+                'timing_read': "Lectura de CSV",
+                'timing_duplicates': "Detección de duplicados",
+                'timing_years': "Extracción de años",
+                'timing_merge': "Fusión de registros",
+                'timing_write': "Escritura de la salida",
+                'timing_widths': "Ancho de columnas",
+                'timing_index': "Índice incremental",
+                'timing_total': "Total",
                 'year': "Año",
                 'total_articles': "Total Artículos",
                 'unique_articles': "Artículos Únicos",
                 'duplicate_count': "Duplicados",
-                'sources': "Fuentes"
+                'sources': "Fuentes",
+                'cli_description': "Unifica exportaciones CSV (Zotero, Scopus, ScienceDirect, ProQuest), marca duplicados y genera un libro organizado por años, sin interfaz gráfica.",
+                'cli_inputs': "Archivos o patrones glob de entrada (p. ej. 'exports/*.csv')",
+                'cli_output': "Archivo de salida (.xlsx, .parquet, .zip con CSV o .sqlite)",
+                'cli_format': "Formato de salida; por defecto se deduce de la extensión de --output (xlsx si no se reconoce)",
+                'cli_language': "Idioma del informe, de las hojas y de estos mensajes",
+                'cli_fuzzy': "Detectar casi duplicados (título normalizado y DOI)",
+                'cli_incremental': "Solo añadir los archivos nuevos al libro existente",
+                'cli_merge': "Añadir una hoja (o tabla) con cada grupo de duplicados fusionado en un registro",
+                'cli_source_priority': "Fuentes (nombres de archivo sin extensión) de la preferida a la menos preferida al fusionar, separadas por comas",
+                'cli_merge_rule': "Regla de fusión de una columna: prioridad, mas_largo o union (se puede repetir)",
+                'cli_merge_rule_metavar': "COLUMNA=REGLA",
+                'cli_chunked': "Leer los archivos por bloques en dos pasadas, para exportaciones que no caben en memoria",
+                'cli_chunk_rows': "Filas por bloque con --chunked (por defecto 100000)",
+                'cli_max_width': "Ancho máximo de las columnas del Excel (por defecto 255, el máximo de Excel)",
+                'cli_width_sample': "Filas por hoja que se miden como mucho para el ancho de las columnas (por defecto todas)",
+                'cli_columns': "Columnas a cargar, separadas por comas",
+                'cli_workers': "Procesos en paralelo para leer los archivos y generar las hojas del Excel",
+                'cli_no_cache': "No usar la caché de archivos leídos",
+                'cli_cache_dir': "Directorio de la caché",
+                'cli_clear_cache': "Vaciar la caché antes de procesar",
+                'cli_manifest': "Manifiesto JSON con varios trabajos que se ejecutan en orden (se puede repetir)",
+                'cli_quiet': "Mostrar solo el resultado de cada trabajo",
+                'cli_timings': "Mostrar en stderr el inicio y el fin de cada etapa con su tiempo, filas y memoria",
+                'cli_profile': "Perfilar la ejecución y guardar las estadísticas en un archivo",
+                'cli_profile_output': "Archivo de las estadísticas de --profile (por defecto metareviewx.prof o .tracemalloc)",
+                'cli_no_inputs': "no hay archivos de entrada",
+                'cli_no_output': "falta el archivo de salida (--output)",
+                'cli_no_output_dir': "no existe el directorio de salida: {0}",
+                'cli_invalid_language': "idioma no válido: {0}",
+                'cli_invalid_format': "formato no válido: {0}",
+                'cli_invalid_positive': "'{0}' debe ser un número entero mayor que 0: {1}",
+                'cli_invalid_flag': "'{0}' debe ser true o false: {1}",
+                'cli_invalid_text': "'{0}' debe ser un texto: {1}",
+                'cli_invalid_texts': "'{0}' debe ser un texto o una lista de textos: {1}",
+                'cli_invalid_merge_rule': "regla de fusión no válida (se espera COLUMNA=REGLA): {0}",
+                'cli_invalid_merge_rules': "reglas de fusión no válidas (se espera un objeto columna -> regla): {0}",
+                'cli_invalid_manifest': "el manifiesto debe ser una lista de trabajos o {{\"jobs\": [...]}}",
+                'cli_manifest_job': "{0}, trabajo {1}: {2}",
+                'cli_no_jobs': "indique archivos de entrada y --output, o --manifest",
+                'cli_cache_cleared': "{0} entradas borradas de {1}",
+                'cli_stage_rows': "{0} filas",
+                'cli_stage_end': "fin",
+                'cli_stage_interrupted': "interrumpida"
             }
         }
     
@@ -0,0 +1,655 @@
+import importlib.util
+import io
+import itertools
+import os
+import pickle
+import shutil
+import sqlite3
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.cell.cell import ERROR_CODES
+from openpyxl.styles import PatternFill
+from openpyxl.utils import get_column_letter
+import xlsx
+
+# Cada formato guarda la misma estructura: todos los registros (con la marca de duplicado), una parte por año
+# y el resumen. Los escritores reciben los registros por bloques, así que no necesitan tenerlos todos en memoria.
+
+LIMITE_FILAS_EXCEL = 1048576  # Filas por hoja en Excel, encabezado incluido
+FILAS_FRAGMENTO = 20000  # Filas que un proceso convierte a XML de una vez al escribir Excel en paralelo
+ANCHO_MAXIMO = 255  # Ancho de columna máximo que admite Excel
+COLUMNA_AÑO = 'Año'
+COLUMNA_DUPLICADO = 'Duplicado'
+COLUMNA_FILA = 'Fila'
+SIN_AÑO = 'sin_año'  # Partición de los registros sin año
+
+EXTENSIONES = {'.xlsx': 'xlsx', '.parquet': 'parquet', '.zip': 'csv', '.sqlite': 'sqlite', '.sqlite3': 'sqlite',
+               '.db': 'sqlite'}
+
+def valores_columna(serie):
+    """Valores de una columna listos para openpyxl (los nulos pasan a None, que no se escribe, como en xlsx.filas_xml)"""
+    if serie.hasnans:
+        return serie.to_numpy(dtype=object, na_value=None)
+    return serie.to_numpy()
+
+def _texto_no_literal(serie):
+    """Filas cuyo texto openpyxl no escribiría tal cual: '=...' (fórmula) y códigos de error como '#N/A'
+
+    Devuelve None si no hay ninguna; esas celdas se escriben como texto, igual que en el XML de xlsx.celda_xml.
+    """
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        # Se mira cada categoría una vez (el código -1, sin valor, va al final)
+        categorias = _texto_no_literal(pd.Series(serie.cat.categories))
+        return None if categorias is None else np.append(categorias, False)[serie.cat.codes.to_numpy()]
+    if serie.dtype != object and not isinstance(serie.dtype, pd.StringDtype):
+        return None
+    try:
+        formulas = serie.str.startswith('=') & (serie.str.len() > 1)
+    except AttributeError:  # Sin ningún texto
+        return None
+    mascara = formulas.to_numpy(dtype=bool, na_value=False) | serie.isin(ERROR_CODES).to_numpy(dtype=bool)
+    return mascara if mascara.any() else None
+
+def _años_enteros(años):
+    """Años como enteros con nulos (el año extraído llega como float con NaN; lo que no cabe se deja vacío)"""
+    años = pd.Series(años, dtype='float64').reset_index(drop=True)
+    return años.where(años.abs() < 2**31).astype('Int32')
+
+def _texto_si_mezcla(df):
+    """Las columnas de objetos que mezclan números y texto (archivos con tipos distintos) pasan a texto"""
+    mezcladas = {}
+    for columna in df.columns:
+        if df[columna].dtype == object:
+            tipos = set(map(type, df[columna].dropna()))
+            if len(tipos) > 1:
+                mezcladas[columna] = df[columna].map(str, na_action='ignore')
+    return df.assign(**mezcladas) if mezcladas else df
+
+class OutputWriter:
+    """Base de los formatos de salida
+
+    hoja es 'todos' o un año; los bloques de 'todos' traen también la máscara de duplicados y los años.
+    posiciones indica las filas de df que forman el bloque (las de un año), para no copiar el DataFrame por hoja;
+    sin posiciones el bloque es df entero. Los formatos sin hojas_por_año obtienen cada año de los bloques de 'todos' y el llamador no les envía
+    las particiones; usa_anchos indica si el formato aprovecha los anchos de columna y tipos_uniformes si
+    cada columna debe tener el mismo tipo en todos los bloques.
+
+    Los formatos con escribe_al_cerrar hacen la mayor parte del trabajo en cerrar(); mientras tanto llaman a
+    al_avanzar(hechos, total, hoja), que puede detener la escritura lanzando una excepción.
+    """
+    formato = None
+    hojas_por_año = True
+    usa_anchos = False
+    tipos_uniformes = False
+    escribe_al_cerrar = False
+
+    def __init__(self, destino, nombres):
+        self.destino = destino
+        self.nombres = nombres
+        self.temporal = destino + '.tmp'
+        self.al_avanzar = None
+
+    def escribir_bloque(self, hoja, df, duplicados=None, años=None, anchos=None, posiciones=None):
+        raise NotImplementedError
+
+    def escribir_resumen(self, resumen_data):
+        raise NotImplementedError
+
+    def escribir_fusionados(self, df, anchos=None):
+        """Registros fusionados (uno por grupo de duplicados), que se escriben de una vez junto a 'todos'"""
+        raise NotImplementedError
+
+    def _finalizar(self):
+        """Deja el resultado completo en self.temporal"""
+        raise NotImplementedError
+
+    def cerrar(self):
+        """Termina la salida y la mueve a su destino (el destino anterior solo se reemplaza si todo salió bien)"""
+        self._finalizar()
+        # Un archivo se reemplaza de forma atómica; un directorio (o un destino de otro tipo) se borra antes
+        if os.path.isdir(self.destino):
+            shutil.rmtree(self.destino)
+        elif os.path.isdir(self.temporal) and os.path.exists(self.destino):
+            os.remove(self.destino)
+        os.replace(self.temporal, self.destino)
+
+    def descartar(self):
+        """Borra lo escrito hasta ahora sin tocar el destino"""
+        if os.path.isdir(self.temporal):
+            shutil.rmtree(self.temporal, ignore_errors=True)
+        elif os.path.exists(self.temporal):
+            os.remove(self.temporal)
+
+class ExcelWriter(OutputWriter):
+    """Libro de Excel con hojas Todos (duplicados en amarillo), Fusionados (si se pide), una por año y Resumen
+
+    Las hojas que superan el límite de filas de Excel continúan en otra hoja con el sufijo (2), (3)...
+    """
+    formato = 'xlsx'
+    usa_anchos = True
+    limite_filas = LIMITE_FILAS_EXCEL
+
+    def __init__(self, destino, nombres):
+        super().__init__(destino, nombres)
+        # Modo solo escritura: las filas se vuelcan al disco y la memoria no crece con el tamaño del libro
+        self.libro = Workbook(write_only=True)
+        self.relleno = PatternFill(start_color="FFFF00", end_color="FFFF00", fill_type="solid")
+        self.hojas = {}
+        self.orden = {}
+        self.valores = None  # (DataFrame, valores de sus columnas, filas con texto no literal): se reutilizan por año
+
+    def _nombre(self, hoja, parte):
+        base = self.nombres[hoja] if hoja in ('todos', 'fusionados') else f"{self.nombres['año']} {int(hoja)}"
+        sufijo = f" ({parte})" if parte > 1 else ''
+        return base[:31 - len(sufijo)] + sufijo
+
+    def _crear_hoja(self, titulo, anchos, orden):
+        """Crea una hoja de solo escritura con los anchos de columna ya fijados"""
+        ws = self.libro.create_sheet(titulo)
+        self.orden[ws.title] = orden
+        for col_idx, ancho in enumerate(anchos or (), start=1):
+            ws.column_dimensions[get_column_letter(col_idx)].width = ancho
+        return ws
+
+    def _nueva_parte(self, hoja, columnas, anchos):
+        parte = self.hojas[hoja]['parte'] + 1 if hoja in self.hojas else 1
+        orden = {'todos': (0, 0, parte), 'fusionados': (0, 1, parte)}.get(hoja, (1, hoja, parte))
+        ws = self._crear_hoja(self._nombre(hoja, parte), anchos, orden)
+        ws.append(list(columnas))
+        self.hojas[hoja] = {'hoja': ws, 'filas': 1, 'parte': parte, 'anchos': anchos}
+        return self.hojas[hoja]
+
+    def _escribir_filas(self, ws, columnas, resaltar=None, texto=None):
+        """Escribe las filas en streaming, resaltando las indicadas
+
+        texto: filas con algún texto que openpyxl tomaría por fórmula o error; en ellas el texto se fija como tal.
+        """
+        for posicion, fila in enumerate(zip(*columnas)):
+            marcada = resaltar is not None and resaltar[posicion]
+            if marcada or (texto is not None and texto[posicion]):
+                celdas = []
+                for valor in fila:
+                    celda = WriteOnlyCell(ws, value=valor)
+                    if isinstance(valor, str):
+                        celda.data_type = 's'
+                    if marcada:
+                        celda.fill = self.relleno
+                    celdas.append(celda)
+                ws.append(celdas)
+            else:
+                ws.append(fila)
+
+    def _valores(self, df):
+        """Valores de cada columna de df, convertidos una sola vez para todas las hojas que salen de él, y las
+        filas con texto no literal (ver _texto_no_literal)"""
+        if self.valores is None or self.valores[0] is not df:
+            texto = None
+            for columna in df.columns:
+                mascara = _texto_no_literal(df[columna])
+                if mascara is not None:
+                    texto = mascara if texto is None else texto | mascara
+            self.valores = (df, [valores_columna(df[columna]) for columna in df.columns], texto)
+        return self.valores[1], self.valores[2]
+
+    def escribir_bloque(self, hoja, df, duplicados=None, años=None, anchos=None, posiciones=None):
+        estado = self.hojas.get(hoja) or self._nueva_parte(hoja, df.columns, anchos)
+        columnas, texto = self._valores(df)
+        if posiciones is not None:
+            # Solo se copian las referencias de las celdas del año, no el DataFrame
+            columnas = [valores[posiciones] for valores in columnas]
+            texto = None if texto is None else texto[posiciones]
+        filas = len(columnas[0]) if columnas else 0
+        inicio = 0
+        while inicio < filas:
+            if estado['filas'] >= self.limite_filas:
+                estado = self._nueva_parte(hoja, df.columns, estado['anchos'])
+            fin = min(filas, inicio + self.limite_filas - estado['filas'])
+            self._escribir_filas(estado['hoja'], [valores[inicio:fin] for valores in columnas],
+                                 None if duplicados is None else duplicados[inicio:fin],
+                                 None if texto is None else texto[inicio:fin])
+            estado['filas'] += fin - inicio
+            inicio = fin
+
+    def escribir_fusionados(self, df, anchos=None):
+        self.escribir_bloque('fusionados', df, anchos=anchos)
+
+    def escribir_resumen(self, resumen_data):
+        # Anchos calculados antes de volcar las filas
+        anchos = [max(len(str(valor)) for valor in [header] + data) + 2 for header, data in resumen_data.items()]
+        ws = self._crear_hoja(self.nombres['resumen'], anchos, (2, 0, 0))
+        ws.append(list(resumen_data.keys()))
+        for fila in zip(*resumen_data.values()):
+            ws.append(list(fila))
+
+    def _finalizar(self):
+        # Con bloques intercalados (modo por bloques) las hojas se crean a medida que aparecen los años:
+        # se ordenan como en el modo normal, Todos, Fusionados, los años en orden y el Resumen, cada una con sus
+        # continuaciones
+        self.libro._sheets.sort(key=lambda ws: self.orden[ws.title])
+        self.valores = None
+        self.libro.save(self.temporal)
+
+    def descartar(self):
+        # Cierra las hojas a medio escribir (openpyxl borra sus temporales al terminar el programa)
+        for ws in self.libro.worksheets:
+            if not ws.closed:
+                ws.close()
+        self.valores = None
+        super().descartar()
+
+_TABLA_COMPARTIDA = None  # (ruta, tabla, columnas aparte) del último bloque abierto en este proceso
+
+def _tabla_compartida(ruta):
+    """Abre (una vez por proceso) el bloque guardado en formato Arrow, mapeado en memoria y sin copiarlo"""
+    global _TABLA_COMPARTIDA
+    if _TABLA_COMPARTIDA is None or _TABLA_COMPARTIDA[0] != ruta:
+        import pyarrow
+        tabla = pyarrow.ipc.open_file(pyarrow.memory_map(ruta)).read_all()
+        aparte = {}
+        if os.path.exists(ruta + '.pkl'):
+            with open(ruta + '.pkl', 'rb') as f:
+                aparte = pickle.load(f)
+        _TABLA_COMPARTIDA = (ruta, tabla, aparte)
+    return _TABLA_COMPARTIDA[1], _TABLA_COMPARTIDA[2]
+
+def _renderizar_fragmento(ruta, filas, fila_inicio, resaltar, estilo, destino):
+    """Convierte a XML un fragmento de hoja (en un proceso aparte) y lo guarda en destino
+
+    filas: slice (filas consecutivas del bloque) o array de posiciones (las de un año).
+    """
+    tabla, aparte = _tabla_compartida(ruta)
+    columnas = []
+    for i in range(tabla.num_columns):
+        if i in aparte:
+            columnas.append(aparte[i][filas].tolist())
+        elif isinstance(filas, slice):
+            columnas.append(tabla.column(i).slice(filas.start, filas.stop - filas.start).to_pylist())
+        else:
+            columnas.append(tabla.column(i).take(filas).to_pylist())
+    filas_xml = xlsx.filas_xml(columnas, fila_inicio, resaltar, estilo)
+    with open(destino, 'wb') as f:
+        while lote := list(itertools.islice(filas_xml, 1000)):
+            f.write(''.join(lote).encode('utf-8'))
+    return destino
+
+class _HojaXml:
+    """Hoja que se arma al cerrar el libro: filas añadidas aquí (encabezado, resumen) y fragmentos renderizados
+    en otros procesos, en el orden en que se pidieron"""
+
+    def __init__(self, title, anchos):
+        self.title = title
+        self.anchos = anchos
+        self.filas = []
+        self.fragmentos = []
+
+    def append(self, fila):
+        self.filas.append(list(fila))
+
+class ExcelParaleloWriter(ExcelWriter):
+    """Libro de Excel como ExcelWriter, con el XML de las hojas generado en varios procesos
+
+    Cada bloque se guarda una vez en formato Arrow en un directorio temporal; los procesos lo abren mapeado en
+    memoria y convierten a XML fragmentos de hasta FILAS_FRAGMENTO filas de cualquier hoja. Al cerrar, los
+    fragmentos se unen en orden dentro de un libro creado por openpyxl, así que el resultado no depende de qué
+    proceso termine antes. Las columnas que Arrow no admite (números y texto mezclados) se pasan con pickle.
+    Requiere pyarrow.
+    """
+    filas_fragmento = FILAS_FRAGMENTO
+    escribe_al_cerrar = True
+
+    def __init__(self, destino, nombres, trabajadores):
+        OutputWriter.__init__(self, destino, nombres)
+        import pyarrow
+        self.pa = pyarrow
+        self.trabajadores = trabajadores
+        self.pool = None
+        self.hojas = {}
+        self.orden = {}
+        self.partes = {}
+        self.bloque = None  # (DataFrame, ruta) del último bloque guardado
+        self.bloques = 0
+        self.fragmentos = 0
+        self.pasos = self.hechos = 0  # Avance al cerrar: cada fragmento cuenta al terminar y al unirse al libro
+        self.directorio = tempfile.mkdtemp(prefix='metareviewx-', dir=os.path.dirname(os.path.abspath(destino)))
+        # Estilos por defecto de openpyxl más el relleno amarillo de los duplicados
+        esqueleto = io.BytesIO()
+        libro = Workbook(write_only=True)
+        libro.create_sheet('-')
+        libro.save(esqueleto)
+        with zipfile.ZipFile(esqueleto) as zin:
+            self.estilos_xml, self.estilo = xlsx.asegurar_estilo_resaltado(zin.read('xl/styles.xml').decode('utf-8'))
+
+    def _crear_hoja(self, titulo, anchos, orden):
+        ws = _HojaXml(titulo, anchos)
+        self.orden[titulo] = orden
+        self.partes[titulo] = ws
+        return ws
+
+    def _guardar_bloque(self, df):
+        """Guarda df en formato Arrow (una vez por bloque) y devuelve su ruta"""
+        if self.bloque is not None and self.bloque[0] is df:
+            return self.bloque[1]
+        pa = self.pa
+        ruta = os.path.join(self.directorio, f'bloque_{self.bloques}.arrow')
+        self.bloques += 1
+        arrays, aparte = [], {}
+        for i, columna in enumerate(df.columns):
+            try:
+                arrays.append(pa.array(df[columna], from_pandas=True))
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                arrays.append(pa.nulls(len(df)))
+                aparte[i] = valores_columna(df[columna])
+        tabla = pa.Table.from_arrays(arrays, names=[str(i) for i in range(len(arrays))])
+        with pa.OSFile(ruta, 'wb') as archivo, pa.ipc.new_file(archivo, tabla.schema) as escritor:
+            escritor.write_table(tabla)
+        if aparte:
+            with open(ruta + '.pkl', 'wb') as f:
+                pickle.dump(aparte, f, protocol=pickle.HIGHEST_PROTOCOL)
+        self.bloque = (df, ruta)
+        return ruta
+
+    def escribir_bloque(self, hoja, df, duplicados=None, años=None, anchos=None, posiciones=None):
+        estado = self.hojas.get(hoja) or self._nueva_parte(hoja, df.columns, anchos)
+        ruta = self._guardar_bloque(df)
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.trabajadores)
+        filas = len(df) if posiciones is None else len(posiciones)
+        inicio = 0
+        while inicio < filas:
+            if estado['filas'] >= self.limite_filas:
+                estado = self._nueva_parte(hoja, df.columns, estado['anchos'])
+            fin = min(filas, inicio + self.limite_filas - estado['filas'], inicio + self.filas_fragmento)
+            seleccion = slice(inicio, fin) if posiciones is None else np.asarray(posiciones[inicio:fin])
+            resaltar = None if duplicados is None else np.asarray(duplicados[inicio:fin], dtype=bool)
+            destino = os.path.join(self.directorio, f'fragmento_{self.fragmentos}.xml')
+            self.fragmentos += 1
+            estado['hoja'].fragmentos.append(self.pool.submit(_renderizar_fragmento, ruta, seleccion,
+                                                              estado['filas'] + 1, resaltar, self.estilo, destino))
+            estado['filas'] += fin - inicio
+            inicio = fin
+
+    def _escribir_parte(self, ws, destino):
+        """Cabecera, filas propias y fragmentos (esperando a cada uno en orden) de una hoja"""
+        destino.write((xlsx.CABECERA_HOJA + xlsx.columnas_xml(ws.anchos) + '<sheetData>').encode('utf-8'))
+        if ws.filas:
+            destino.write(''.join(xlsx.filas_xml([list(c) for c in zip(*ws.filas)], 1)).encode('utf-8'))
+        for fragmento in ws.fragmentos:
+            ruta = fragmento.result()
+            with open(ruta, 'rb') as origen:
+                shutil.copyfileobj(origen, destino)
+            os.remove(ruta)
+            self._avanzar(ws.title)
+        destino.write(xlsx.PIE_HOJA.encode('utf-8'))
+
+    def _avanzar(self, hoja):
+        self.hechos += 1
+        if self.al_avanzar is not None:
+            self.al_avanzar(self.hechos, self.pasos, hoja)
+
+    def _finalizar(self):
+        # Se espera a los fragmentos en el orden en que terminan, para informar del avance (y poder cancelar)
+        # mientras los procesos trabajan; después se unen en su orden
+        hojas = {fragmento: ws.title for ws in self.partes.values() for fragmento in ws.fragmentos}
+        self.pasos, self.hechos = 2 * len(hojas), 0
+        for fragmento in as_completed(hojas):
+            fragmento.result()
+            self._avanzar(hojas[fragmento])
+
+        # openpyxl genera el resto del paquete (libro, relaciones, tipos, propiedades) con las hojas en orden
+        titulos = sorted(self.partes, key=lambda titulo: self.orden[titulo])
+        esqueleto = os.path.join(self.directorio, 'esqueleto.xlsx')
+        libro = Workbook(write_only=True)
+        for titulo in titulos:
+            libro.create_sheet(titulo)
+        libro.save(esqueleto)
+        with zipfile.ZipFile(esqueleto) as zin, zipfile.ZipFile(self.temporal, 'w', zipfile.ZIP_DEFLATED) as zout:
+            hojas = xlsx.hojas_del_libro(zin.read('xl/workbook.xml').decode('utf-8'),
+                                         zin.read('xl/_rels/workbook.xml.rels').decode('utf-8'))
+            partes = {parte: nombre for nombre, _, _, parte in hojas}
+            for info in zin.infolist():
+                # Misma fecha que las demás partes del paquete
+                entrada = zipfile.ZipInfo(info.filename, info.date_time)
+                entrada.compress_type = zipfile.ZIP_DEFLATED
+                if info.filename in partes:
+                    with zout.open(entrada, 'w', force_zip64=True) as destino:
+                        self._escribir_parte(self.partes[partes[info.filename]], destino)
+                elif info.filename == 'xl/styles.xml':
+                    zout.writestr(entrada, self.estilos_xml)
+                else:
+                    zout.writestr(entrada, zin.read(info))
+        self._cerrar_procesos()
+        shutil.rmtree(self.directorio, ignore_errors=True)
+
+    def _cerrar_procesos(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=True, cancel_futures=True)
+            self.pool = None
+        self.bloque = None
+
+    def descartar(self):
+        if getattr(self, 'directorio', None) is not None:
+            self._cerrar_procesos()
+            shutil.rmtree(self.directorio, ignore_errors=True)
+        OutputWriter.descartar(self)
+
+class CsvBundleWriter(OutputWriter):
+    """Zip con todos.csv (con las columnas Año y Duplicado), un año_AAAA.csv por año, resumen.csv y, si se pide,
+    fusionados.csv"""
+    formato = 'csv'
+    filas_por_escritura = 100000  # Filas de un año que se copian a la vez para escribirlas
+
+    def __init__(self, destino, nombres):
+        super().__init__(destino, nombres)
+        # Cada CSV se escribe aparte (los bloques de distintos años llegan intercalados) y se comprime al final
+        self.directorio = tempfile.mkdtemp(prefix='metareviewx-', dir=os.path.dirname(os.path.abspath(destino)))
+        self.archivos = {}
+
+    def _anexar(self, nombre, df):
+        ruta = os.path.join(self.directorio, nombre)
+        df.to_csv(ruta, mode='a', header=nombre not in self.archivos, index=False, encoding='utf-8')
+        self.archivos[nombre] = ruta
+
+    def escribir_bloque(self, hoja, df, duplicados=None, años=None, anchos=None, posiciones=None):
+        if hoja == 'todos':
+            df = df.assign(**{COLUMNA_AÑO: _años_enteros(años).array,
+                              COLUMNA_DUPLICADO: np.asarray(duplicados, dtype=bool)})
+            self._anexar('todos.csv', df)
+        elif posiciones is None:
+            self._anexar(f'año_{int(hoja)}.csv', df)
+        else:
+            for inicio in range(0, len(posiciones), self.filas_por_escritura):
+                self._anexar(f'año_{int(hoja)}.csv', df.take(posiciones[inicio:inicio + self.filas_por_escritura]))
+
+    def escribir_fusionados(self, df, anchos=None):
+        self._anexar('fusionados.csv', df)
+
+    def escribir_resumen(self, resumen_data):
+        self._anexar('resumen.csv', pd.DataFrame(resumen_data))
+
+    def _finalizar(self):
+        with zipfile.ZipFile(self.temporal, 'w', zipfile.ZIP_DEFLATED) as archivo_zip:
+            for nombre, ruta in self.archivos.items():
+                archivo_zip.write(ruta, nombre)
+        shutil.rmtree(self.directorio, ignore_errors=True)
+
+    def descartar(self):
+        shutil.rmtree(self.directorio, ignore_errors=True)
+        super().descartar()
+
+class ParquetWriter(OutputWriter):
+    """Directorio con todos/AAAA/part-0.parquet (una partición por año, más todos/sin_año), resumen.parquet y, si se
+    pide, fusionados.parquet
+
+    Cada archivo guarda también las columnas Año, Duplicado y Fila (el orden original de los registros). Un año se
+    lee con pd.read_parquet(ruta + '/todos/2020') o filtrando todo el conjunto por la columna Año, que descarta
+    los archivos de los demás años por sus estadísticas. No se usa la partición al estilo Hive porque pyarrow
+    no sabe leer una partición nula junto a las demás.
+    """
+    formato = 'parquet'
+    hojas_por_año = False
+    tipos_uniformes = True
+
+    def __init__(self, destino, nombres):
+        super().__init__(destino, nombres)
+        # pyarrow es opcional: solo se necesita para este formato
+        import pyarrow
+        import pyarrow.parquet
+        self.pa = pyarrow
+        self.pq = pyarrow.parquet
+        self.descartar()
+        os.makedirs(os.path.join(self.temporal, 'todos'))
+        self.esquema = None
+        self.escritores = {}
+        self.filas = 0
+
+    def _tabla(self, df):
+        """Tabla de Arrow con el mismo esquema en todos los bloques"""
+        pa = self.pa
+        if self.esquema is None:
+            campos = []
+            for campo in pa.Table.from_pandas(df, preserve_index=False).schema:
+                # Las categorías se guardan por su valor; los textos y las columnas vacías en el primer bloque,
+                # como large_string, vengan las columnas como object o como str (igual en memoria y por bloques)
+                tipo = campo.type.value_type if pa.types.is_dictionary(campo.type) else campo.type
+                if pa.types.is_string(tipo) or pa.types.is_null(tipo):
+                    tipo = pa.large_string()
+                campos.append(pa.field(campo.name, tipo))
+            self.esquema = pa.schema(campos)
+        return pa.Table.from_pandas(df, schema=self.esquema, preserve_index=False)
+
+    def escribir_bloque(self, hoja, df, duplicados=None, años=None, anchos=None, posiciones=None):
+        if hoja != 'todos':
+            return
+        años = _años_enteros(años)
+        df = _texto_si_mezcla(df).assign(**{COLUMNA_AÑO: años.array,
+                                            COLUMNA_DUPLICADO: np.asarray(duplicados, dtype=bool),
+                                            COLUMNA_FILA: np.arange(self.filas, self.filas + len(df))})
+        self.filas += len(df)
+        # Una sola conversión a Arrow; cada año se toma de la tabla por posiciones
+        bloque = self._tabla(df)
+        del df
+        claves = años.fillna(-1).to_numpy()
+        for año, posiciones in pd.Series(claves).groupby(claves, sort=True).indices.items():
+            tabla = bloque.take(posiciones)
+            if año not in self.escritores:
+                directorio = os.path.join(self.temporal, 'todos', SIN_AÑO if año == -1 else str(año))
+                os.makedirs(directorio)
+                self.escritores[año] = self.pq.ParquetWriter(os.path.join(directorio, 'part-0.parquet'), tabla.schema)
+            self.escritores[año].write_table(tabla)
+
+    def escribir_fusionados(self, df, anchos=None):
+        tabla = self.pa.Table.from_pandas(_texto_si_mezcla(df), preserve_index=False)
+        self.pq.write_table(tabla, os.path.join(self.temporal, 'fusionados.parquet'))
+
+    def escribir_resumen(self, resumen_data):
+        tabla = self.pa.Table.from_pandas(pd.DataFrame(resumen_data), preserve_index=False)
+        self.pq.write_table(tabla, os.path.join(self.temporal, 'resumen.parquet'))
+
+    def _finalizar(self):
+        for escritor in self.escritores.values():
+            escritor.close()
+        self.escritores = {}
+
+    def descartar(self):
+        for escritor in getattr(self, 'escritores', {}).values():
+            escritor.close()
+        super().descartar()
+
+class SqliteWriter(OutputWriter):
+    """Base de datos SQLite con la tabla todos (columnas Año y Duplicado, índices en Año, Duplicado, Title y DOI),
+    una vista año_AAAA por año, la tabla resumen y, si se pide, la tabla fusionados"""
+    formato = 'sqlite'
+    hojas_por_año = False
+    tipos_uniformes = True
+    COLUMNAS_INDICE = ('Title', 'DOI')
+
+    def __init__(self, destino, nombres):
+        super().__init__(destino, nombres)
+        self.descartar()
+        self.conexion = sqlite3.connect(self.temporal)
+        # Es un archivo temporal: si algo falla se descarta entero
+        self.conexion.execute('PRAGMA journal_mode = OFF')
+        self.conexion.execute('PRAGMA synchronous = OFF')
+        self.columnas = None
+        self.años = set()
+
+    @staticmethod
+    def _identificador(nombre):
+        return '"' + str(nombre).replace('"', '""') + '"'
+
+    @staticmethod
+    def _valores(serie):
+        """Valores como tipos de Python (sqlite3 no acepta escalares de numpy) con None en los nulos"""
+        return serie.astype(object).where(serie.notna(), None).tolist()
+
+    def _crear_tabla(self, df):
+        definiciones = []
+        for columna in df.columns:
+            tipo = {'i': 'INTEGER', 'u': 'INTEGER', 'b': 'INTEGER', 'f': 'REAL'}.get(df[columna].dtype.kind, 'TEXT')
+            definiciones.append(f'{self._identificador(columna)} {tipo}')
+        definiciones += [f'{self._identificador(COLUMNA_AÑO)} INTEGER', f'{self._identificador(COLUMNA_DUPLICADO)} INTEGER']
+        self.conexion.execute(f'CREATE TABLE todos ({", ".join(definiciones)})')
+        self.columnas = list(df.columns)
+
+    def escribir_bloque(self, hoja, df, duplicados=None, años=None, anchos=None, posiciones=None):
+        if hoja != 'todos':
+            return
+        if self.columnas is None:
+            self._crear_tabla(df)
+        años = _años_enteros(años)
+        self.años.update(años.dropna().unique().tolist())
+        valores = [self._valores(df[columna]) if columna in df.columns else [None] * len(df) for columna in self.columnas]
+        valores += [self._valores(años), np.asarray(duplicados, dtype=int).tolist()]
+        marcadores = ', '.join('?' * len(valores))
+        self.conexion.executemany(f'INSERT INTO todos VALUES ({marcadores})', zip(*valores))
+
+    def escribir_fusionados(self, df, anchos=None):
+        _texto_si_mezcla(df).to_sql('fusionados', self.conexion, index=False)
+
+    def escribir_resumen(self, resumen_data):
+        pd.DataFrame(resumen_data).to_sql('resumen', self.conexion, index=False)
+
+    def _finalizar(self):
+        # Los índices se crean al final: es más rápido que mantenerlos durante las inserciones
+        if self.columnas is not None:
+            for columna in [COLUMNA_AÑO, COLUMNA_DUPLICADO] + [c for c in self.COLUMNAS_INDICE if c in self.columnas]:
+                self.conexion.execute(f'CREATE INDEX {self._identificador("idx_" + columna)} '
+                                      f'ON todos ({self._identificador(columna)})')
+        for año in sorted(self.años):
+            self.conexion.execute(f'CREATE VIEW {self._identificador(f"año_{año}")} AS '
+                                  f'SELECT * FROM todos WHERE {self._identificador(COLUMNA_AÑO)} = {int(año)}')
+        self.conexion.commit()
+        self.conexion.close()
+
+    def descartar(self):
+        if getattr(self, 'conexion', None) is not None:
+            self.conexion.close()
+            self.conexion = None
+        super().descartar()
+
+ESCRITORES = {escritor.formato: escritor for escritor in (ExcelWriter, ParquetWriter, CsvBundleWriter, SqliteWriter)}
+
+def formatos_disponibles():
+    """Formatos de salida utilizables (Parquet solo si pyarrow está instalado)"""
+    return tuple(formato for formato in ESCRITORES
+                 if formato != 'parquet' or importlib.util.find_spec('pyarrow') is not None)
+
+def formato_de_salida(ruta, formato=None):
+    """Formato pedido o, si no se indica, el que corresponde a la extensión del destino (xlsx por defecto)"""
+    if formato:
+        return formato
+    return EXTENSIONES.get(os.path.splitext(ruta)[1].lower(), 'xlsx')
+
+def crear_escritor(formato, destino, nombres, trabajadores=1):
+    """nombres: nombres traducidos de las hojas {'todos', 'fusionados', 'año', 'resumen'} (solo los usa Excel)
+
+    Con trabajadores > 1 el Excel se genera en varios procesos (ExcelParaleloWriter) si pyarrow está instalado.
+    """
+    if formato == 'xlsx' and trabajadores > 1 and importlib.util.find_spec('pyarrow') is not None:
+        return ExcelParaleloWriter(destino, nombres, trabajadores)
+    return ESCRITORES[formato](destino, nombres)
@@ -0,0 +1,120 @@
+import math
+import re
+from xml.sax.saxutils import escape, quoteattr
+import numpy as np
+from openpyxl.utils import get_column_letter
+
+# Mismo marcado que genera openpyxl en modo solo escritura, para poder mezclar partes de ambos
+CABECERA_HOJA = ('<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                 '<sheetPr><outlinePr summaryBelow="1" summaryRight="1" /><pageSetUpPr /></sheetPr>'
+                 '<sheetViews><sheetView workbookViewId="0"><selection activeCell="A1" sqref="A1" /></sheetView></sheetViews>'
+                 '<sheetFormatPr baseColWidth="8" defaultRowHeight="15" />')
+PIE_HOJA = ('</sheetData><pageMargins left="0.75" right="0.75" top="1" bottom="1" header="0.5" footer="0.5" />'
+            '</worksheet>')
+TIPO_HOJA = 'application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml'
+RELACION_HOJA = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet'
+CARACTERES_ILEGALES = re.compile(r'[\000-\010]|[\013-\014]|[\016-\037]')
+
+def _vacio(valor):
+    return valor is None or (isinstance(valor, (float, np.floating)) and math.isnan(valor))
+
+def celda_xml(referencia, valor, estilo=None):
+    """XML de una celda: números, booleanos y texto en línea (inlineStr)"""
+    s = f' s="{estilo}"' if estilo else ''
+    if valor is None:
+        return f'<c r="{referencia}"{s} t="n" />'
+    if isinstance(valor, (bool, np.bool_)):
+        return f'<c r="{referencia}"{s} t="b"><v>{int(valor)}</v></c>'
+    if isinstance(valor, (int, float, np.integer, np.floating)):
+        if isinstance(valor, (float, np.floating)) and (math.isnan(valor) or math.isinf(valor)):
+            return f'<c r="{referencia}"{s} t="n" />'
+        return f'<c r="{referencia}"{s} t="n"><v>{"%.16g" % valor}</v></c>'
+    texto = CARACTERES_ILEGALES.sub('', str(valor))
+    espacio = ' xml:space="preserve"' if texto != texto.strip() else ''
+    return f'<c r="{referencia}"{s} t="inlineStr"><is><t{espacio}>{escape(texto)}</t></is></c>'
+
+def filas_xml(columnas, fila_inicio, resaltar=None, estilo_resaltado=1):
+    """Genera el XML de cada fila a partir de los valores de cada columna"""
+    letras = [get_column_letter(i) for i in range(1, len(columnas) + 1)]
+    for desplazamiento, fila in enumerate(zip(*columnas)):
+        r = fila_inicio + desplazamiento
+        estilo = estilo_resaltado if resaltar is not None and resaltar[desplazamiento] else None
+        # Como openpyxl, las celdas vacías sin formato no se escriben
+        celdas = ''.join(celda_xml(f'{letra}{r}', valor, estilo) for letra, valor in zip(letras, fila)
+                         if estilo or not _vacio(valor))
+        yield f'<row r="{r}">{celdas}</row>'
+
+def columnas_xml(anchos):
+    """Elemento <cols> con el ancho de cada columna"""
+    if not anchos:
+        return ''
+    return '<cols>' + ''.join(f'<col width="{ancho:g}" customWidth="1" min="{i}" max="{i}" />'
+                              for i, ancho in enumerate(anchos, start=1)) + '</cols>'
+
+def anchos_de_cabecera(cabecera):
+    """Anchos de columna declarados en la cabecera de una hoja existente"""
+    anchos = {}
+    for atributos in re.findall(r'<col ([^>]*?)/?>', cabecera):
+        valores = dict(re.findall(r'(\w+)="([^"]*)"', atributos))
+        if 'width' in valores and 'min' in valores:
+            for i in range(int(valores['min']), int(valores.get('max', valores['min'])) + 1):
+                anchos[i] = float(valores['width'])
+    return [anchos.get(i, 0) for i in range(1, max(anchos, default=0) + 1)]
+
+def reemplazar_columnas(cabecera, anchos):
+    """Sustituye (o añade) el elemento <cols> de la cabecera de una hoja"""
+    if '<cols>' in cabecera:
+        return re.sub(r'<cols>.*?</cols>', lambda _: columnas_xml(anchos), cabecera, flags=re.S)
+    return cabecera + columnas_xml(anchos)
+
+def escribir_hoja(destino, anchos, filas):
+    """Escribe una hoja completa en un archivo binario abierto, fila a fila"""
+    destino.write((CABECERA_HOJA + columnas_xml(anchos) + '<sheetData>').encode('utf-8'))
+    for fila in filas:
+        destino.write(fila.encode('utf-8'))
+    destino.write(PIE_HOJA.encode('utf-8'))
+
+def atributos(elemento):
+    """Atributos de un elemento XML simple como diccionario"""
+    return dict(re.findall(r'([\w:]+)="([^"]*)"', elemento))
+
+def hojas_del_libro(workbook_xml, relaciones_xml):
+    """Lista de hojas (nombre, sheetId, r:id, parte dentro del zip) en el orden del libro"""
+    destinos = {}
+    for relacion in re.findall(r'<Relationship ([^>]*?)/?>', relaciones_xml):
+        valores = atributos(relacion)
+        destino = valores['Target']
+        destinos[valores['Id']] = destino.lstrip('/') if destino.startswith('/') else 'xl/' + destino
+    hojas = []
+    for hoja in re.findall(r'<sheet ([^>]*?)/?>', workbook_xml):
+        valores = atributos(hoja)
+        nombre = re.sub(r'&(amp|lt|gt|quot|apos);', lambda m: {'amp': '&', 'lt': '<', 'gt': '>', 'quot': '"', 'apos': "'"}[m.group(1)], valores['name'])
+        hojas.append((nombre, int(valores['sheetId']), valores['r:id'], destinos[valores['r:id']]))
+    return hojas
+
+def elemento_hoja(nombre, id_hoja, id_relacion):
+    """Elemento <sheet> de workbook.xml"""
+    return f'<sheet name={quoteattr(nombre)} sheetId="{id_hoja}" state="visible" r:id="{id_relacion}" />'
+
+def asegurar_estilo_resaltado(estilos_xml):
+    """Devuelve styles.xml con un formato de relleno amarillo y el índice de ese formato"""
+    relleno = ('<fill><patternFill patternType="solid"><fgColor rgb="00FFFF00" /><bgColor rgb="00FFFF00" />'
+               '</patternFill></fill>')
+    bloque = re.search(r'<fills count="\d+">(.*?)</fills>', estilos_xml, re.S)
+    rellenos = re.findall(r'<fill>.*?</fill>|<fill />', bloque.group(1), re.S)
+    indice_relleno = next((i for i, r in enumerate(rellenos) if 'FFFF00' in r and 'solid' in r), None)
+    if indice_relleno is None:
+        indice_relleno = len(rellenos)
+        rellenos.append(relleno)
+        estilos_xml = estilos_xml.replace(bloque.group(0), f'<fills count="{len(rellenos)}">{"".join(rellenos)}</fills>')
+
+    bloque = re.search(r'<cellXfs count="\d+">(.*?)</cellXfs>', estilos_xml, re.S)
+    formatos = re.findall(r'<xf [^>]*?/>|<xf [^>]*?[^/]>.*?</xf>', bloque.group(1), re.S)
+    indice = next((i for i, f in enumerate(formatos) if f'fillId="{indice_relleno}"' in f), None)
+    if indice is None:
+        indice = len(formatos)
+        # Mismos atributos que escribe openpyxl, para que el resultado no dependa de quién creó el estilo
+        formatos.append(f'<xf numFmtId="0" fontId="0" fillId="{indice_relleno}" borderId="0" pivotButton="0" '
+                        f'quotePrefix="0" xfId="0" />')
+        estilos_xml = estilos_xml.replace(bloque.group(0), f'<cellXfs count="{len(formatos)}">{"".join(formatos)}</cellXfs>')
+    return estilos_xml, indice